@@ -20,6 +20,8 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import copy
+
 from absl import logging
 import six
 
@@ -79,6 +81,36 @@ class AbstractRecommenderAgent(object):
         empty dictionary.
     """
 
+  def snapshot_bundle(self, checkpoint_dir, iteration_number):
+    """Snapshots the agent's state for a checkpoint written in the background.
+
+    Like bundle_and_checkpoint, but files which are slow to write may be
+    written later by the returned write function, possibly on another thread
+    while the agent keeps acting and learning. Neither the bundle nor the write
+    function may therefore refer to state the agent mutates.
+
+    The default implementation writes all files in bundle_and_checkpoint and
+    returns a deep copy of its bundle.
+
+    Args:
+      checkpoint_dir: A string for the directory where objects will be saved.
+      iteration_number: An integer of iteration number to use for naming the
+        checkpoint file.
+
+    Returns:
+      A tuple (bundle_dict, write_fn), where bundle_dict is as returned by
+        bundle_and_checkpoint and write_fn is None or a function without
+        arguments writing the remaining files of the checkpoint.
+    """
+    logging.log_first_n(
+        logging.INFO,
+        '%s does not implement snapshot_bundle: its files are written '
+        'synchronously by bundle_and_checkpoint and its bundle is deep-copied, '
+        'so only the pickling of the bundle is done in the background.', 1,
+        type(self).__name__)
+    bundle_dict = self.bundle_and_checkpoint(checkpoint_dir, iteration_number)
+    return copy.deepcopy(bundle_dict), None
+
   @abc.abstractmethod
   def unbundle(self, checkpoint_dir, iteration_number, bundle_dict):
     """Restores the agent from a checkpoint.
@@ -13,11 +13,23 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Module importing all agents."""
+"""Module importing all agents.
+
+Agents built on TensorFlow are only imported when first accessed, so that the
+other agents can be used without it.
+"""
+import importlib
+
 from recsim.agents import agent_utils
 from recsim.agents import cluster_bandit_agent
-from recsim.agents import full_slate_q_agent
 from recsim.agents import greedy_pctr_agent
 from recsim.agents import random_agent
-from recsim.agents import slate_decomp_q_agent
 from recsim.agents import tabular_q_agent
+
+_LAZY_MODULES = frozenset(['full_slate_q_agent', 'slate_decomp_q_agent'])
+
+
+def __getattr__(name):
+  if name in _LAZY_MODULES:
+    return importlib.import_module(__name__ + '.' + name)
+  raise AttributeError('module %r has no attribute %r' % (__name__, name))
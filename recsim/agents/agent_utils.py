@@ -14,10 +14,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Convenience primitives relating to the implementation of agents."""
+import operator
+
 from gym import spaces
 import numpy as np
 
 
+def _path_accessor(path):
+  """Returns a function indexing an observation by the keys in path."""
+  if not path:
+    return None
+  if len(path) == 1:
+    return operator.itemgetter(path[0])
+
+  def accessor(gym_observation):
+    for key in path:
+      gym_observation = gym_observation[key]
+    return gym_observation
+
+  return accessor
+
+
 class GymSpaceWalker(object):
   """Class for recursively applying a given function to a gym space.
 
@@ -29,48 +46,68 @@ class GymSpaceWalker(object):
   a leaf operator f, this class can is used to transform an observation (a, b)
   to [f(a), f(b)].
 
+  The space is compiled once at construction into a flat list of leaf spaces
+  and accessors fetching the corresponding part of an observation, so that
+  applying the walker does not re-inspect the structure of the space.
+
   Args:
   gym_space: An instance of an OpenAI Gym space.
   leaf_op: A function taking as arguments an OpenAI Gym space and an observation
     conforming to that space. There are no requirements on its output.
+  vectorized: If True, leaf_op is called with the observations of a leaf
+    stacked into a single NumPy array along a new leading axis instead of a
+    list.
   """
 
-  def __init__(self, gym_space, leaf_op):
+  def __init__(self, gym_space, leaf_op, vectorized=False):
     self._gym_space = gym_space
     self._leaf_op = leaf_op
+    self._vectorized = vectorized
+    self._leaves = []
+    self._compile(gym_space, ())
 
-  def apply_and_flatten(self, gym_observations):
-    return self._descend_and_flatten(self._gym_space, gym_observations)
-
-  def _descend_and_flatten(self, gym_space, gym_observations):
-    """Recursive implementation of flattening and leaf op application.
+  def _compile(self, gym_space, path):
+    """Appends the (accessor, space) pairs of the leaves of gym_space in order.
 
     Args:
       gym_space: An instance of an OpenAI Gym space.
-      gym_observations: A list of observation conforming to the format
-        of gym_space.
-
-    Returns:
-      flattened_apply: a list of the applications of leaf_op to the leaves of
-        the gym space, as encountered in post-order traversal.
+      path: A tuple of the keys leading from the root space to gym_space.
     """
     if isinstance(gym_space, spaces.dict.Dict):
-      flattened_apply = []
       for key, space in gym_space.spaces.items():
-        flattened_apply += self._descend_and_flatten(
-            space,
-            [gym_observation[key] for gym_observation in gym_observations])
+        self._compile(space, path + (key,))
     elif isinstance(gym_space, spaces.tuple.Tuple):
-      flattened_apply = []
       for i, space in enumerate(gym_space.spaces):
-        flattened_apply += self._descend_and_flatten(
-            space, [gym_observation[i] for gym_observation in gym_observations])
+        self._compile(space, path + (i,))
     elif isinstance(gym_space, spaces.box.Box) or isinstance(
         gym_space, spaces.discrete.Discrete):
-      return self._leaf_op(gym_space, gym_observations)
+      self._leaves.append((_path_accessor(path), gym_space))
     else:
       raise NotImplementedError('Gym space type ' + str(type(gym_space)) +
                                 ' not implemented yet.')
+
+  def apply_and_flatten(self, gym_observations):
+    """Applies leaf_op to every leaf of a list of observations.
+
+    Args:
+      gym_observations: A list of observation conforming to the format
+        of gym_space.
+
+    Returns:
+      flattened_apply: a list of the applications of leaf_op to the leaves of
+        the gym space, as encountered in post-order traversal.
+    """
+    flattened_apply = []
+    for accessor, space in self._leaves:
+      if accessor is None:
+        leaf_observations = gym_observations
+      else:
+        leaf_observations = [
+            accessor(gym_observation) for gym_observation in gym_observations
+        ]
+      if self._vectorized:
+        leaf_observations = np.asarray(leaf_observations)
+      flattened_apply += self._leaf_op(space, leaf_observations)
     return flattened_apply
 
 
@@ -0,0 +1,81 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.agents.agent_utils."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from gym import spaces
+import numpy as np
+from recsim.agents import agent_utils
+import tensorflow.compat.v1 as tf
+
+
+class GymSpaceWalkerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(GymSpaceWalkerTest, self).setUp()
+    self.space = spaces.Dict({
+        'a': spaces.Discrete(3),
+        'b': spaces.Tuple((spaces.Box(low=0., high=1., shape=(2,)),
+                           spaces.Dict({'c': spaces.Discrete(2)}))),
+    })
+    self.observations = [{
+        'a': 2,
+        'b': (np.array([0.5, 0.25]), {'c': 1})
+    }, {
+        'a': 0,
+        'b': (np.array([0., 1.]), {'c': 0})
+    }]
+
+  def test_apply_and_flatten(self):
+    calls = []
+
+    def leaf_op(space, observations):
+      calls.append((space, observations))
+      return [len(observations)]
+
+    walker = agent_utils.GymSpaceWalker(self.space, leaf_op)
+    self.assertEqual([2, 2, 2], walker.apply_and_flatten(self.observations))
+    self.assertEqual([self.space['a'], self.space['b'][0],
+                      self.space['b'][1]['c']], [space for space, _ in calls])
+    self.assertEqual([2, 0], calls[0][1])
+    self.assertAllEqual([[0.5, 0.25], [0., 1.]], calls[1][1])
+    self.assertEqual([1, 0], calls[2][1])
+
+  def test_vectorized(self):
+    walker = agent_utils.GymSpaceWalker(
+        self.space, lambda space, observations: [observations.sum(axis=0)],
+        vectorized=True)
+    result = walker.apply_and_flatten(self.observations)
+    self.assertLen(result, 3)
+    self.assertEqual(2, result[0])
+    self.assertAllClose([0.5, 1.25], result[1])
+    self.assertEqual(1, result[2])
+
+  def test_leaf_space(self):
+    walker = agent_utils.GymSpaceWalker(
+        spaces.Discrete(4), lambda space, observations: list(observations))
+    self.assertEqual([3, 1], walker.apply_and_flatten([3, 1]))
+
+  def test_unsupported_space(self):
+    with self.assertRaises(NotImplementedError):
+      agent_utils.GymSpaceWalker(spaces.MultiBinary(3), lambda *args: [])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -26,6 +26,10 @@ class MABAlgorithm(object):
   We implement multi-armed bandit algorithms with confidence width tuning
   proposed in Hsu et al. https://arxiv.org/abs/1904.02664.
 
+  An MABAlgorithm can also hold the state of many independent bandit instances
+  with the same arms, in which case pulls and reward are [num_instances,
+  num_arms] arrays and scores and arms are computed for all instances at once.
+
   Attributes:
     pulls: A numpy array which counts number of pulls of each arm
     reward: A numpy array which sums up reward of each arm
@@ -35,7 +39,7 @@ class MABAlgorithm(object):
     _rng: An instance of random.RandomState for random number generation
   """
 
-  def __init__(self, num_arms, params, seed=0):
+  def __init__(self, num_arms, params, seed=0, num_instances=None):
     """Initializes MABAlgorithm.
 
     Args:
@@ -43,11 +47,17 @@ class MABAlgorithm(object):
       params: A dictionary which includes additional parameters like
         optimism_scaling. Default is an empty dictionary.
       seed: Random seed for this object. Default is zero.
+      num_instances: Number of independent bandit instances, or None for a
+        single instance with one-dimensional state.
     """
     if num_arms < 2:
       raise ValueError('num_arms must be greater than one.')
-    self.pulls = np.zeros(num_arms)
-    self.reward = np.zeros(num_arms)
+    if num_instances is None:
+      shape = (num_arms,)
+    else:
+      shape = (num_instances, num_arms)
+    self.pulls = np.zeros(shape)
+    self.reward = np.zeros(shape)
     self._rng = np.random.RandomState(seed)
 
     self.optimism_scaling = 1.0
@@ -55,16 +65,46 @@ class MABAlgorithm(object):
       setattr(self, attr, val)
 
   def set_state(self, pulls, reward):
-    if len(pulls) != len(self.pulls) or len(reward) != len(self.reward):
+    if np.shape(pulls) != self.pulls.shape or np.shape(
+        reward) != self.reward.shape:
       raise ValueError('Cannot set state with a different number of arms.')
     self.pulls[:] = pulls
     self.reward[:] = reward
 
   def update(self, arm, reward):
-    if reward < 0 or reward > 1:
+    """Records pulls of arms and the observed rewards.
+
+    Args:
+      arm: The index of the pulled arm. For multiple instances, a
+        [num_instances] array with the arm pulled in each instance.
+      reward: The observed reward, or a [num_instances] array of rewards.
+    """
+    if np.any(np.less(reward, 0)) or np.any(np.greater(reward, 1)):
       raise ValueError('reward must be in [0, 1].')
-    self.pulls[arm] += 1
-    self.reward[arm] += reward
+    if self.pulls.ndim == 1:
+      self.pulls[arm] += 1
+      self.reward[arm] += reward
+    else:
+      instances = np.arange(self.pulls.shape[0])
+      self.pulls[instances, arm] += 1
+      self.reward[instances, arm] += reward
+
+  def _unpulled_scores(self):
+    """Returns a mask of instances with unpulled arms and their scores."""
+    unpulled = np.any(self.pulls == 0, axis=-1, keepdims=True)
+    return unpulled, np.where(self.pulls > 0, 0, np.Inf)
+
+  def _log_t(self, t):
+    """Returns log(t) broadcastable against the [num_instances, num_arms] state.
+    """
+    log_t = np.log(np.asarray(t, dtype=np.float64))
+    if self.pulls.ndim == 2 and log_t.ndim == 1:
+      log_t = log_t[:, np.newaxis]
+    return log_t
+
+  def get_arm(self, t):
+    """Returns the arm with the highest score (for each instance) at round t."""
+    return np.argmax(self.get_score(t), axis=-1)
 
 
 class UCB1(MABAlgorithm):
@@ -77,50 +117,132 @@ class UCB1(MABAlgorithm):
   def get_score(self, t):
     """Computes upper confidence bounds of reward / pulls at round t."""
     # Pull any arm that we haven't pulled.
-    if not all(self.pulls):
-      return np.where(self.pulls > 0, 0, np.Inf)
-    ct = self.optimism_scaling * np.sqrt(2 * np.log(t))
-    return self.reward / self.pulls + ct * np.sqrt(1 / self.pulls)
-
-  def get_arm(self, t):
-    return np.argmax(self.get_score(t))
+    unpulled, unpulled_scores = self._unpulled_scores()
+    if np.all(unpulled):
+      return unpulled_scores
+    pulls = np.maximum(self.pulls, 1)
+    with np.errstate(invalid='ignore'):
+      ct = self.optimism_scaling * np.sqrt(2 * self._log_t(t))
+    scores = self.reward / pulls + ct * np.sqrt(1 / pulls)
+    return np.where(unpulled, unpulled_scores, scores)
 
   @staticmethod
   def print():
     return 'UCB1'
 
 
+def _bernoulli_kl(p, q):
+  """Computes the KL-divergence between Bernoulli distributions p and q."""
+  with np.errstate(divide='ignore', invalid='ignore'):
+    return (np.where(p > 0, p * np.log(p / q), 0) +
+            np.where(p < 1, (1 - p) * np.log((1 - p) / (1 - q)), 0))
+
+
+def _kl_ucb_index(p, c, max_iters=32, tol=1e-12):
+  """Finds the largest q in [p, 1] such that d(p, q) <= c.
+
+  Uses Newton's method safeguarded by bisection on u = -log(1 - q). In u,
+  d(p, q) is convex and increasing over [p, 1] and close to linear near q = 1,
+  so Newton steps started above the root decrease monotonically to it in a few
+  iterations. The root is kept in a bracket [lo, hi] and Newton steps falling
+  outside of it are replaced by bisection steps.
+
+  Args:
+    p: An array of empirical means in [0, 1].
+    c: An array of exploration bonuses, broadcastable against p.
+    max_iters: The maximum number of iterations.
+    tol: The tolerance on u for terminating.
+
+  Returns:
+    An array of the same shape as p with the KL-UCB indices.
+  """
+  p, c = np.broadcast_arrays(np.asarray(p, dtype=np.float64),
+                             np.fmax(np.asarray(c, dtype=np.float64), 0.))
+  shape = p.shape
+  p = p.flatten()
+  c = c.flatten()
+  q = np.ones(p.shape)
+  active = np.flatnonzero(p < 1.)
+  p, c = p[active], c[active]
+  with np.errstate(divide='ignore'):
+    lo = -np.log1p(-p)
+    # Upper bounds on the root from Pinsker's inequality d(p, q) >= 2(q - p)^2
+    # and from d(p, q) >= p log(p) + (1 - p) log((1 - p) / (1 - q)).
+    p_log_p = np.where(p > 0, p * np.log(np.maximum(p, 1e-300)), 0.)
+    hi = lo + (c - p_log_p) / (1. - p)
+    hi = np.fmin(hi, -np.log1p(-np.minimum(p + np.sqrt(c / 2.), 1.)))
+  u = hi.copy()
+  remaining = np.arange(len(p))
+  for _ in range(max_iters):
+    if not remaining.size:
+      break
+    p_r, u_r = p[remaining], u[remaining]
+    # d(p, q) - c written in terms of u so that it stays finite as q -> 1.
+    f = (p_log_p[remaining] - p_r * np.log(-np.expm1(-u_r)) +
+         (1. - p_r) * (np.log1p(-p_r) + u_r) - c[remaining])
+    lo[remaining] = np.where(f < 0, u_r, lo[remaining])
+    hi[remaining] = np.where(f > 0, u_r, hi[remaining])
+    with np.errstate(divide='ignore', invalid='ignore'):
+      u_new = u_r - f / ((1. - p_r) - p_r / np.expm1(u_r))
+    lo_r, hi_r = lo[remaining], hi[remaining]
+    outside = ~((u_new > lo_r) & (u_new < hi_r))
+    u_new[outside] = (lo_r[outside] + hi_r[outside]) / 2.
+    converged = ((np.abs(u_new - u_r) <= tol * (1. + u_r)) |
+                 (hi_r - lo_r <= tol * (1. + u_r)))
+    u[remaining] = u_new
+    remaining = remaining[~converged]
+  q[active] = np.maximum(-np.expm1(-u), p)
+  return q.reshape(shape)
+
+
 class KLUCB(MABAlgorithm):
   """Kullback-Leibler Upper Confidence Bounds (KL-UCB) algorithm.
 
   See "The KL-UCB algorithm for bounded stochastic bandits and beyond" by
   Garivier and Cappe.
+
+  The index of each arm is cached together with the pulls, reward and log(t)
+  it was computed from, so only arms whose statistics changed since the last
+  call are recomputed. If log_t_bucket_width (settable through params) is
+  positive, log(t) is rounded up to a multiple of it, so that indices of
+  unchanged arms are reused across rounds at the cost of slightly more
+  optimism.
   """
 
+  log_t_bucket_width = 0.
+
+  def __init__(self, num_arms, params, seed=0, num_instances=None):
+    super(KLUCB, self).__init__(num_arms, params, seed, num_instances)
+    self._cached_pulls = np.full(self.pulls.shape, np.nan)
+    self._cached_reward = np.full(self.pulls.shape, np.nan)
+    self._cached_log_t = np.full(self.pulls.shape, np.nan)
+    self._cached_index = np.ones(self.pulls.shape)
+
   def get_score(self, t):
     """Computes upper confidence bounds of reward / pulls at round t."""
     # Pull any arm that we haven't pulled.
-    if not all(self.pulls):
-      return np.where(self.pulls > 0, 0, np.Inf)
-    c = self.optimism_scaling**2 * (np.log(t) +
-                                    3 * np.log(np.log(t))) / self.pulls
-    p = self.reward / self.pulls
-
-    # KL-divergence d(p, q) is strictly increasing over [p, 1].
-    # Use binary search to find q such that d(p, q) <= c.
-    qmin = p
-    qmax = np.ones(p.size)
-    for _ in range(16):  # Error bounded by 2^-16.
-      q = (qmax + qmin) / 2
-      ndx = (np.where(p > 0, p * np.log(p / q), 0) +
-             np.where(p < 1, (1 - p) * np.log((1 - p) / (1 - q)), 0)) < c
-      qmin[ndx] = q[ndx]
-      qmax[~ndx] = q[~ndx]
-
-    return q
-
-  def get_arm(self, t):
-    return np.argmax(self.get_score(t))
+    unpulled, unpulled_scores = self._unpulled_scores()
+    if np.all(unpulled):
+      return unpulled_scores
+    log_t = self._log_t(t)
+    if self.log_t_bucket_width > 0:
+      log_t = np.ceil(
+          log_t / self.log_t_bucket_width) * self.log_t_bucket_width
+    log_t = np.broadcast_to(log_t, self.pulls.shape)
+    stale = ((self.pulls != self._cached_pulls) |
+             (self.reward != self._cached_reward) |
+             (log_t != self._cached_log_t))
+    if np.any(stale):
+      pulls = np.maximum(self.pulls[stale], 1)
+      stale_log_t = log_t[stale]
+      with np.errstate(invalid='ignore', divide='ignore'):
+        c = self.optimism_scaling**2 * (
+            stale_log_t + 3 * np.log(stale_log_t)) / pulls
+      self._cached_index[stale] = _kl_ucb_index(self.reward[stale] / pulls, c)
+      self._cached_pulls[stale] = self.pulls[stale]
+      self._cached_reward[stale] = self.reward[stale]
+      self._cached_log_t[stale] = stale_log_t
+    return np.where(unpulled, unpulled_scores, self._cached_index)
 
   @staticmethod
   def print():
@@ -135,8 +257,14 @@ class ThompsonSampling(MABAlgorithm):
   """
 
   def update(self, arm, reward):
-    if reward > 0 and reward < 1:
-      reward = float(self._rng.rand() < reward)
+    if self.pulls.ndim == 1:
+      if reward > 0 and reward < 1:
+        reward = float(self._rng.rand() < reward)
+    else:
+      reward = np.asarray(reward, dtype=np.float64)
+      fractional = (reward > 0) & (reward < 1)
+      reward = np.where(fractional,
+                        self._rng.rand(*reward.shape) < reward, reward)
     MABAlgorithm.update(self, arm, reward)
 
   def get_score(self, t):
@@ -147,9 +275,6 @@ class ThompsonSampling(MABAlgorithm):
     beta = 1 + (self.pulls - self.reward) / self.optimism_scaling**2
     return self._rng.beta(alpha, beta)
 
-  def get_arm(self, t):
-    return np.argmax(self.get_score(t))
-
   @staticmethod
   def print():
     return 'ThompsonSampling'
@@ -54,7 +54,34 @@ class KLUCBTest(tf.test.TestCase):
   def test_get_score(self):
     ucb = self._alg.get_score(20)
     self.assertAlmostEqual(1, ucb[0])
-    self.assertAlmostEqual(0.5 - 2**-16, ucb[1])
+    # For an empirical mean of 0, d(0, q) = -log(1 - q).
+    c = (np.log(20) + 3 * np.log(np.log(20))) / 10
+    self.assertAlmostEqual(1 - np.exp(-c), ucb[1])
+
+  def test_kl_ucb_index(self):
+    p = np.array([0.0, 0.1, 0.5, 0.9, 0.99, 1.0, 0.3])
+    c = np.array([0.5, 0.2, 0.01, 0.05, 1.0, 0.3, 0.0])
+    q = algorithms._kl_ucb_index(p, c)
+    # Indices are either a root of d(p, q) = c or rounded to 1.
+    root = q < 1
+    self.assertAllClose(c[root], algorithms._bernoulli_kl(p, q)[root])
+    self.assertAllEqual([0.99, 1.0], p[~root])
+    self.assertAllGreaterEqual(q - p, 0)
+    self.assertAllLessEqual(q, 1)
+
+  def test_get_score_caching(self):
+    alg = algorithms.KLUCB(3, {'log_t_bucket_width': 0.5})
+    alg.set_state(np.array([10, 10, 5]), np.array([5, 2, 1]))
+    ucb = alg.get_score(25)
+    cached_index = alg._cached_index
+    # A round with the same log(t) bucket reuses all indices.
+    alg._cached_index = cached_index + 1
+    self.assertAllClose(cached_index + 1, alg.get_score(26))
+    # Only the updated arm is recomputed.
+    alg.update(2, 1)
+    new_ucb = alg.get_score(26)
+    self.assertAllClose(cached_index[:2] + 1, new_ucb[:2])
+    self.assertNotAllClose(ucb[2], new_ucb[2])
 
   def test_get_arm(self):
     # Arm 0 is clearly the best.
@@ -91,5 +118,41 @@ class ThompsonSamplingTest(tf.test.TestCase):
     self.assertEqual(0, self._alg.get_arm(20))
 
 
+class BatchedMABAlgorithmTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(BatchedMABAlgorithmTest, self).setUp()
+    self._pulls = np.array([[10, 10], [10, 10], [0, 3], [5, 20]])
+    self._reward = np.array([[10, 0], [3, 7], [0, 1], [4, 9]])
+    self._t = np.sum(self._pulls, axis=1)
+
+  def test_get_score(self):
+    for alg_ctor in (algorithms.UCB1, algorithms.KLUCB):
+      alg = alg_ctor(2, {}, num_instances=len(self._pulls))
+      alg.set_state(self._pulls, self._reward)
+      scores = alg.get_score(self._t)
+      self.assertEqual(self._pulls.shape, scores.shape)
+      for pulls, reward, t, instance_scores in zip(self._pulls, self._reward,
+                                                   self._t, scores):
+        single_alg = alg_ctor(2, {})
+        single_alg.set_state(pulls, reward)
+        self.assertAllClose(single_alg.get_score(t), instance_scores)
+      self.assertAllEqual(np.argmax(scores, axis=1), alg.get_arm(self._t))
+
+  def test_thompson_sampling(self):
+    alg = algorithms.ThompsonSampling(2, {}, num_instances=len(self._pulls))
+    alg.set_state(self._pulls, self._reward)
+    self.assertEqual(self._pulls.shape, alg.get_score(self._t).shape)
+    self.assertEqual((len(self._pulls),), alg.get_arm(self._t).shape)
+
+  def test_update(self):
+    alg = algorithms.UCB1(2, {}, num_instances=3)
+    alg.update(np.array([0, 1, 1]), np.array([1, 0, 1]))
+    self.assertAllEqual([[1, 0], [0, 1], [0, 1]], alg.pulls)
+    self.assertAllEqual([[1, 0], [0, 0], [0, 1]], alg.reward)
+    with self.assertRaises(ValueError):
+      alg.update(np.array([0, 1, 1]), np.array([1, 2, 1]))
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -19,9 +19,20 @@ from __future__ import division
 from __future__ import print_function
 import abc
 import numpy as np
+from scipy import linalg
 from scipy import special
 import six
 
+# Initial capacity of the arm and reward buffers.
+_INITIAL_CAPACITY = 64
+ESTIMATORS = ('irls', 'online')
+
+
+def _argmax_random_ties(scores):
+  """Returns the argmax of each row of scores, breaking ties randomly."""
+  is_max = scores == scores.max(axis=-1, keepdims=True)
+  return np.argmax(np.random.random(scores.shape) * is_max, axis=-1)
+
 
 @six.add_metaclass(abc.ABCMeta)
 class GLMAlgorithm(object):
@@ -43,16 +54,46 @@ class GLMAlgorithm(object):
     optimism_scaling: A float specifying the confidence level. Default value
       (1.0) corresponds to the exploration strategy presented in the literature.
       A smaller number means less exploration and more exploitation.
+    estimator: either 'irls', which refits the maximum-likelihood solution on
+      the whole history of pulls, or 'online', which keeps a Laplace
+      approximation of the posterior updated with one Newton step per
+      observation. The online estimator keeps O(dim^2) state and does not store
+      the history.
     _rng: An instance of random.RandomState for random number generation
   """
 
-  def __init__(self, dim, sigma0=1., optimism_scaling=1.):
-    self._rewards = np.array([])  # stores all rewards
-    self._arms = np.ndarray([0, dim])  # stores arm differences
+  def __init__(self, dim, sigma0=1., optimism_scaling=1., estimator='irls'):
+    if estimator not in ESTIMATORS:
+      raise ValueError('Unknown estimator {}, expected one of {}.'.format(
+          estimator, ESTIMATORS))
+    self._estimator = estimator
+    # Arms and rewards are stored in buffers whose capacity doubles when full.
+    self._num_pulls = 0
+    self._arm_buffer = np.zeros([_INITIAL_CAPACITY, dim])
+    self._reward_buffer = np.zeros(_INITIAL_CAPACITY)
     self._dim = dim
     self._outer = np.zeros([dim, dim])
     self._sigma0 = sigma0
     self._optimism_scaling = optimism_scaling
+    # Inverse of the Gram matrix outer + I / sigma0^2, maintained with
+    # Sherman-Morrison updates.
+    self._gram_inv = np.eye(dim) * np.square(sigma0)
+    # Latest maximum-likelihood solution, used to warm-start IRLS. For the
+    # online estimator, this is the posterior mean and _posterior_precision and
+    # _posterior_cov are the precision and covariance of the posterior.
+    self._w = np.zeros(dim)
+    self._posterior_precision = np.eye(dim) / np.square(sigma0)
+    self._posterior_cov = np.eye(dim) * np.square(sigma0)
+
+  @property
+  def _arms(self):
+    """The arms pulled so far."""
+    return self._arm_buffer[:self._num_pulls]
+
+  @property
+  def _rewards(self):
+    """The rewards observed so far."""
+    return self._reward_buffer[:self._num_pulls]
 
   def update(self, reward, arm):
     """Updates state with arm and reward.
@@ -63,16 +104,51 @@ class GLMAlgorithm(object):
     """
     assert len(arm) == self._dim, 'Expected dimension {}, got {}'.format(
         self._dim, len(arm))
-    self._rewards = np.append(self._rewards, reward)
-    self._arms = np.concatenate((self._arms, [arm]), axis=0)
+    arm = np.asarray(arm, dtype=np.float64)
     self._outer += np.outer(arm, arm)
+    gram_inv_arm = self._gram_inv.dot(arm)
+    self._gram_inv -= np.outer(gram_inv_arm,
+                               gram_inv_arm) / (1. + arm.dot(gram_inv_arm))
+    if self._estimator == 'online':
+      self._online_update(reward, arm)
+      return
+    if self._num_pulls == len(self._reward_buffer):
+      self._arm_buffer = np.concatenate(
+          (self._arm_buffer, np.zeros_like(self._arm_buffer)), axis=0)
+      self._reward_buffer = np.concatenate(
+          (self._reward_buffer, np.zeros_like(self._reward_buffer)))
+    self._arm_buffer[self._num_pulls] = arm
+    self._reward_buffer[self._num_pulls] = reward
+    self._num_pulls += 1
+
+  def _online_update(self, reward, arm):
+    """Updates the Laplace approximation of the posterior with one pull.
+
+    The precision is increased by the Hessian of the logistic loss at the
+    current mean, and the mean takes one Newton step using the updated
+    covariance.
+
+    Args:
+      reward: the reward received
+      arm: the arm that was pulled
+    """
+    sig_arm_w = special.expit(arm.dot(self._w))
+    weight = sig_arm_w * (1 - sig_arm_w)
+    self._posterior_precision += weight * np.outer(arm, arm)
+    cov_arm = self._posterior_cov.dot(arm)
+    self._posterior_cov -= weight * np.outer(cov_arm, cov_arm) / (
+        1. + weight * arm.dot(cov_arm))
+    self._w = self._w - self._posterior_cov.dot((sig_arm_w - reward) * arm)
 
   def solve_logistic_bandit(self, init_iters=10, num_iters=20, tol=1e-3):
     """Solves the maximum-likelihood problem.
 
     Implements iterative reweighted least squares for Bayesian logistic
     regression. See sections 4.3.3 and 4.5.1 in Pattern Recognition and Machine
-    Learning, Bishop (2006)
+    Learning, Bishop (2006). The iterations are warm-started from the previous
+    solution, which is usually within tolerance after one or two iterations.
+    With the online estimator, returns the current posterior mean and
+    precision instead.
 
     Args:
       init_iters: number of initial iterations to skip (returns zeros)
@@ -83,22 +159,27 @@ class GLMAlgorithm(object):
       w: maximum likelihood solution
       gram: Gram matrix
     """
+    if self._estimator == 'online':
+      return self._w, self._posterior_precision
 
     arms = self._arms
+    rewards = self._rewards
+    prior_precision = np.eye(self._dim) / np.square(self._sigma0)
     w = np.zeros(self._dim)
-    gram = np.eye(self._dim) / np.square(self._sigma0)
-    if len(self._arms) > init_iters:
+    gram = prior_precision
+    if len(arms) > init_iters:
+      w = self._w
       for _ in range(num_iters):
-        prev_w = np.copy(w)
+        prev_w = w
         arms_w = arms.dot(w)
         sig_arms_w = special.expit(arms_w)
-        r = np.diag(sig_arms_w * (1 - sig_arms_w))
-        gram = (((arms.T).dot(r)).dot(arms) +
-                np.eye(self._dim) / np.square(self._sigma0))
-        rz = r.dot(arms_w) - (sig_arms_w - self._rewards)
+        weights = sig_arms_w * (1 - sig_arms_w)
+        gram = (arms.T).dot(weights[:, None] * arms) + prior_precision
+        rz = weights * arms_w - (sig_arms_w - rewards)
         w = np.linalg.solve(gram, (arms.T).dot(rz))
         if np.linalg.norm(w - prev_w) < tol:
           break
+      self._w = w
 
     return w, gram
 
@@ -127,8 +208,13 @@ class UCB_GLM(GLMAlgorithm):  # pylint: disable=invalid-name
   by Li et al. (2017).
   """
 
-  def __init__(self, dim, horizon, sigma0=1., optimism_scaling=1.):
-    super(UCB_GLM, self).__init__(dim, sigma0, optimism_scaling)
+  def __init__(self,
+               dim,
+               horizon,
+               sigma0=1.,
+               optimism_scaling=1.,
+               estimator='irls'):
+    super(UCB_GLM, self).__init__(dim, sigma0, optimism_scaling, estimator)
     # Set confidence interval scaling, by
     # Theorem 2 in Li (2017)
     # Provably Optimal Algorithms for Generalized Linear Contextual Bandits
@@ -151,8 +237,7 @@ class UCB_GLM(GLMAlgorithm):  # pylint: disable=invalid-name
       The selected arm, its index in arms, and the computed scores
     """
     arm_matrix = self.get_arm_matrix(arms)
-    gram = self._outer + np.eye(self._dim) / np.square(self._sigma0)
-    gram_inv = np.linalg.inv(gram)
+    gram_inv = self._gram_inv
     ucbs = np.sqrt((np.matmul(arm_matrix, gram_inv) * arm_matrix).sum(axis=1))
     # Estimate w
     w, _ = self.solve_logistic_bandit()
@@ -162,6 +247,24 @@ class UCB_GLM(GLMAlgorithm):  # pylint: disable=invalid-name
 
     return arms[arm], arm, mu
 
+  def get_arms(self, arm_tensor):
+    """Computes which arm to pull next for a batch of users.
+
+    The model is shared by all users, so the parameters are estimated once.
+
+    Args:
+      arm_tensor: a [num_users, num_arms, dim] array of arm feature vectors.
+    Returns:
+      The [num_users] indices of the selected arms and the [num_users,
+        num_arms] computed scores.
+    """
+    arm_tensor = np.asarray(arm_tensor)
+    ucbs = np.sqrt(
+        np.einsum('uad,de,uae->ua', arm_tensor, self._gram_inv, arm_tensor))
+    w, _ = self.solve_logistic_bandit()
+    mu = np.matmul(arm_tensor, w) + self._ci_scaling * ucbs
+    return _argmax_random_ties(mu), mu
+
   @staticmethod
   def print():
     return 'GLM-UCB'
@@ -182,17 +285,50 @@ class GLM_TS(GLMAlgorithm):  # pylint: disable=invalid-name
       The selected arm, its index in arms, and the computed scores
     """
     arm_matrix = self.get_arm_matrix(arms)
-    w, gram = self.solve_logistic_bandit()
-    gram_inv = np.square(self._optimism_scaling) * np.linalg.inv(gram)
 
     # Posterior sampling
-    w_tilde = np.random.multivariate_normal(w, gram_inv)
+    w_tilde = self._sample_weights(1)[0]
     mu = np.matmul(arm_matrix, w_tilde)
     # Argmax breaking ties randomly
     arm = np.random.choice(np.flatnonzero(mu == mu.max()))
 
     return arms[arm], arm, mu
 
+  def get_arms(self, arm_tensor):
+    """Computes which arm to pull next for a batch of users.
+
+    Each user gets an independent posterior sample, but all samples are drawn
+    from a single factorization of the posterior precision.
+
+    Args:
+      arm_tensor: a [num_users, num_arms, dim] array of arm feature vectors.
+    Returns:
+      The [num_users] indices of the selected arms and the [num_users,
+        num_arms] computed scores.
+    """
+    arm_tensor = np.asarray(arm_tensor)
+    w_tilde = self._sample_weights(len(arm_tensor))
+    mu = np.einsum('uad,ud->ua', arm_tensor, w_tilde)
+    return _argmax_random_ties(mu), mu
+
+  def _sample_weights(self, num_samples):
+    """Draws posterior samples of the weight vector.
+
+    If the Gram (precision) matrix factors as L.L^T, then L^-T.z has covariance
+    inverse(gram) for standard normal z, so all samples take one Cholesky
+    factorization and one triangular solve.
+
+    Args:
+      num_samples: the number of samples to draw.
+    Returns:
+      A [num_samples, dim] array of weight vectors.
+    """
+    w, gram = self.solve_logistic_bandit()
+    chol = np.linalg.cholesky(gram)
+    noise = np.random.standard_normal((self._dim, num_samples))
+    deviations = linalg.solve_triangular(chol, noise, lower=True, trans='T')
+    return w + self._optimism_scaling * deviations.T
+
   @staticmethod
   def print():
     return 'GLM-TS'
@@ -15,6 +15,7 @@
 # limitations under the License.
 """Tests for recsim.agents.bandits.glm_algorithm."""
 
+from absl.testing import parameterized
 import numpy as np
 from recsim.agents.bandits import glm_algorithms
 from scipy import special
@@ -40,6 +41,20 @@ class UCB_GLMTest(tf.test.TestCase):  # pylint: disable=invalid-name
     self.add_random_arms(n_arms)
     self.assertLen(self._alg._arms, n_arms)
 
+  def test_update_grows_buffers(self):
+    n_arms = 200
+    self.add_random_arms(n_arms)
+    self.assertLen(self._alg._arms, n_arms)
+    self.assertLen(self._alg._rewards, n_arms)
+    self.assertGreaterEqual(len(self._alg._arm_buffer), n_arms)
+
+  def test_gram_inverse(self):
+    self.add_random_arms(50)
+    gram = self._alg._outer + np.eye(self._dim) / np.square(self._alg._sigma0)
+    self.assertAllClose(np.linalg.inv(gram), self._alg._gram_inv)
+    self.assertAllClose(
+        self._alg._arms.T.dot(self._alg._arms), self._alg._outer)
+
   def test_arm_matrix(self):
     n_arms = 10
     arms = [np.random.uniform(size=self._dim) for _ in range(n_arms)]
@@ -53,6 +68,16 @@ class UCB_GLMTest(tf.test.TestCase):  # pylint: disable=invalid-name
     self.assertEqual(np.shape(w), (self._dim,))
     self.assertEqual(np.shape(gram), (self._dim, self._dim))
 
+  def test_solve_logistic_bandit_warm_start(self):
+    self.add_random_arms(100)
+    w, gram = self._alg.solve_logistic_bandit(tol=1e-8)
+    self.add_random_arms(1)
+    w, gram = self._alg.solve_logistic_bandit(tol=1e-8)
+    self._alg._w = np.zeros(self._dim)
+    cold_w, cold_gram = self._alg.solve_logistic_bandit(tol=1e-8)
+    self.assertAllClose(cold_w, w)
+    self.assertAllClose(cold_gram, gram)
+
   def test_learning(self):
     # Construct a set of arms
     n_arms = 10
@@ -67,6 +92,19 @@ class UCB_GLMTest(tf.test.TestCase):  # pylint: disable=invalid-name
       reward = np.random.binomial(1, special.expit(np.dot(arm, w_star)))
       self._alg.update(reward, arm)
 
+  def test_get_arms(self):
+    self.add_random_arms(20)
+    n_users = 5
+    n_arms = 10
+    arm_tensor = np.random.uniform(size=(n_users, n_arms, self._dim))
+    arm_ids, scores = self._alg.get_arms(arm_tensor)
+    self.assertEqual((n_users,), arm_ids.shape)
+    self.assertEqual((n_users, n_arms), scores.shape)
+    for arm_matrix, arm_id, user_scores in zip(arm_tensor, arm_ids, scores):
+      _, expected_arm_id, expected_scores = self._alg.get_arm(list(arm_matrix))
+      self.assertEqual(expected_arm_id, arm_id)
+      self.assertAllClose(expected_scores, user_scores)
+
 
 class GLM_TSTest(tf.test.TestCase):  # pylint: disable=invalid-name
 
@@ -89,6 +127,67 @@ class GLM_TSTest(tf.test.TestCase):  # pylint: disable=invalid-name
       reward = np.random.binomial(1, special.expit(np.dot(arm, w_star)))
       self._alg.update(reward, arm)
 
+  def test_get_arms(self):
+    n_users = 5
+    n_arms = 20
+    arm_tensor = np.random.uniform(size=(n_users, n_arms, self._dim))
+    arm_ids, scores = self._alg.get_arms(arm_tensor)
+    self.assertEqual((n_users,), arm_ids.shape)
+    self.assertEqual((n_users, n_arms), scores.shape)
+    self.assertAllEqual(np.argmax(scores, axis=1), arm_ids)
+
+  def test_sample_weights(self):
+    np.random.seed(0)
+    for _ in range(50):
+      arm = np.random.uniform(size=self._dim)
+      self._alg.update(np.random.binomial(1, 0.5), arm)
+    w, gram = self._alg.solve_logistic_bandit()
+    samples = self._alg._sample_weights(100000)
+    self.assertAllClose(w, np.mean(samples, axis=0), atol=0.02)
+    self.assertAllClose(
+        np.linalg.inv(gram), np.cov(samples, rowvar=False), atol=0.02)
+
+
+class OnlineEstimatorTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((glm_algorithms.UCB_GLM, {'horizon': 100}),
+                            (glm_algorithms.GLM_TS, {}))
+  def test_learning(self, algorithm_ctor, kwargs):
+    dim = 3
+    alg = algorithm_ctor(dim, estimator='online', **kwargs)
+    n_arms = 10
+    arms = [np.random.uniform(size=dim) for _ in range(n_arms)]
+    w_star = np.random.normal(size=dim)
+    for _ in range(20):
+      arm, arm_id, scores = alg.get_arm(arms)
+      self.assertLess(arm_id, len(arms))
+      self.assertLen(scores, len(arms))
+      reward = np.random.binomial(1, special.expit(np.dot(arm, w_star)))
+      alg.update(reward, arm)
+    # The history is not stored.
+    self.assertEmpty(alg._arms)
+    self.assertAllClose(
+        np.linalg.inv(alg._posterior_precision), alg._posterior_cov)
+
+  def test_estimate_close_to_irls(self):
+    dim = 3
+    online = glm_algorithms.GLM_TS(dim, estimator='online')
+    irls = glm_algorithms.GLM_TS(dim)
+    w_star = np.array([1.0, -1.0, 0.5])
+    np.random.seed(0)
+    for _ in range(2000):
+      arm = np.random.normal(size=dim)
+      reward = np.random.binomial(1, special.expit(np.dot(arm, w_star)))
+      online.update(reward, arm)
+      irls.update(reward, arm)
+    online_w, _ = online.solve_logistic_bandit()
+    irls_w, _ = irls.solve_logistic_bandit(tol=1e-8)
+    self.assertAllClose(irls_w, online_w, atol=0.2)
+
+  def test_unknown_estimator(self):
+    with self.assertRaises(ValueError):
+      glm_algorithms.GLM_TS(3, estimator='unknown')
+
 
 if __name__ == '__main__':
   tf.test.main()
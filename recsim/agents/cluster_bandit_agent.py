@@ -79,15 +79,31 @@ class GreedyClusterAgent(agent.AbstractEpisodicRecommenderAgent):
     super(GreedyClusterAgent, self).__init__(action_space)
     self._cluster_id = cluster_id
 
+  def score_documents(self, observation):
+    """Returns the cluster_id and quality of every candidate document.
+
+    This allows ClusterBanditAgent to rank the documents of all clusters at
+    once instead of stepping each GreedyClusterAgent.
+
+    Args:
+      observation: An observation whose documents have 'cluster_id' and
+        'quality' fields.
+
+    Returns:
+      A tuple (cluster_ids, qualities) of arrays with one entry per document.
+    """
+    docs = list(observation['doc'].values())
+    cluster_ids = np.fromiter((doc['cluster_id'] for doc in docs),
+                              dtype=np.int64, count=len(docs))
+    qualities = np.array([doc['quality'] for doc in docs],
+                         dtype=np.float64).reshape(len(docs))
+    return cluster_ids, qualities
+
   def step(self, reward, observation):
     del reward
-    my_docs = []
-    my_doc_quality = []
-    for i, doc in enumerate(observation['doc'].values()):
-      if doc['cluster_id'] == self._cluster_id:
-        my_docs.append(i)
-        my_doc_quality.append(doc['quality'])
-    if not bool(my_docs):
+    cluster_ids, qualities = self.score_documents(observation)
+    my_docs = np.flatnonzero(cluster_ids == self._cluster_id)
+    if not my_docs.size:
       return []
-    sorted_indices = np.argsort(my_doc_quality)[::-1]
-    return list(np.array(my_docs)[sorted_indices])
+    sorted_indices = np.argsort(qualities[my_docs])[::-1]
+    return list(my_docs[sorted_indices])
@@ -81,6 +81,27 @@ class ClusterBanditAgentTest(tf.test.TestCase):
     # Documents in Topic 1 sorted by quality: 0, 4, 3.
     self.assertAllEqual(slate, [0, 4, 3, 1, 2])
 
+  def test_bulk_step_matches_base_agents(self):
+    slate_size = 3
+    num_candidates = 10
+    action_space = spaces.MultiDiscrete(num_candidates * np.ones((slate_size,)))
+    agent = cluster_bandit_agent.ClusterBanditAgent(
+        self.dummy_observation_space(), action_space)
+    self.assertIsNotNone(agent._score_documents)
+    sequential_agent = cluster_bandit_agent.ClusterBanditAgent(
+        self.dummy_observation_space(), action_space)
+    sequential_agent._score_documents = None
+    document_sampler = ie.IETopicDocumentSampler(seed=2)
+    for user_obs in ([1, 1, 0, 1], [3, 1, 2, 0], [0, 2, 0, 1]):
+      documents = {
+          i: document_sampler.sample_document().create_observation()
+          for i in range(num_candidates)
+      }
+      observation = self.doc_user_to_sufficient_stats(documents,
+                                                      np.array(user_obs))
+      self.assertAllEqual(
+          sequential_agent.step(0, observation), agent.step(0, observation))
+
   def test_bundle_and_unbundle_trivial(self):
     action_space = spaces.MultiDiscrete(2 * np.ones((2,)))
     agent = cluster_bandit_agent.ClusterBanditAgent(
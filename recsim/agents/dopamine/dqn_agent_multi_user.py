@@ -45,6 +45,7 @@ class ResponseAdapter(object):
     self._input_response_space = input_response_space
     self._single_response_space = input_response_space.spaces[0][0]
     self._response_names = list(self._single_response_space.spaces.keys())
+    self._columns = tuple(enumerate(self._response_names))
     self._response_shape = (len(input_response_space.spaces),
                             len(self._response_names))
     self._response_dtype = np.float32
@@ -62,16 +63,63 @@ class ResponseAdapter(object):
     return self._response_dtype
 
   def encode(self, responses):
+    """Encodes the responses to one slate as a [slate_size, num_fields] array.
+
+    Args:
+      responses: either a sequence of response dictionaries, one per slate
+        position, or a struct-of-arrays dictionary mapping each response name to
+        an array of per-position values. Positions not covered by the responses
+        are left as zeros.
+
+    Returns:
+      A numpy array of shape response_shape.
+    """
     response_tensor = np.zeros(self._response_shape, dtype=self._response_dtype)
-    for i, response in enumerate(responses):
-      # Note: the order of dictionary keys in the self._input_response_space is
-      # not necessarily the same as the order of the keys in the observation
-      # dictionary itself. To guarrantee the position of elements are consistent
-      # with the order in self._response_names, we iterate over keys explicitly.
-      for j, key in enumerate(self.response_names):
-        response_tensor[i, j] = response[key]
+    self._fill(response_tensor, responses)
     return response_tensor
 
+  def encode_batch(self, responses_batch):
+    """Encodes a batch of slate responses as a [B, slate_size, num_fields] array.
+
+    Args:
+      responses_batch: either a sequence of per-slate responses, each accepted
+        by encode(), or a struct-of-arrays dictionary mapping each response name
+        to a [B, slate_size] array.
+
+    Returns:
+      A numpy array of shape (B,) + response_shape.
+    """
+    if isinstance(responses_batch, dict):
+      batch_size = len(responses_batch[self._response_names[0]])
+      response_tensor = np.zeros((batch_size,) + self._response_shape,
+                                 dtype=self._response_dtype)
+      self._fill(response_tensor, responses_batch)
+    else:
+      response_tensor = np.zeros(
+          (len(responses_batch),) + self._response_shape,
+          dtype=self._response_dtype)
+      for responses, slate_tensor in zip(responses_batch, response_tensor):
+        self._fill(slate_tensor, responses)
+    return response_tensor
+
+  def _fill(self, response_tensor, responses):
+    # Note: the order of dictionary keys in the self._input_response_space is
+    # not necessarily the same as the order of the keys in the observation
+    # dictionary itself. To guarrantee the position of elements are consistent
+    # with the order in self._response_names, each column is filled by name
+    # using the precomputed column order.
+    if isinstance(responses, dict):
+      for j, key in self._columns:
+        values = np.asarray(responses[key])
+        response_tensor[..., :values.shape[-1], j] = values
+    else:
+      responses = tuple(responses)
+      num_responses = len(responses)
+      for j, key in self._columns:
+        response_tensor[:num_responses, j] = [
+            response[key] for response in responses
+        ]
+
 
 @gin.configurable
 class ObservationAdapter(object):
@@ -139,11 +187,21 @@ class ObservationAdapter(object):
 
 # The following functions creates the DQN network for RecSim.
 def recsim_dqn_network(user, doc, scope):
+  """Returns Q-values of [batch, 1], sharing the variables of scope.
+
+  Unlike Keras layers, tf.layers reuse the variables of an existing scope, so
+  that all calls with the same scope evaluate the same network.
+
+  Args:
+    user: a [batch, user_features] tensor.
+    doc: a [batch, doc_features] tensor.
+    scope: str, the variable scope of the network.
+  """
   inputs = tf.concat([user, doc], axis=1)
   with tf.variable_scope(scope, reuse=tf.AUTO_REUSE):
-    hidden = tf.keras.layers.Dense(256, activation=tf.nn.relu)(inputs)
-    hidden = tf.keras.layers.Dense(32, activation=tf.nn.relu)(hidden)
-    q_value = tf.keras.layers.Dense(1, name='output')(hidden)
+    hidden = tf.layers.dense(inputs, 256, activation=tf.nn.relu, name='dense')
+    hidden = tf.layers.dense(hidden, 32, activation=tf.nn.relu, name='dense_1')
+    q_value = tf.layers.dense(hidden, 1, name='output')
   return q_value
 
 
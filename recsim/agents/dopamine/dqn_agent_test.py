@@ -0,0 +1,81 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.agents.dopamine.dqn_agent."""
+
+from gym import spaces
+import numpy as np
+from recsim.agents.dopamine import dqn_agent
+import tensorflow.compat.v1 as tf
+
+
+class ResponseAdapterTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ResponseAdapterTest, self).setUp()
+    single_response_space = spaces.Dict({
+        'click': spaces.Discrete(2),
+        'watch_time': spaces.Box(low=0.0, high=np.inf, shape=()),
+    })
+    self._adapter = dqn_agent.ResponseAdapter(
+        spaces.Tuple((single_response_space,) * 3))
+    self._responses = ({
+        'watch_time': 1.5,
+        'click': 1
+    }, {
+        'click': 0,
+        'watch_time': 0.0
+    }, {
+        'click': 1,
+        'watch_time': 2.0
+    })
+
+  def _expected(self, responses):
+    return np.array(
+        [[r[key] for key in self._adapter.response_names] for r in responses],
+        dtype=np.float32)
+
+  def test_encode(self):
+    self.assertAllClose(
+        self._expected(self._responses), self._adapter.encode(self._responses))
+
+  def test_encode_partial_slate(self):
+    encoded = self._adapter.encode(self._responses[:2])
+    self.assertAllClose(self._expected(self._responses[:2]), encoded[:2])
+    self.assertAllClose(np.zeros(2), encoded[2])
+
+  def test_encode_struct_of_arrays(self):
+    struct = {
+        'click': np.array([1, 0, 1]),
+        'watch_time': np.array([1.5, 0.0, 2.0])
+    }
+    self.assertAllClose(
+        self._adapter.encode(self._responses), self._adapter.encode(struct))
+
+  def test_encode_batch(self):
+    batch = (self._responses, self._responses[::-1])
+    encoded = self._adapter.encode_batch(batch)
+    self.assertEqual((2,) + self._adapter.response_shape, encoded.shape)
+    self.assertAllClose(self._adapter.encode(batch[0]), encoded[0])
+    self.assertAllClose(self._adapter.encode(batch[1]), encoded[1])
+    struct = {
+        'click': np.array([[1, 0, 1], [1, 0, 1]]),
+        'watch_time': np.array([[1.5, 0.0, 2.0], [2.0, 0.0, 1.5]])
+    }
+    self.assertAllClose(encoded, self._adapter.encode_batch(struct))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -39,6 +39,15 @@ class AbstractClickBanditLayer(agent.AbstractHierarchicalAgentLayer):
   confidence bound as index, the AbstractClickBandit will put the partial slate
   of the highest-UCB base agent in first place, then the second, until the slate
   is complete.
+
+  If every base agent provides a score_documents(observation) method, the
+  layer takes a bulk path instead of stepping the base agents one at a time.
+  score_documents is called once per step, on the first base agent, and must
+  return two arrays with one entry per candidate document: the index of the
+  arm (base agent) that would recommend the document, and the document's score
+  within that arm. The candidates are then partitioned by arm with a single
+  sort, and each arm's partial slate consists of its documents in decreasing
+  order of score.
   """
 
   def __init__(self,
@@ -67,6 +76,8 @@ class AbstractClickBanditLayer(agent.AbstractHierarchicalAgentLayer):
                                                    *arm_base_agent_ctors)
     self._alg_ctor = alg_ctor
     self._random_seed = random_seed
+    # The bandit algorithm is created on the first step and reused afterwards.
+    self._mab_alg = None
     self._params = {'optimism_scaling': ci_scaling}
     kwargs['observation_space'] = observation_space
     kwargs['action_space'] = action_space
@@ -89,6 +100,12 @@ class AbstractClickBanditLayer(agent.AbstractHierarchicalAgentLayer):
     self._base_agents = [
         base_agent_ctor(**kwargs) for base_agent_ctor in self._base_agent_ctors
     ]
+    if all(
+        hasattr(base_agent, 'score_documents')
+        for base_agent in self._base_agents):
+      self._score_documents = self._base_agents[0].score_documents
+    else:
+      self._score_documents = None
 
   def _postprocess_actions(self, actions):
     slate = []
@@ -123,9 +140,11 @@ class AbstractClickBanditLayer(agent.AbstractHierarchicalAgentLayer):
     user_obs = observation['user']['sufficient_statistics']
     pulls = user_obs['impression_count']
     clicks = user_obs['click_count']
-    mab_alg = self._alg_ctor(len(pulls), self._params, self._random_seed)
-    mab_alg.set_state(pulls, clicks)
-    arm_pctr_ucb = mab_alg.get_score(np.sum(pulls))
+    if self._mab_alg is None or len(self._mab_alg.pulls) != len(pulls):
+      self._mab_alg = self._alg_ctor(
+          len(pulls), self._params, self._random_seed)
+    self._mab_alg.set_state(pulls, clicks)
+    arm_pctr_ucb = self._mab_alg.get_score(np.sum(pulls))
     # Use (topic_pctr_ucb, document_quality) as the criterion.
     if all(pulls):
       scores = arm_pctr_ucb
@@ -133,11 +152,41 @@ class AbstractClickBanditLayer(agent.AbstractHierarchicalAgentLayer):
       # Pick the topics that have not beeen pulled.
       scores = -pulls
     arm_order = list(np.argsort(scores))
+    if self._score_documents is not None:
+      arm_actions = self._bulk_arm_actions(observation)
     docs_so_far = 0
     actions = []
     while docs_so_far < self._slate_size:
       arm = arm_order.pop()
-      action = self._base_agents[arm].step(reward, observation)
+      if self._score_documents is not None:
+        action = arm_actions(arm)
+      else:
+        action = self._base_agents[arm].step(reward, observation)
       docs_so_far += len(action)
       actions.append(action)
     return self._postprocess_actions(actions)
+
+  def _bulk_arm_actions(self, observation):
+    """Partitions the candidate documents by arm in a single pass.
+
+    Args:
+      observation: the observation passed to step.
+
+    Returns:
+      A function mapping an arm to the list of its documents in decreasing
+      order of score, i.e. to the action its base agent would take. Ties are
+      broken in favor of the later document.
+    """
+    doc_arms, doc_scores = self._score_documents(observation)
+    doc_arms = np.asarray(doc_arms, dtype=np.int64)
+    # Group by arm, then by decreasing score, then by decreasing index.
+    order = np.lexsort(
+        (-np.arange(len(doc_arms)), -np.asarray(doc_scores), doc_arms))
+    counts = np.bincount(doc_arms, minlength=self._num_arms)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    def arm_actions(arm):
+      return list(order[starts[arm]:ends[arm]])
+
+    return arm_actions
@@ -31,10 +31,20 @@ class ClusterClickStatsLayer(sufficient_statistics.SufficientStatisticsLayer):
   number of possible clusters. Every time we increase impression count for a
   cluster if the agent recommends a document from that cluster. We also increase
   click count for a cluster if user responds a click.
+
+  Counts are kept in preallocated arrays which are updated in place and handed
+  to the base agent as read-only views, so the base agent sees the current
+  counts without a copy being made on every step. The views are aliases: within
+  an episode, the counts observed at an earlier step change as the episode goes
+  on, so a base agent keeping the counts of past steps, e.g. in a replay
+  buffer, must copy them. Each episode gets new arrays, so the counts observed
+  in an episode that has ended remain those at its end. When num_users is
+  given, the layer tracks a [num_users, num_clusters] array of counts for a
+  vectorized environment serving num_users users at once.
   """
 
   def __init__(self, base_agent_ctor, observation_space, action_space,
-               **kwargs):
+               num_users=None, **kwargs):
     """Initializes a ClusterClickStatsLayer object.
 
     Args:
@@ -42,6 +52,8 @@ class ClusterClickStatsLayer(sufficient_statistics.SufficientStatisticsLayer):
       observation_space: a gym.spaces object specifying the format of
         observations.
       action_space: A gym.spaces object that specifies the format of actions.
+      num_users: If not None, the number of users whose responses are batched
+        in each observation. Counts then have shape [num_users, num_clusters].
       **kwargs: arguments to pass to the downstream agent at construction time.
     """
     single_response_space = observation_space.spaces['response'].spaces[0]
@@ -52,50 +64,98 @@ class ClusterClickStatsLayer(sufficient_statistics.SufficientStatisticsLayer):
     if isinstance(cluster_id_space, spaces.Box):
       if len(cluster_id_space.high) > 1:
         raise ValueError('cluster_id response field must be 0 dimensional.')
-      num_clusters = cluster_id_space.high
+      num_clusters = int(np.asarray(cluster_id_space.high).flat[0])
     elif isinstance(cluster_id_space, spaces.Discrete):
       num_clusters = cluster_id_space.n
     else:
       raise ValueError('cluster_id response field must be either gym.spaces.Box'
                        ' or gym spaces.Discrete')
     self._num_clusters = num_clusters
+    self._num_users = num_users
     if 'click' not in single_response_space.spaces:
       raise ValueError(
           'observation_space.spaces[\'response\'] must contain \'click\' key.')
+    if num_users is None:
+      stats_shape = (num_clusters,)
+    else:
+      stats_shape = (num_users, num_clusters)
+    self._stats_shape = stats_shape
     suf_stat_space = spaces.Dict({
         'impression_count':
             spaces.Box(
-                shape=(num_clusters,), dtype=np.float32, low=0.0, high=np.inf),
+                shape=stats_shape, dtype=np.float32, low=0.0, high=np.inf),
         'click_count':
             spaces.Box(
-                shape=(num_clusters,), dtype=np.float32, low=0.0, high=np.inf)
+                shape=stats_shape, dtype=np.float32, low=0.0, high=np.inf)
     })
     super(ClusterClickStatsLayer,
           self).__init__(base_agent_ctor, observation_space, action_space,
                          suf_stat_space, **kwargs)
 
   def _create_observation(self):
-    return {
-        'impression_count':
-            np.array(self._sufficient_statistics['impression_count']),
-        'click_count':
-            np.array(self._sufficient_statistics['click_count']),
-    }
+    return self._count_views
+
+  def _response_arrays(self, responses):
+    """Returns (row, cluster_id, click) index arrays for the given responses.
+
+    Args:
+      responses: Either a struct-of-arrays dictionary mapping 'cluster_id' and
+        'click' to arrays of per-position values, or a sequence of per-position
+        response dictionaries. In the batched form, the arrays have a leading
+        num_users dimension and the sequence contains one slate of responses
+        (or None) per user.
+
+    Returns:
+      A tuple (rows, cluster_ids, clicks) of flat arrays, where rows indexes the
+      user of each response and is None when the layer is not batched.
+    """
+    if isinstance(responses, dict):
+      cluster_ids = np.asarray(responses['cluster_id'], dtype=np.int64)
+      clicks = np.asarray(responses['click'], dtype=np.int64)
+      if self._num_users is None:
+        return None, cluster_ids.ravel(), clicks.ravel()
+      rows = np.broadcast_to(
+          np.arange(self._num_users).reshape((-1,) + (1,) *
+                                             (cluster_ids.ndim - 1)),
+          cluster_ids.shape)
+      return rows.ravel(), cluster_ids.ravel(), clicks.ravel()
+    if self._num_users is None:
+      cluster_ids = np.fromiter(
+          (response['cluster_id'] for response in responses), dtype=np.int64)
+      clicks = np.fromiter(
+          (response['click'] for response in responses), dtype=np.int64)
+      return None, cluster_ids, clicks
+    slates = [(user, slate) for user, slate in enumerate(responses)
+              if slate is not None]
+    rows = np.fromiter(
+        (user for user, slate in slates for _ in slate), dtype=np.int64)
+    cluster_ids = np.fromiter(
+        (response['cluster_id'] for _, slate in slates for response in slate),
+        dtype=np.int64)
+    clicks = np.fromiter(
+        (response['click'] for _, slate in slates for response in slate),
+        dtype=np.int64)
+    return rows, cluster_ids, clicks
 
   def _update(self, observation):
     """Updates user impression/click count given user response on each item."""
     if self._sufficient_statistics is None:
-      self._sufficient_statistics = {
-          'impression_count': [
-              0,
-          ] * self._num_clusters,
-          'click_count': [
-              0,
-          ] * self._num_clusters
-      }
+      self._reset()
     if observation['response'] is not None:
-      for response in observation['response']:
-        cluster_id = int(response['cluster_id'])
-        self._sufficient_statistics['impression_count'][cluster_id] += 1
-        if response['click']:
-          self._sufficient_statistics['click_count'][cluster_id] += 1
+      rows, cluster_ids, clicks = self._response_arrays(observation['response'])
+      index = cluster_ids if rows is None else (rows, cluster_ids)
+      np.add.at(self._sufficient_statistics['impression_count'], index, 1)
+      np.add.at(self._sufficient_statistics['click_count'], index, clicks != 0)
+
+  def _reset(self):
+    """Allocates zeroed counts for a new user."""
+    # Views handed out in the previous episode keep its final counts.
+    self._sufficient_statistics = {
+        'impression_count': np.zeros(self._stats_shape, dtype=np.int64),
+        'click_count': np.zeros(self._stats_shape, dtype=np.int64),
+    }
+    self._count_views = {}
+    for key, value in self._sufficient_statistics.items():
+      view = value.view()
+      view.flags.writeable = False
+      self._count_views[key] = view
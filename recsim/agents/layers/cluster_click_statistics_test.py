@@ -126,6 +126,74 @@ class ClusterClickStatisticsTest(tf.test.TestCase):
     self.assertAllEqual(obs['impression_count'], np.array([2, 2]))
     self.assertAllEqual(obs['click_count'], np.array([1, 1]))
 
+  def test_observation_is_read_only_view(self):
+    obs = self.click_stats._create_observation()
+    with self.assertRaises(ValueError):
+      obs['click_count'][0] = 1
+    self.click_stats._update({
+        'response': {
+            'click': np.array([1, 1]),
+            'cluster_id': np.array([1, 1])
+        }
+    })
+    # Within an episode, the views handed out earlier reflect the updated
+    # counts.
+    self.assertAllEqual(obs['impression_count'], np.array([0, 2]))
+    self.assertAllEqual(obs['click_count'], np.array([0, 2]))
+    self.assertIs(obs['click_count'],
+                  self.click_stats._create_observation()['click_count'])
+    # The views of an ended episode keep its final counts.
+    self.click_stats.end_episode(0, {'user': 0, 'doc': {}, 'response': None})
+    self.click_stats._update({
+        'response': {
+            'click': np.array([1, 0]),
+            'cluster_id': np.array([0, 1])
+        }
+    })
+    self.assertAllEqual(obs['impression_count'], np.array([0, 2]))
+    self.assertAllEqual(obs['click_count'], np.array([0, 2]))
+    new_obs = self.click_stats._create_observation()
+    self.assertAllEqual(new_obs['impression_count'], np.array([1, 1]))
+    self.assertAllEqual(new_obs['click_count'], np.array([1, 0]))
+
+  def test_batched_update(self):
+    num_users = 3
+    click_stats = cluster_click_statistics.ClusterClickStatsLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        num_users=num_users)
+    _, mock_agent_kwargs = self.mock_agent.call_args
+    self.assertNotIn('num_users', mock_agent_kwargs)
+    self.assertEqual(
+        (num_users, self.num_clusters),
+        mock_agent_kwargs['observation_space'].spaces['user']
+        ['sufficient_statistics']['click_count'].shape)
+    click_stats._update({
+        'response': {
+            'click': np.array([[1, 0], [0, 0], [1, 1]]),
+            'cluster_id': np.array([[0, 1], [1, 1], [0, 0]])
+        }
+    })
+    click_stats._update({
+        'response': (({
+            'click': 1,
+            'cluster_id': 1
+        }, {
+            'click': 0,
+            'cluster_id': 0
+        }), None, ({
+            'click': 0,
+            'cluster_id': 1
+        }, {
+            'click': 0,
+            'cluster_id': 1
+        }))
+    })
+    obs = click_stats._create_observation()
+    self.assertAllEqual([[2, 2], [0, 2], [2, 2]], obs['impression_count'])
+    self.assertAllEqual([[1, 1], [0, 0], [2, 0]], obs['click_count'])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -19,10 +19,114 @@ from __future__ import division
 from __future__ import print_function
 
 from gym import spaces
+import numpy as np
 
 from recsim.agents.layers import sufficient_statistics
 
 
+class _RingBuffer(object):
+  """A fixed-capacity history of values ordered from newest to oldest.
+
+  Values are stored twice in an array of length 2 * capacity, at positions
+  p and p + capacity, with p decreasing by one (modulo capacity) on every
+  append. The last k values are then always the contiguous slice [p, p + k),
+  newest first, so appending is O(1) and reading the history never copies.
+
+  Numeric values of a fixed shape and dtype are stored in a single array of
+  shape [2 * capacity] + value_shape. Other values (dictionaries, tuples of
+  responses, or values whose shape or dtype changes) fall back to an object
+  array holding references.
+  """
+
+  def __init__(self, capacity):
+    self._capacity = capacity
+    self._position = 0
+    self._values = None
+    self._valid = np.zeros(2 * capacity, dtype=bool)
+
+  def _allocate(self, value):
+    array = None if isinstance(value, dict) else np.asarray(value)
+    if array is None or array.dtype == object:
+      self._values = np.empty(2 * self._capacity, dtype=object)
+    else:
+      self._values = np.zeros(
+          (2 * self._capacity,) + array.shape, dtype=array.dtype)
+
+  def _fits(self, value):
+    if self._values.dtype == object:
+      return True
+    if isinstance(value, dict):
+      return False
+    array = np.asarray(value)
+    return (array.shape == self._values.shape[1:] and
+            np.can_cast(array.dtype, self._values.dtype))
+
+  def _convert_to_object(self):
+    values = np.empty(2 * self._capacity, dtype=object)
+    for index in np.flatnonzero(self._valid):
+      values[index] = np.copy(self._values[index])
+    self._values = values
+
+  def append(self, value):
+    """Records value as the newest entry, dropping the oldest one."""
+    self._position = (self._position - 1) % self._capacity
+    indices = [self._position, self._position + self._capacity]
+    self._valid[indices] = value is not None
+    if value is None:
+      return
+    if self._values is None:
+      self._allocate(value)
+    elif not self._fits(value):
+      self._convert_to_object()
+    for index in indices:
+      self._values[index] = value
+
+  def __getitem__(self, age):
+    """Returns the value appended age steps ago, or None if it was None.
+
+    Numeric values are copied out of the buffer, which later appends overwrite.
+    """
+    index = self._position + age
+    if not self._valid[index]:
+      return None
+    if self._values.dtype == object:
+      return self._values[index]
+    return np.copy(self._values[index])
+
+  def view(self, length):
+    """Returns read-only views of the last length values and their validity.
+
+    Args:
+      length: number of entries to return, at most the capacity.
+
+    Returns:
+      A tuple (values, valid) of arrays with leading dimension length ordered
+      from newest to oldest. valid[i] is False where the appended value was
+      None, in which case values[i] is zero (or None for object storage).
+    """
+    window = slice(self._position, self._position + length)
+    if self._values is None:
+      values = np.empty(length, dtype=object)
+    else:
+      values = self._values[window]
+    valid = self._valid[window]
+    values.flags.writeable = False
+    valid.flags.writeable = False
+    return values, valid
+
+
+def _stacked_space(space, length):
+  """Returns the space of length values of space, as returned by view()."""
+  if isinstance(space, spaces.Box):
+    return spaces.Box(
+        low=np.stack([space.low] * length),
+        high=np.stack([space.high] * length),
+        dtype=space.dtype)
+  if isinstance(space, spaces.Discrete):
+    return spaces.MultiDiscrete([space.n] * length)
+  return spaces.Tuple([space] * length)
+
+
 class FixedLengthHistoryLayer(sufficient_statistics.SufficientStatisticsLayer):
   r"""Creates a buffer of the last k rewards and observations.
 
@@ -33,6 +137,14 @@ class FixedLengthHistoryLayer(sufficient_statistics.SufficientStatisticsLayer):
   there are not enough observations to fill the buffer, so they will be filled
   with None. Each non-vacuous element of the tuple is an instance of
   (a subset of) observation_space.
+
+  The history is kept in one preallocated circular buffer per remembered
+  feature. With array_history, the sufficient statistics are instead a
+  gym.spaces.Dict mapping each remembered feature to a dictionary with the
+  last k values of the feature as one array ('values', newest first) and a
+  boolean mask of the steps holding a value ('valid'). These arrays are
+  read-only views of the buffer, which are not copied and are overwritten by
+  the next step, so base agents must copy whatever they keep across steps.
   """
 
   def __init__(self,
@@ -43,6 +155,7 @@ class FixedLengthHistoryLayer(sufficient_statistics.SufficientStatisticsLayer):
                remember_user=True,
                remember_response=True,
                remember_doc=False,
+               array_history=False,
                **kwargs):
     r"""Initializes a FixedLengthHistoryLayer object.
 
@@ -58,10 +171,14 @@ class FixedLengthHistoryLayer(sufficient_statistics.SufficientStatisticsLayer):
         observation_space[\'response\'].
       remember_doc: boolean, indicates whether to track
         observation_space[\'doc\'].
+      array_history: boolean, indicates whether to pass the history of each
+        feature to the base agent as arrays instead of a tuple of
+        observations.
       **kwargs: arguments to pass to the downstream agent at construction time.
     """
 
     self._history_length = history_length
+    self._num_steps = 0
     self._features = []
     if remember_user:
       self._features.append('user')
@@ -72,26 +189,78 @@ class FixedLengthHistoryLayer(sufficient_statistics.SufficientStatisticsLayer):
     observation_space_to_remember = spaces.Dict({
         feature: observation_space[feature] for feature in self._features
     })
-    suf_stat_space = spaces.Tuple([
-        observation_space_to_remember,
-    ] * history_length)
+    self._array_history = array_history
+    if array_history:
+      suf_stat_space = spaces.Dict({
+          feature: spaces.Dict({
+              'values':
+                  _stacked_space(observation_space[feature], history_length),
+              'valid':
+                  spaces.MultiBinary(history_length)
+          }) for feature in self._features
+      })
+    else:
+      suf_stat_space = spaces.Tuple([
+          observation_space_to_remember,
+      ] * history_length)
     super(FixedLengthHistoryLayer,
           self).__init__(base_agent_ctor, observation_space, action_space,
                          suf_stat_space, **kwargs)
 
   def _create_observation(self):
-    return tuple(self._sufficient_statistics)
+    if self._array_history:
+      observation = {}
+      for feature in self._features:
+        values, valid = self._sufficient_statistics[feature].view(
+            self._history_length)
+        observation[feature] = {'values': values, 'valid': valid}
+      return observation
+    steps = [{
+        feature: self._sufficient_statistics[feature][age]
+        for feature in self._features
+    } for age in range(self._num_steps)]
+    return tuple(steps + [None] * (self._history_length - self._num_steps))
 
   def _update(self, observation):
-    """Updates user impression/click count given user response on each item."""
+    """Appends the remembered features of observation to the history."""
     if self._sufficient_statistics is None:
-      self._sufficient_statistics = self._history_length * [
-          None,
-      ]
-
-    observation_to_remember = {
-        feature: observation[feature] for feature in self._features
-    }
-    self._sufficient_statistics = [
-        observation_to_remember,
-    ] + self._sufficient_statistics[:-1]
+      self._sufficient_statistics = {
+          feature: _RingBuffer(self._history_length)
+          for feature in self._features
+      }
+    for feature in self._features:
+      self._sufficient_statistics[feature].append(observation[feature])
+    self._num_steps = min(self._num_steps + 1, self._history_length)
+
+  def history(self, feature, length=None):
+    """Returns the most recent values of a remembered feature as an array.
+
+    Unlike the tuple of observations passed to the base agent, this returns a
+    contiguous read-only view of the underlying buffer which is not copied.
+    The view is only valid until the next update.
+
+    Args:
+      feature: one of the remembered features, i.e. 'user', 'response' or
+        'doc'.
+      length: maximum number of steps to return. Defaults to the history
+        length.
+
+    Returns:
+      A tuple (values, valid) of arrays ordered from the newest to the oldest
+      step, whose leading dimension is the number of steps observed so far in
+      the episode, capped at length. valid[i] is False for steps where the
+      feature was None. Numeric features of a fixed shape are returned as an
+      array of shape [steps] + feature_shape, others as an object array.
+    """
+    if feature not in self._features:
+      raise ValueError('Feature {} is not remembered.'.format(feature))
+    if self._sufficient_statistics is None:
+      return np.empty(0, dtype=object), np.empty(0, dtype=bool)
+    if length is None:
+      length = self._history_length
+    return self._sufficient_statistics[feature].view(
+        min(length, self._num_steps))
+
+  def _reset(self):
+    super(FixedLengthHistoryLayer, self)._reset()
+    self._num_steps = 0
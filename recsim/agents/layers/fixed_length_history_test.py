@@ -21,6 +21,7 @@ from __future__ import print_function
 
 from gym import spaces
 import mock
+import numpy as np
 from recsim.agents import cluster_bandit_agent
 from recsim.agents.layers import fixed_length_history
 import tensorflow.compat.v1 as tf
@@ -86,10 +87,90 @@ class FixedLengthHistoryTest(tf.test.TestCase):
     observation = self.test_observation_space.sample()
     self.assertIsNone(self.history._sufficient_statistics)
     self.history._update(observation)
-    self.assertEqual(self.history._sufficient_statistics,
-                     [observation, None, None])
     self.assertEqual(self.history._create_observation(),
                      (observation, None, None))
 
+  def test_history_wraps_around(self):
+    observations = [{
+        'user': np.array([step, -step]),
+        'response': None if step == 1 else ({'click': step},),
+        'doc': {'0': step}
+    } for step in range(5)]
+    for observation in observations:
+      self.history._update(observation)
+    history = self.history._create_observation()
+    self.assertLen(history, self.history_length)
+    for step, observation in zip(history, reversed(observations[2:])):
+      self.assertAllEqual(observation['user'], step['user'])
+      self.assertEqual(observation['response'], step['response'])
+      self.assertEqual(observation['doc'], step['doc'])
+    values, valid = self.history.history('user')
+    self.assertAllEqual([[4, -4], [3, -3], [2, -2]], values)
+    self.assertAllEqual([True] * 3, valid)
+    with self.assertRaises(ValueError):
+      values[0, 0] = 0
+    values, valid = self.history.history('response', length=4)
+    self.assertEqual(({'click': 4},), values[0])
+    self.assertAllEqual([True] * 3, valid)
+    self.history._update(observations[1])
+    values, valid = self.history.history('response')
+    self.assertAllEqual([False, True, True], valid)
+    self.assertIsNone(self.history._create_observation()[0]['response'])
+
+  def test_history_changing_shape(self):
+    self.history._update({'user': np.array([1]), 'response': 0, 'doc': 0})
+    self.history._update({'user': np.array([1, 2]), 'response': 1, 'doc': 0})
+    values, _ = self.history.history('user')
+    self.assertLen(values, 2)
+    self.assertAllEqual([1, 2], values[0])
+    self.assertAllEqual([1], values[1])
+    values, _ = self.history.history('response', length=1)
+    self.assertAllEqual([1], values)
+
+  def test_history_is_reset(self):
+    self.history._update(self.test_observation_space.sample())
+    self.history._reset()
+    values, valid = self.history.history('user')
+    self.assertEmpty(values)
+    self.assertEmpty(valid)
+    self.assertEqual(self.history._create_observation(), (None,) * 3)
+
+  def test_observation_is_not_overwritten(self):
+    self.history._update({'user': np.array([0, 0]), 'response': 0, 'doc': 0})
+    user = self.history._create_observation()[0]['user']
+    for step in range(1, 5):
+      self.history._update({
+          'user': np.array([step, step]),
+          'response': step,
+          'doc': 0
+      })
+    self.assertAllEqual([0, 0], user)
+
+  def test_array_history(self):
+    mock_agent = mock.create_autospec(cluster_bandit_agent.ClusterBanditAgent)
+    history = fixed_length_history.FixedLengthHistoryLayer(
+        mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        self.history_length,
+        remember_doc=False,
+        array_history=True)
+    space = mock_agent.call_args[1]['observation_space'].spaces['user'].spaces[
+        'sufficient_statistics']
+    self.assertCountEqual(['user', 'response'], space.spaces.keys())
+    self.assertEqual(
+        spaces.MultiDiscrete([3] * self.history_length),
+        space['response']['values'])
+    history.step(0, {'user': 1, 'response': 2, 'doc': (0,)})
+    history.step(0, {'user': 0, 'response': 1, 'doc': (0,)})
+    observation = mock_agent.return_value.step.call_args[0][1]
+    statistics = observation['user']['sufficient_statistics']
+    self.assertAllEqual([1, 2, 0], statistics['response']['values'])
+    self.assertAllEqual([True, True, False], statistics['response']['valid'])
+    self.assertAllEqual([0, 1, 0], statistics['user']['values'])
+    self.assertTrue(space.contains(statistics))
+    with self.assertRaises(ValueError):
+      statistics['user']['values'][0] = 1
+
 if __name__ == '__main__':
   tf.test.main()
@@ -92,8 +92,11 @@ class TemporalAggregationLayer(agent.AbstractHierarchicalAgentLayer):
     if document_comparison_fcn is None:
       self._doc_equality_walker = agent_utils.GymSpaceWalker(
           single_doc_space, self._spaces_equal).apply_and_flatten
+      self._doc_key_walker = agent_utils.GymSpaceWalker(
+          single_doc_space, self._quantize, vectorized=True).apply_and_flatten
       self._doc_comparator = self._default_doc_comparator
     else:
+      self._doc_key_walker = None
       self._doc_comparator = document_comparison_fcn
     self._slate_comparator = self._default_slate_comparator
     if aggregation_period > 1:
@@ -126,6 +129,7 @@ class TemporalAggregationLayer(agent.AbstractHierarchicalAgentLayer):
         base_agent_ctor(**kwargs),
     ]
     self._last_slate = None
+    self._last_slate_keys = None
     self._previous_last_slate = None
 
   def _default_doc_comparator(self, doc1, doc2):
@@ -142,14 +146,12 @@ class TemporalAggregationLayer(agent.AbstractHierarchicalAgentLayer):
       all_equal = [
           True,
       ]
-      gym_observation0 = np.array(gym_observations[0])
-      for gym_observation in gym_observations[1:]:
-        gym_observation = np.array(gym_observations)
-        if not np.allclose(
-            gym_observation0, gym_observation, atol=abs_tolerance):
-          all_equal = [
-              False,
-          ]
+      gym_observations = np.array(gym_observations)
+      if not np.allclose(
+          gym_observations[0], gym_observations, atol=abs_tolerance):
+        all_equal = [
+            False,
+        ]
     elif isinstance(gym_space, spaces.discrete.Discrete):
       all_equal = [
           not gym_observations or
@@ -160,6 +162,78 @@ class TemporalAggregationLayer(agent.AbstractHierarchicalAgentLayer):
                                 ' not implemented yet.')
     return list(all_equal)
 
+  def _quantize(self, gym_space, gym_observations, abs_tolerance=10E-5):
+    """Quantizes a leaf of a batch of observations for hashing.
+
+    Box observations are rounded to multiples of abs_tolerance, so that
+    observations considered equal by _spaces_equal mostly share the same key.
+    Observations straddling a rounding boundary get different keys, which is
+    why hash lookups are backed by a comparator-based fallback.
+
+    Args:
+      gym_space: An instance of a Box or Discrete gym space.
+      gym_observations: An array of observations conforming to gym_space,
+        stacked along the first axis.
+      abs_tolerance: the resolution of the quantization of Box observations.
+
+    Returns:
+      A single-element list holding an integer array with one row per
+      observation.
+    """
+    if isinstance(gym_space, spaces.box.Box):
+      quantized = np.round(gym_observations / abs_tolerance)
+    elif isinstance(gym_space, spaces.discrete.Discrete):
+      quantized = gym_observations
+    else:
+      raise NotImplementedError('Gym space type ' + str(type(gym_space)) +
+                                ' not implemented yet.')
+    return [quantized.astype(np.int64).reshape(len(gym_observations), -1)]
+
+  def _doc_keys(self, docs):
+    """Returns a hashable key per document, equal for equal documents."""
+    if not docs:
+      return []
+    quantized = np.concatenate(self._doc_key_walker(docs), axis=1)
+    return [row.tobytes() for row in quantized]
+
+  def _find_slate(self, docs):
+    """Finds the positions among docs of the documents of the last slate.
+
+    Each document of the last slate is matched to a distinct equivalent
+    candidate. With the default comparator, candidates are bucketed by their
+    quantized features and matched by lookup in O(len(docs)). Positions that
+    cannot be matched that way, and all positions when a custom comparator is
+    given, are matched by comparing documents pairwise.
+
+    Args:
+      docs: a list of candidate document observations.
+
+    Returns:
+      slate: a list with the index into docs of each document of the last
+        slate, with None for documents that could not be found.
+    """
+    slate = [None] * self._slate_size
+    used = set()
+    if self._doc_key_walker is not None:
+      candidates_by_key = {}
+      for i, key in reversed(list(enumerate(self._doc_keys(docs)))):
+        candidates_by_key.setdefault(key, []).append(i)
+      for position, key in enumerate(self._last_slate_keys):
+        candidates = candidates_by_key.get(key)
+        if candidates:
+          slate[position] = candidates.pop()
+          used.add(slate[position])
+    for position, doc_index in enumerate(slate):
+      if doc_index is not None:
+        continue
+      for i, doc_features in enumerate(docs):
+        if i not in used and self._doc_comparator(doc_features,
+                                                  self._last_slate[position]):
+          slate[position] = i
+          used.add(i)
+          break
+    return slate
+
   def _preprocess_reward_observation(self, reward, observation):
     # Aggregate reward and adjust discount.
     if self._switching_cost > 0.0:
@@ -184,6 +258,51 @@ class TemporalAggregationLayer(agent.AbstractHierarchicalAgentLayer):
     # Does not modify the action of the base agent.
     return action_list[0]
 
+  def _record_decision(self, slate, docs):
+    """Holds the documents of a slate chosen by the base agent."""
+    new_slate_features = [docs[i] for i in slate]
+    self._previous_last_slate = self._last_slate
+    self._last_slate = new_slate_features
+    if self._doc_key_walker is not None and self._aggregation_period > 1:
+      self._last_slate_keys = self._doc_keys(new_slate_features)
+    self._gamma_accumulator = 1.0
+    self._reward_accumulator = 0.0
+
+  def _reset_episode(self):
+    """Forgets the slate held and the rewards aggregated in an episode."""
+    self._step_count = 0
+    self._last_slate = None
+    self._last_slate_keys = None
+    self._previous_last_slate = None
+    self._gamma_accumulator = 1.0
+    self._reward_accumulator = 0.0
+
+  def begin_episode(self, observation=None):
+    """Starts an episode with a decision of the base agent.
+
+    The first slate of an episode is held for aggregation_period steps,
+    including this one, regardless of where the previous episode ended.
+
+    Args:
+      observation: the first observation of the episode.
+
+    Returns:
+      slate: An integer array of size _slate_size.
+    """
+    self._reset_episode()
+    slate = super(TemporalAggregationLayer,
+                  self).begin_episode(observation=observation)
+    if observation is not None:
+      self._record_decision(slate, list(observation['doc'].values()))
+      self._step_count = 1
+    return slate
+
+  def end_episode(self, reward, observation):
+    slate = super(TemporalAggregationLayer, self).end_episode(
+        reward, observation)
+    self._reset_episode()
+    return slate
+
   def step(self, reward, observation):
     """Preprocesses the reward and observation and calls base agent.
 
@@ -208,34 +327,17 @@ class TemporalAggregationLayer(agent.AbstractHierarchicalAgentLayer):
     """
     reward, observation = self._preprocess_reward_observation(
         reward, observation)
+    docs = list(observation['doc'].values())
     # Is this a decision period?
     if not self._step_count % self._aggregation_period:
-      new_slate_index = self._base_agents[0].step(reward,
-                                                  observation)
-      new_slate_features = [
-          tuple(observation['doc'].values())[i] for i in new_slate_index
-      ]
-      self._previous_last_slate = self._last_slate
-      self._last_slate = new_slate_features
-      slate = new_slate_index
-      self._gamma_accumulator = 1.0
-      self._reward_accumulator = 0.0
+      slate = self._base_agents[0].step(reward, observation)
+      self._record_decision(slate, docs)
     else:
       # Not a decision period, we need to recreate the fixed slate by finding
       # docs with the same features.
-      documents_to_find = list(range(self._slate_size))
-      slate = [None] * self._slate_size
-      for i, doc_features in enumerate(observation['doc'].values()):
-        for missing_doc_position, missing_doc in enumerate(documents_to_find):
-          if not self._doc_comparator(doc_features,
-                                      self._last_slate[missing_doc]):
-            slate[missing_doc] = i
-            documents_to_find.pop(missing_doc_position)
-            break
-        if not documents_to_find:
-          break
-      if documents_to_find:
+      slate = self._find_slate(docs)
+      if None in slate:
         raise RuntimeError(('Temporal aggregation could not recreate previous '
                             'slate because items became unavailable.'))
-
+    self._step_count += 1
     return slate
@@ -0,0 +1,163 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.agents.layers.temporal_aggregation."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from gym import spaces
+import mock
+import numpy as np
+from recsim.agents import cluster_bandit_agent
+from recsim.agents.layers import temporal_aggregation
+import tensorflow.compat.v1 as tf
+
+
+class TemporalAggregationTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(TemporalAggregationTest, self).setUp()
+    self.slate_size = 2
+    self.test_action_space = spaces.MultiDiscrete([4] * self.slate_size)
+    doc_space = spaces.Dict({
+        'topic': spaces.Discrete(3),
+        'quality': spaces.Box(shape=(1,), dtype=np.float32, low=-1., high=1.)
+    })
+    self.test_observation_space = spaces.Dict({
+        'user': spaces.Discrete(2),
+        'response': spaces.Discrete(2),
+        'doc': spaces.Dict({str(i): doc_space for i in range(4)})
+    })
+    self.mock_agent = mock.create_autospec(
+        cluster_bandit_agent.ClusterBanditAgent)
+    self.mock_agent.return_value.step.return_value = [2, 0]
+
+  def _observation(self, docs):
+    return {
+        'user': 0,
+        'response': None,
+        'doc': {str(i): doc for i, doc in enumerate(docs)}
+    }
+
+  def _doc(self, topic, quality):
+    return {'topic': topic, 'quality': np.array([quality])}
+
+  def test_slate_is_held_between_decisions(self):
+    layer = temporal_aggregation.TemporalAggregationLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        aggregation_period=3,
+        switching_cost=0.0)
+    docs = [self._doc(i % 3, 0.1 * i) for i in range(4)]
+    self.assertEqual([2, 0], layer.step(0, self._observation(docs)))
+    # The held documents are found again after the candidates are shuffled.
+    # The quality of document 2 moves by less than the comparison tolerance.
+    shuffled = [docs[1], self._doc(2, 0.2 + 1e-6), docs[3], docs[0]]
+    self.assertEqual([1, 3], layer.step(0, self._observation(shuffled)))
+    self.assertEqual([0, 2],
+                     layer.step(0, self._observation(docs[2:] + docs[:2])))
+    self.assertEqual(1, self.mock_agent.return_value.step.call_count)
+    # The next step is a decision period again.
+    layer.step(0, self._observation(docs))
+    self.assertEqual(2, self.mock_agent.return_value.step.call_count)
+
+  def test_duplicate_documents_are_matched_once(self):
+    layer = temporal_aggregation.TemporalAggregationLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        aggregation_period=2,
+        switching_cost=0.0)
+    doc = self._doc(1, 0.5)
+    layer.step(0, self._observation([doc, self._doc(0, 0.), doc.copy()]))
+    self.assertEqual(
+        [0, 3],
+        layer.step(0, self._observation(
+            [doc, self._doc(0, 0.), self._doc(2, 0.), doc])))
+
+  def test_quantization_boundary_falls_back_to_comparator(self):
+    layer = temporal_aggregation.TemporalAggregationLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        aggregation_period=2,
+        switching_cost=0.0)
+    docs = [self._doc(i % 3, 1.245e-4 * i) for i in range(4)]
+    layer.step(0, self._observation(docs))
+    # Equal within tolerance, but rounds to a different key.
+    moved = [docs[0], docs[1], self._doc(2, 2.51e-4), docs[3]]
+    self.assertNotEqual(
+        layer._doc_keys([docs[2]]), layer._doc_keys([moved[2]]))
+    self.assertEqual([2, 0], layer.step(0, self._observation(moved)))
+
+  def test_custom_comparator(self):
+    layer = temporal_aggregation.TemporalAggregationLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        aggregation_period=2,
+        switching_cost=0.0,
+        document_comparison_fcn=lambda d1, d2: d1['topic'] == d2['topic'])
+    docs = [self._doc(i % 3, 0.1 * i) for i in range(4)]
+    layer.step(0, self._observation(docs))
+    self.assertEqual([1, 0], layer.step(0, self._observation(
+        [self._doc(0, 0.9), self._doc(2, 0.9)])))
+
+  def test_unavailable_documents(self):
+    layer = temporal_aggregation.TemporalAggregationLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        aggregation_period=2,
+        switching_cost=0.0)
+    docs = [self._doc(i % 3, 0.1 * i) for i in range(4)]
+    layer.step(0, self._observation(docs))
+    with self.assertRaises(RuntimeError):
+      layer.step(0, self._observation(docs[:2]))
+
+  def test_episodes_start_with_a_decision(self):
+    self.mock_agent.return_value.begin_episode.return_value = [1, 0]
+    self.mock_agent.return_value.end_episode.return_value = [1, 0]
+    layer = temporal_aggregation.TemporalAggregationLayer(
+        self.mock_agent,
+        self.test_observation_space,
+        self.test_action_space,
+        aggregation_period=2,
+        switching_cost=0.0)
+    docs = [self._doc(i % 3, 0.1 * i) for i in range(4)]
+    other_docs = [self._doc(i % 3, 0.5 + 0.1 * i) for i in range(4)]
+    # An episode of odd length: begin_episode, then a held step, a decision
+    # and the end.
+    self.assertEqual([1, 0], layer.begin_episode(self._observation(docs)))
+    self.assertEqual([1, 0], layer.step(0, self._observation(docs)))
+    self.assertEqual(0, self.mock_agent.return_value.step.call_count)
+    self.assertEqual([2, 0], layer.step(0, self._observation(docs)))
+    layer.end_episode(0, self._observation(docs))
+    # The next episode starts with a decision on new documents, which is
+    # held for its first step.
+    self.assertEqual([1, 0],
+                     layer.begin_episode(self._observation(other_docs)))
+    self.assertEqual(2, self.mock_agent.return_value.begin_episode.call_count)
+    self.assertEqual([1, 0], layer.step(0, self._observation(other_docs)))
+    self.assertEqual(1, self.mock_agent.return_value.step.call_count)
+    self.assertEqual([2, 0], layer.step(0, self._observation(other_docs)))
+    self.assertEqual(2, self.mock_agent.return_value.step.call_count)
+
+
+if __name__ == '__main__':
+  tf.test.main()
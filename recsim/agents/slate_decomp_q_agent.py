@@ -502,12 +502,17 @@ class SlateDecompQAgent(dqn_agent.DQNAgentRecSim,
       # implementation, there is one head for each possible action value, which
       # is designed for computing the argmax operation in the action space.
       # In our implementation, we generate one output for each document.
-      q_value_list = []
-      for i in range(self._num_candidates):
-        user = tf.squeeze(states[:, 0, :, :], axis=2)
-        doc = tf.squeeze(states[:, i + 1, :, :], axis=2)
-        q_value_list.append(self.network(user, doc, scope))
-      q_values = tf.concat(q_value_list, axis=1)
+      # All documents are scored in one pass of the network: the candidates
+      # are folded into the batch dimension, each paired with a copy of the
+      # user observation, so the graph does not grow with their number.
+      num_features = states.get_shape().as_list()[2]
+      user = tf.squeeze(states[:, :1, :, :], axis=3)
+      docs = tf.squeeze(states[:, 1:, :, :], axis=3)
+      users = tf.tile(user, [1, self._num_candidates, 1])
+      q_values = self.network(
+          tf.reshape(users, [-1, num_features]),
+          tf.reshape(docs, [-1, num_features]), scope)
+      q_values = tf.reshape(q_values, [-1, self._num_candidates])
 
     return dqn_agent.DQNNetworkType(q_values)
 
@@ -0,0 +1,73 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.agents.slate_decomp_q_agent."""
+
+from absl.testing import parameterized
+import numpy as np
+from recsim.agents import slate_decomp_q_agent
+from recsim.agents.dopamine import dqn_agent
+from recsim.environments import interest_evolution
+import tensorflow.compat.v1 as tf
+
+
+def _create_environment(num_candidates):
+  return interest_evolution.create_environment({
+      'num_candidates': num_candidates,
+      'slate_size': 2,
+      'resample_documents': True,
+      'seed': 0,
+  })
+
+
+class SlateDecompQAgentTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _create_agent(self, sess, env):
+    return slate_decomp_q_agent.create_agent(
+        'slate_topk_sarsa',
+        sess,
+        observation_space=env.observation_space,
+        action_space=env.action_space)
+
+  def test_network_scores_each_document(self):
+    env = _create_environment(num_candidates=5)
+    with tf.Graph().as_default(), tf.Session() as sess:
+      agent = self._create_agent(sess, env)
+      sess.run(tf.global_variables_initializer())
+      state = agent._obs_adapter.encode(env.reset())[np.newaxis]
+      # The batched network agrees with scoring one document at a time.
+      user = tf.constant(state[:, 0, :, 0])
+      expected = [
+          dqn_agent.recsim_dqn_network(user, tf.constant(state[:, i + 1, :, 0]),
+                                       'Online') for i in range(5)
+      ]
+      q_values, expected = sess.run(
+          [agent._net_outputs.q_values, tf.concat(expected, axis=1)],
+          {agent.state_ph: state})
+      self.assertEqual((1, 5), q_values.shape)
+      self.assertAllClose(expected, q_values)
+
+  @parameterized.parameters(2, 10)
+  def test_network_size(self, num_candidates):
+    env = _create_environment(num_candidates)
+    with tf.Graph().as_default(), tf.Session() as sess:
+      self._create_agent(sess, env)
+      # The online and target networks, with three layers each.
+      self.assertLen(tf.trainable_variables(scope='Online'), 6)
+      self.assertLen(tf.trainable_variables(scope='Target'), 6)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -19,6 +19,8 @@ from __future__ import division
 from __future__ import print_function
 
 import itertools
+import math
+import os
 
 from absl import logging
 from gym import spaces
@@ -28,6 +30,126 @@ from recsim import agent
 from recsim.agents import agent_utils
 
 
+def _place_values(radices, dtype):
+  """Returns the place values of a big-endian mixed-radix number."""
+  place_values = np.ones(len(radices), dtype=dtype)
+  for i in range(len(radices) - 2, -1, -1):
+    place_values[i] = place_values[i + 1] * radices[i + 1]
+  return place_values
+
+
+# Number of checkpoints of the Q and count tables kept on disk.
+CHECKPOINT_DURATION = 4
+_TABLE_FILE_PATTERN = 'tabular_q_{}_{}_ckpt.{}.npy'
+_TABLE_NAMES = ('q_value_table', 'sa_count')
+# Number of written keys after which an _ArrayTable merges its overlay into
+# its arrays, bounding the cost of checking lookups against the overlay.
+_MAX_OVERLAY_SIZE = 2**14
+
+
+class _ArrayTable(object):
+  """An integer-keyed table backed by sorted key and value arrays.
+
+  The arrays are typically memory-mapped from a checkpoint, so values are only
+  read from disk when they are looked up. Writes go to an in-memory overlay,
+  which is merged into in-memory arrays once it holds _MAX_OVERLAY_SIZE keys.
+  """
+
+  def __init__(self, keys, values):
+    self._keys = keys
+    self._values = values
+    self._updates = {}
+    # The overlay keys as an array, rebuilt after new keys are written.
+    self._update_keys = None
+
+  def _find(self, keys):
+    keys = np.asarray(keys, dtype=self._keys.dtype)
+    positions = np.searchsorted(self._keys, keys)
+    found = positions < len(self._keys)
+    found[found] = self._keys[positions[found]] == keys[found]
+    return positions, found
+
+  def lookup(self, keys, default):
+    """Looks up a list of keys, returning default for missing ones."""
+    keys = np.asarray(keys, dtype=self._keys.dtype)
+    positions, found = self._find(keys)
+    values = np.full(len(keys), default, dtype=np.float64)
+    values[found] = self._values[positions[found]]
+    if self._updates:
+      if self._update_keys is None:
+        self._update_keys = np.array(
+            list(self._updates), dtype=self._keys.dtype)
+      updated = np.flatnonzero(np.isin(keys, self._update_keys))
+      values[updated] = [self._updates[key] for key in keys[updated].tolist()]
+    return values
+
+  def get(self, key, default=None):
+    if key in self._updates:
+      return self._updates[key]
+    position = np.searchsorted(self._keys, key)
+    if position < len(self._keys) and self._keys[position] == key:
+      return self._values[position].item()
+    return default
+
+  def __getitem__(self, key):
+    value = self.get(key, self)
+    if value is self:
+      raise KeyError(key)
+    return value
+
+  def __setitem__(self, key, value):
+    if key not in self._updates:
+      self._update_keys = None
+    self._updates[key] = value
+    if len(self._updates) >= _MAX_OVERLAY_SIZE:
+      self._keys, self._values = self.to_arrays()
+      self._updates = {}
+
+  def __contains__(self, key):
+    return self.get(key, self) is not self
+
+  def __len__(self):
+    return len(self._keys) + int(np.sum(~self._find(list(self._updates))[1]))
+
+  def items(self):
+    for key, value in zip(self._keys.tolist(), self._values.tolist()):
+      if key not in self._updates:
+        yield key, value
+    for item in self._updates.items():
+      yield item
+
+  def to_arrays(self):
+    """Returns the merged table as sorted key and value arrays."""
+    if not self._updates:
+      return self._keys, self._values
+    new_keys = np.array(list(self._updates), dtype=self._keys.dtype)
+    new_values = np.array(
+        list(self._updates.values()), dtype=self._values.dtype)
+    positions, found = self._find(new_keys)
+    values = np.array(self._values)
+    values[positions[found]] = new_values[found]
+    keys = np.concatenate([self._keys, new_keys[~found]])
+    values = np.concatenate([values, new_values[~found]])
+    order = np.argsort(keys, kind='stable')
+    return keys[order], values[order]
+
+
+def _table_to_arrays(table, key_dtype, value_dtype):
+  """Returns a table as a pair of key-sorted arrays."""
+  if isinstance(table, _ArrayTable):
+    return table.to_arrays()
+  keys = np.array(list(table.keys()), dtype=key_dtype)
+  values = np.array(list(table.values()), dtype=value_dtype)
+  order = np.argsort(keys, kind='stable')
+  return keys[order], values[order]
+
+
+def _table_file(checkpoint_dir, name, array_name, iteration_number):
+  return os.path.join(
+      checkpoint_dir,
+      _TABLE_FILE_PATTERN.format(name, array_name, iteration_number))
+
+
 class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
   """Tabular Q-learning agent with universal function approximation.
 
@@ -64,6 +186,7 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
                learning_rate=0.1,
                gamma=0.99,
                ordinal_slates=False,
+               max_cached_slates=2**20,
                **kwargs):
     """TabularQAgent init.
 
@@ -83,8 +206,9 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
       number_bins: positive integer number of bins used to discretize continuous
         attributes.
       exploration_policy: either one of ['epsilon_greedy', 'min_count'] or a
-        custom function. TODO(mmladenov): formalize requirements of this
-          function.
+        custom function taking an iterator over (slate, state_action_index)
+        pairs and returning the picked pair, like
+        agent_utils.min_count_exploration.
       exploration_temperature: a real number passed as parameter to the
         exploration policy.
       learning_rate: a real number between 0 and 1 indicating how much to update
@@ -95,6 +219,9 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
       ordinal_slates: boolean indicating whether slate ordering matters, e.g.
         whether the slates (1, 2) and (2, 1) should be considered different
         actions. Using ordinal slates increases complexity factorially.
+      max_cached_slates: the largest number of candidate slates whose
+        enumeration is kept in memory. Larger enumerations are streamed in
+        chunks of this size instead.
       **kwargs: additional arguments like eval_mode.
     """
     self._kwargs = kwargs
@@ -113,32 +240,43 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
     self._discretization_bins = np.linspace(
         discretization_bounds[0], discretization_bounds[1], num=number_bins)
     single_doc_space = list(observation_space.spaces['doc'].spaces.values())[0]
-    slate_tuple = tuple([single_doc_space] * self._slate_size)
-    action_space = spaces.Tuple(slate_tuple)
     self._ignore_response = ignore_response
-    state_action_space = {
-        'user': observation_space.spaces['user'],
-        'action': action_space
-    }
+    state_space = {'user': observation_space.spaces['user']}
     if not self._ignore_response:
-      state_action_space['response'] = observation_space.spaces['response']
-    self._state_action_space = spaces.Dict(state_action_space)
-    self._observation_featurizer = agent_utils.GymSpaceWalker(
-        self._state_action_space, self._discretize_gym_leaf)
+      state_space['response'] = observation_space.spaces['response']
+    self._state_space = spaces.Dict(state_space)
+    self._state_featurizer = agent_utils.GymSpaceWalker(
+        self._state_space, self._discretize_gym_leaf)
+    self._doc_featurizer = agent_utils.GymSpaceWalker(single_doc_space,
+                                                      self._discretize_gym_leaf)
+    # State-action pairs are keyed by fixed-width integers: the discretized
+    # state and each document in the slate are mixed-radix codes, and the key
+    # is state_code * action_radix + action_code.
+    state_radices = self._leaf_radices(self._state_space)
+    doc_radices = self._leaf_radices(single_doc_space)
+    self._doc_radix = int(np.prod(doc_radices, dtype=object))
+    self._action_radix = self._doc_radix**self._slate_size
+    num_keys = int(np.prod(state_radices, dtype=object)) * self._action_radix
+    if num_keys <= np.iinfo(np.int64).max:
+      self._key_dtype = np.int64
+    else:
+      self._key_dtype = object
+    self._state_place_values = _place_values(state_radices, self._key_dtype)
+    self._doc_place_values = _place_values(doc_radices, self._key_dtype)
+    self._slate_place_values = _place_values(
+        [self._doc_radix] * self._slate_size, self._key_dtype)
+    self._slate_indices_cache = {}
+    self._max_cached_slates = max_cached_slates
     # exploration
     self._exploration_policy = exploration_policy
     self._exploration_temperature = exploration_temperature
     self._base_exploration_temperature = self._exploration_temperature
-    self._exploration_functions = {
-        'epsilon_greedy':
-            lambda observation: agent_utils.epsilon_greedy_exploration(  # pylint: disable=g-long-lambda
-                self._enumerate_state_action_indices(observation), self.
-                _q_value_table, self._exploration_temperature),
-        'min_count':
-            lambda observation: agent_utils.min_count_exploration(  # pylint: disable=g-long-lambda
-                self._enumerate_state_action_indices(observation),
-                self._state_action_counts)
-    }
+    # Upper bounds on the Q-values of all slates that have a given document at
+    # a given position, keyed by (state_code, position, doc_code). They are
+    # only maintained for ordinal slates, where they are used to prune the
+    # search for the max-Q slate.
+    self._q_upper_bounds = {}
+    self._action_codes_cache = (None, None)
 
   def _discretize_gym_leaf(self, gym_space, gym_observations):
 
@@ -157,29 +295,203 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
                                   ' not implemented yet.')
     return index
 
-  def _enumerate_slates(self, doc_dict):
-    documents = list(doc_dict.values())
-    num_documents = len(documents)
+  def _leaf_radices(self, gym_space):
+    """Returns the number of distinct discretized values of each leaf entry."""
+
+    def leaf_radices(leaf_space, unused_observations):
+      if isinstance(leaf_space, spaces.box.Box):
+        return [len(self._discretization_bins) + 1] * int(
+            np.prod(leaf_space.shape))
+      elif isinstance(leaf_space, spaces.discrete.Discrete):
+        return [int(leaf_space.n)]
+      raise NotImplementedError('Gym space type ' + str(type(leaf_space)) +
+                                ' not implemented yet.')
+
+    return agent_utils.GymSpaceWalker(gym_space, leaf_radices).apply_and_flatten(
+        [gym_space.sample()])
+
+  def _slate_indices(self, num_documents):
+    """Returns a [num_slates, slate_size] array of all candidate slates."""
+    if num_documents not in self._slate_indices_cache:
+      if self._ordinal_slates:
+        generator_fn = itertools.permutations
+      else:
+        generator_fn = itertools.combinations
+      slates = np.array(
+          list(generator_fn(range(num_documents), self._slate_size)),
+          dtype=np.int64).reshape(-1, self._slate_size)
+      self._slate_indices_cache[num_documents] = slates
+    return self._slate_indices_cache[num_documents]
+
+  def _num_slates(self, num_documents):
+    """Returns the number of candidate slates of num_documents documents."""
+    num_slates = 1
+    for position in range(self._slate_size):
+      num_slates *= num_documents - position
+    if not self._ordinal_slates:
+      num_slates //= math.factorial(self._slate_size)
+    return num_slates
+
+  def _state_code(self, observation):
+    """Discretizes the user (and response) part of the observation once."""
+    state = {'user': observation['user']}
+    if not self._ignore_response:
+      state['response'] = observation['response']
+    digits = self._as_key_digits(
+        self._state_featurizer.apply_and_flatten([state]))
+    return int(digits.dot(self._state_place_values))
+
+  def _doc_codes(self, doc_dict):
+    """Discretizes every candidate document once, returning their codes."""
+    digits = self._as_key_digits([
+        self._doc_featurizer.apply_and_flatten([doc])
+        for doc in doc_dict.values()
+    ])
+    return digits.reshape(len(doc_dict), -1).dot(self._doc_place_values)
+
+  def _as_key_digits(self, digits):
+    """Returns the digits of a key as an array of the key dtype."""
+    if self._key_dtype is object:
+      # The digits are numpy integers, whose products with the place values
+      # would be computed, and overflow, in int64. Python ints do not overflow.
+      digits = np.array(digits, dtype=np.int64)
+      return np.array(
+          [int(d) for d in digits.flatten()],
+          dtype=object).reshape(digits.shape)
+    return np.array(digits, dtype=self._key_dtype)
+
+  def _state_action_keys(self, state_code, doc_codes):
+    """Computes the table keys of all candidate slates.
+
+    The action codes only depend on the candidate documents, so they are reused
+    across steps for as long as the candidate set does not change.
+
+    Args:
+      state_code: the integer code of the discretized state.
+      doc_codes: an array with the integer code of each candidate document.
+
+    Returns:
+      slates: a [num_slates, slate_size] integer array of candidate slates.
+      keys: a list of num_slates integer state-action keys.
+    """
+    slates = self._slate_indices(len(doc_codes))
+    cached_doc_codes, action_codes = self._action_codes_cache
+    doc_codes = tuple(doc_codes.tolist())
+    if doc_codes != cached_doc_codes:
+      action_codes = np.array(
+          doc_codes, dtype=self._key_dtype)[slates].dot(
+              self._slate_place_values)
+      self._action_codes_cache = (doc_codes, action_codes)
+    keys = state_code * self._action_radix + action_codes
+    return slates, keys.tolist()
+
+  def _enumerate_state_action_indices(self, state_code, doc_codes):
+    """Lazily enumerates (slate, state-action key) pairs in slate order."""
     if self._ordinal_slates:
       generator_fn = itertools.permutations
     else:
       generator_fn = itertools.combinations
-    for slate in generator_fn(range(num_documents), self._slate_size):
-      yield slate, tuple([documents[i] for i in slate])
-
-  def _enumerate_state_action_indices(self, observation):
-    for (slate, slate_features) in self._enumerate_slates(observation['doc']):
-      state_action_pair = {
-          'user': observation['user'],
-          'action': slate_features
-      }
-      if not self._ignore_response:
-        state_action_pair['response'] = observation['response']
-      state_action_index = self._observation_featurizer.apply_and_flatten([
-          state_action_pair,
-      ])
-      state_action_index = tuple(state_action_index)
-      yield slate, state_action_index
+    doc_codes = doc_codes.tolist()
+    place_values = self._slate_place_values.tolist()
+    base = state_code * self._action_radix
+    for slate in generator_fn(range(len(doc_codes)), self._slate_size):
+      yield slate, base + sum(
+          doc_codes[doc] * place_value
+          for doc, place_value in zip(slate, place_values))
+
+  def _chunked_greedy_slate(self, state_code, doc_codes):
+    """Finds the max-Q slate, looking up max_cached_slates slates at a time.
+
+    Args:
+      state_code: the integer code of the discretized state.
+      doc_codes: an array with the integer code of each candidate document.
+
+    Returns:
+      slate: the first max-Q slate in enumeration order.
+      state_action_index: its key in the Q-table.
+      q_value: its Q-value.
+    """
+    best = (None, None, -np.inf)
+    enumeration = self._enumerate_state_action_indices(state_code, doc_codes)
+    while True:
+      chunk = list(itertools.islice(enumeration, self._max_cached_slates))
+      if not chunk:
+        return best
+      slates, keys = zip(*chunk)
+      q_values = self._lookup(self._q_value_table, keys)
+      position = np.argmax(q_values)
+      if q_values[position] > best[2]:
+        best = (slates[position], keys[position], q_values[position])
+
+  def _ordinal_greedy_slate(self, state_code, doc_codes):
+    """Finds the max-Q ordinal slate by branch and bound.
+
+    Slates are searched in the same order as itertools.permutations. A slate
+    missing from the Q-table has Q-value 0, and a stored slate has a Q-value
+    at most the upper bound of each of its (position, document) pairs, so
+    prefixes whose bound cannot beat the best slate found so far are pruned.
+
+    Args:
+      state_code: the integer code of the discretized state.
+      doc_codes: an array with the integer code of each candidate document.
+
+    Returns:
+      slate: the max-Q slate.
+      state_action_index: its key in the Q-table.
+      q_value: its Q-value.
+    """
+    doc_codes = doc_codes.tolist()
+    place_values = self._slate_place_values.tolist()
+    bounds = [[
+        self._q_upper_bounds.get((state_code, position, doc_code), -np.inf)
+        for doc_code in doc_codes
+    ]
+              for position in range(self._slate_size)]
+    base = state_code * self._action_radix
+    best = [-np.inf, None, None]
+    slate = []
+
+    def search(position, prefix_code, prefix_bound):
+      for doc, doc_code in enumerate(doc_codes):
+        if doc in slate:
+          continue
+        bound = min(prefix_bound, bounds[position][doc])
+        if max(bound, 0.) <= best[0]:
+          continue
+        code = prefix_code + doc_code * place_values[position]
+        slate.append(doc)
+        if len(slate) == self._slate_size:
+          q_value = self._q_value_table.get(base + code, 0.)
+          if q_value > best[0]:
+            best[:] = [q_value, tuple(slate), base + code]
+        else:
+          search(position + 1, code, bound)
+        slate.pop()
+
+    search(0, 0, np.inf)
+    return best[1], best[2], best[0]
+
+  def _update_q_value(self, state_action_index, q_value):
+    self._q_value_table[state_action_index] = q_value
+    if self._ordinal_slates:
+      self._update_q_upper_bounds(state_action_index, q_value)
+
+  def _update_q_upper_bounds(self, state_action_index, q_value):
+    state_code, action_code = divmod(state_action_index, self._action_radix)
+    for position in range(self._slate_size - 1, -1, -1):
+      action_code, doc_code = divmod(action_code, self._doc_radix)
+      bound_key = (state_code, position, doc_code)
+      if q_value > self._q_upper_bounds.get(bound_key, -np.inf):
+        self._q_upper_bounds[bound_key] = q_value
+
+  def _lookup(self, table, keys, default=0.):
+    """Looks up all keys in table in a single pass."""
+    if isinstance(table, _ArrayTable):
+      return table.lookup(keys, default)
+    return np.fromiter(
+        map(table.get, keys, itertools.repeat(default)),
+        dtype=np.float64,
+        count=len(keys))
 
   def step(self, reward, observation):
     """Records the most recent transition and returns the agent's next action.
@@ -204,47 +516,87 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
     Raises:
       ValueError: if reward is not in [0, 1].
     """
+    # Enumerate the candidate slates once and reuse the enumeration for the
+    # max-Q target and for exploration.
+    state_code = self._state_code(observation)
+    doc_codes = self._doc_codes(observation['doc'])
+    slates, keys, q_values = None, None, None
     # Find max-Q action given the current state and Q-table.
-    max_q_state_action = max(
-        self._enumerate_state_action_indices(observation),
-        key=lambda sa: self._q_value_table.get(sa[1], 0))
-    max_q_next = self._q_value_table.get(max_q_state_action[1], 0)
+    if self._ordinal_slates:
+      max_q_slate, max_q_index, max_q_next = self._ordinal_greedy_slate(
+          state_code, doc_codes)
+    elif self._num_slates(len(doc_codes)) > self._max_cached_slates:
+      # Too many slates to hold their keys in memory.
+      max_q_slate, max_q_index, max_q_next = self._chunked_greedy_slate(
+          state_code, doc_codes)
+    else:
+      slates, keys = self._state_action_keys(state_code, doc_codes)
+      q_values = self._lookup(self._q_value_table, keys)
+      max_position = np.argmax(q_values)
+      max_q_slate = tuple(slates[max_position].tolist())
+      max_q_index = keys[max_position]
+      max_q_next = q_values[max_position]
     # Update the Q-table.
     if self._previous_state_action_index is not None:
       old_q = self._q_value_table.get(self._previous_state_action_index, 0.)
-      self._q_value_table[self._previous_state_action_index] = (
+      self._update_q_value(
+          self._previous_state_action_index,
           self._learning_rate * (reward + self._gamma * max_q_next) +
           (1. - self._learning_rate) * old_q)
       self._state_action_counts[
           self._previous_state_action_index] = self._state_action_counts.get(
               self._previous_state_action_index, 0) + 1
     # Pick next action.
-    if not self._eval_mode:
-      slate, state_action_index = self._exploration_functions[
-          self._exploration_policy](
-              observation)
-      self._previous_state_action_index = state_action_index
+    if self._eval_mode:
+      return max_q_slate
+    if self._exploration_policy == 'epsilon_greedy':
+      if np.random.random() <= self._exploration_temperature:
+        slate, state_action_index = self._random_slate(state_code, doc_codes,
+                                                       slates, keys)
+      else:
+        slate, state_action_index = max_q_slate, max_q_index
+    elif self._exploration_policy == 'min_count':
+      if keys is None:
+        slate, state_action_index = agent_utils.min_count_exploration(
+            self._enumerate_state_action_indices(state_code, doc_codes),
+            self._state_action_counts)
+      else:
+        min_position = np.argmin(
+            self._lookup(self._state_action_counts, keys))
+        slate = tuple(slates[min_position].tolist())
+        state_action_index = keys[min_position]
     else:
-      slate, state_action_index = max_q_state_action
+      slate, state_action_index = self._exploration_policy(
+          self._enumerate_state_action_indices(state_code, doc_codes))
+    self._previous_state_action_index = state_action_index
     return slate
 
+  def _random_slate(self, state_code, doc_codes, slates, keys):
+    """Picks a slate uniformly at random without enumerating all slates."""
+    if slates is not None:
+      position = np.random.randint(len(keys))
+      return tuple(slates[position].tolist()), keys[position]
+    slate = np.random.choice(len(doc_codes), self._slate_size, replace=False)
+    if not self._ordinal_slates:
+      # Unordered slates are keyed by their documents in increasing order, as
+      # enumerated by itertools.combinations.
+      slate = np.sort(slate)
+    slate = tuple(slate.tolist())
+    action_code = np.array(
+        doc_codes, dtype=self._key_dtype)[list(slate)].dot(
+            self._slate_place_values)
+    return slate, state_code * self._action_radix + int(action_code)
+
   def end_episode(self, reward, observation):
     self._exploration_temperature *= self._base_exploration_temperature
-    self._exploration_functions = {
-        'epsilon_greedy':
-            lambda observation: agent_utils.epsilon_greedy_exploration(  # pylint: disable=g-long-lambda
-                self._enumerate_state_action_indices(observation), self.
-                _q_value_table, self._exploration_temperature),
-        'min_count':
-            lambda observation: agent_utils.min_count_exploration(  # pylint: disable=g-long-lambda
-                self._enumerate_state_action_indices(observation),
-                self._state_action_counts)
-    }
     self._previous_state_action_index = None
 
   def bundle_and_checkpoint(self, checkpoint_dir, iteration_number):
     """Returns a self-contained bundle of the agent's state.
 
+    The Q and count tables are written to checkpoint_dir as sorted key and
+    value arrays in .npy format, so they can be memory-mapped when restored.
+
     Args:
       checkpoint_dir: A string for the directory where objects will be saved.
       iteration_number: An integer of iteration number to use for naming the
@@ -253,18 +605,88 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
     Returns:
       A dictionary containing additional Python objects to be checkpointed by
         the experiment. Each key is a string for the object name and the value
-        is actual object. If the checkpoint directory does not exist, returns
-        empty dictionary.
+        is actual object. If the checkpoint directory does not exist, the
+        tables themselves are returned in the dictionary.
     """
-    del checkpoint_dir  # Unused.
-    del iteration_number  # Unused.
-    bundle_dict = {'q_value_table': self._q_value_table}
-    bundle_dict['sa_count'] = self._state_action_counts
+    bundle_dict, write_fn = self._bundle(checkpoint_dir, iteration_number)
+    if write_fn is not None:
+      write_fn()
     return bundle_dict
 
+  def snapshot_bundle(self, checkpoint_dir, iteration_number):
+    """Snapshots the tables, leaving writing them to the returned function.
+
+    The tables are converted to arrays, which are then independent of the
+    agent, so only writing them to disk is deferred.
+
+    Args:
+      checkpoint_dir: A string for the directory where objects will be saved.
+      iteration_number: An integer of iteration number to use for naming the
+        checkpoint file.
+
+    Returns:
+      A tuple (bundle_dict, write_fn), see AbstractRecommenderAgent.
+    """
+    bundle_dict, write_fn = self._bundle(checkpoint_dir, iteration_number)
+    if write_fn is None:
+      bundle_dict = {
+          name: dict(table.items()) for name, table in bundle_dict.items()
+      }
+    return bundle_dict, write_fn
+
+  def _bundle(self, checkpoint_dir, iteration_number):
+    """Returns the bundle and a function writing the table arrays."""
+    if not os.path.isdir(checkpoint_dir):
+      bundle_dict = {'q_value_table': self._q_value_table}
+      bundle_dict['sa_count'] = self._state_action_counts
+      return bundle_dict, None
+    tables = {
+        'q_value_table': (self._q_value_table, np.float64),
+        'sa_count': (self._state_action_counts, np.int64),
+    }
+    arrays = {
+        name: _table_to_arrays(tables[name][0], self._key_dtype,
+                               tables[name][1]) for name in _TABLE_NAMES
+    }
+    allow_pickle = self._key_dtype is object
+
+    def write_fn():
+      for name in _TABLE_NAMES:
+        for array_name, array in zip(('keys', 'values'), arrays[name]):
+          np.save(
+              _table_file(checkpoint_dir, name, array_name, iteration_number),
+              array,
+              allow_pickle=allow_pickle)
+      # Garbage collect the tables of stale checkpoints.
+      stale_iteration_number = iteration_number - CHECKPOINT_DURATION
+      for name in _TABLE_NAMES:
+        for array_name in ('keys', 'values'):
+          stale_file = _table_file(checkpoint_dir, name, array_name,
+                                   stale_iteration_number)
+          if os.path.exists(stale_file):
+            os.remove(stale_file)
+
+    return {'table_format': 'npy'}, write_fn
+
+  def _load_table(self, checkpoint_dir, name, iteration_number):
+    # Object arrays (for keys that do not fit in int64) cannot be mapped.
+    if self._key_dtype is object:
+      load_kwargs = {'allow_pickle': True}
+    else:
+      load_kwargs = {'mmap_mode': 'r'}
+    keys, values = [
+        np.load(
+            _table_file(checkpoint_dir, name, array_name, iteration_number),
+            **load_kwargs) for array_name in ('keys', 'values')
+    ]
+    return _ArrayTable(keys, values)
+
   def unbundle(self, checkpoint_dir, iteration_number, bundle_dict):
     """Restores the agent from a checkpoint.
 
+    Tables checkpointed as arrays are memory-mapped rather than read into
+    memory, so Q-values are only read from disk when they are looked up.
+
     Args:
       checkpoint_dir: A string that represents the path to the checkpoint saved
         by tf.Save.
@@ -276,12 +698,54 @@ class TabularQAgent(agent.AbstractEpisodicRecommenderAgent):
     Returns:
       bool, True if unbundling was successful.
     """
-    del checkpoint_dir  # Unused.
-    del iteration_number  # Unused.
-    if 'q_value_table' not in bundle_dict:
+    if bundle_dict.get('table_format') == 'npy':
+      try:
+        self._q_value_table = self._load_table(checkpoint_dir, 'q_value_table',
+                                               iteration_number)
+        self._state_action_counts = self._load_table(checkpoint_dir,
+                                                     'sa_count',
+                                                     iteration_number)
+      except IOError as e:
+        logging.warning(
+            'Could not unbundle from checkpoint files with exception: %s', e)
+        return False
+    elif 'q_value_table' in bundle_dict:
+      self._q_value_table = bundle_dict['q_value_table']
+      self._state_action_counts = bundle_dict.get('sa_count', {})
+    else:
       logging.warning(
           'Could not unbundle from checkpoint files with exception.')
       return False
-    self._q_value_table = bundle_dict['q_value_table']
-    self._state_action_counts = bundle_dict.get('sa_count', {})
+    self._q_upper_bounds = {}
+    if self._ordinal_slates:
+      self._compute_q_upper_bounds()
     return True
+
+  def _compute_q_upper_bounds(self):
+    """Computes the Q-value upper bounds of all entries of the Q-table."""
+    if (not isinstance(self._q_value_table, _ArrayTable) or
+        self._key_dtype is object):
+      # In-memory tables, and tables of keys beyond int64, are iterated.
+      for state_action_index, q_value in self._q_value_table.items():
+        self._update_q_upper_bounds(state_action_index, q_value)
+      return
+    keys, values = self._q_value_table.to_arrays()
+    if keys.size == 0:
+      return
+    state_codes, action_codes = np.divmod(keys, self._action_radix)
+    for position in range(self._slate_size - 1, -1, -1):
+      action_codes, doc_codes = np.divmod(action_codes, self._doc_radix)
+      # Bound keys fit in int64 since state_code * doc_radix is at most a key.
+      bound_keys = state_codes * self._doc_radix + doc_codes
+      order = np.argsort(bound_keys, kind='stable')
+      bound_keys = bound_keys[order]
+      starts = np.flatnonzero(
+          np.concatenate([[True], bound_keys[1:] != bound_keys[:-1]]))
+      bounds = np.maximum.reduceat(values[order], starts)
+      bound_state_codes, bound_doc_codes = np.divmod(bound_keys[starts],
+                                                     self._doc_radix)
+      self._q_upper_bounds.update(
+          zip(
+              zip(bound_state_codes.tolist(),
+                  itertools.repeat(position), bound_doc_codes.tolist()),
+              bounds.tolist()))
@@ -16,6 +16,7 @@
 """Tests for recsim.agents.tabular_q_agent."""
 
 from gym import spaces
+import mock
 import numpy as np
 from recsim.agents import tabular_q_agent
 from recsim.testing import test_environment as te
@@ -49,22 +50,28 @@ class TabularQAgentTest(tf.test.TestCase):
         ordinal_slates=ordinal_slates)
     return te_sim, agent
 
+  def state_action_key(self, agent, state, action):
+    # The test environment has Discrete user states and Discrete documents.
+    return state * agent._action_radix + action
+
   def test_step(self):
     te_sim, agent = self.init_agent_and_env()
     observation0 = te_sim.reset()
     slate1 = agent.step(0, observation0)
     selected_doc0 = list(observation0['doc'].values())[slate1[0]]
     # Environment always starts at state 0.
-    self.assertEqual(agent._previous_state_action_index, (selected_doc0, 0))
+    self.assertEqual(agent._previous_state_action_index,
+                     self.state_action_key(agent, 0, selected_doc0))
     observation1, reward1, _, _ = te_sim.step(slate1)
     slate2 = agent.step(reward1, observation1)
     selected_doc1 = list(observation1['doc'].values())[slate2[0]]
     observed_state = observation1['user']
     self.assertEqual(agent._previous_state_action_index,
-                     (selected_doc1, observed_state))
+                     self.state_action_key(agent, observed_state, selected_doc1))
+    key0 = self.state_action_key(agent, 0, selected_doc0)
     self.assertEqual(agent._q_value_table,
-                     {(selected_doc0, 0): agent._learning_rate * -10.0})
-    self.assertEqual(agent._state_action_counts, {(selected_doc0, 0): 1})
+                     {key0: agent._learning_rate * -10.0})
+    self.assertEqual(agent._state_action_counts, {key0: 1})
 
   def test_myopic_value_estimation(self):
     te_sim, agent = self.init_agent_and_env()
@@ -75,8 +82,9 @@ class TabularQAgentTest(tf.test.TestCase):
       slate = agent.step(reward, observation)
     for state in range(6):
       for action in range(4):
-        self.assertAlmostEqual(agent._q_value_table[(action, state)],
-                               te.QVALUES0[state][action])
+        self.assertAlmostEqual(
+            agent._q_value_table[self.state_action_key(agent, state, action)],
+            te.QVALUES0[state][action])
 
   def test_gamma05_value_estimation(self):
     te_sim, agent = self.init_agent_and_env(gamma=0.5)
@@ -89,7 +97,7 @@ class TabularQAgentTest(tf.test.TestCase):
     for state in range(6):
       for action in range(4):
         self.assertAlmostEqual(
-            agent._q_value_table[(action, state)],
+            agent._q_value_table[self.state_action_key(agent, state, action)],
             te.QVALUES05[state][action],
             delta=0.25)
 
@@ -149,23 +157,126 @@ class TabularQAgentTest(tf.test.TestCase):
         ]), [0, 99, 100, 1])
 
   def test_slate_enumeration(self):
-    te_sim, agent = self.init_agent_and_env(slate_size=2, num_candidates=4)
-    observation0 = te_sim.reset()
+    _, agent = self.init_agent_and_env(slate_size=2, num_candidates=4)
     non_ordinal_slates = [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
-    enumerated_slates = [
-        slate for slate, _ in agent._enumerate_slates(observation0['doc'])
-    ]
+    enumerated_slates = [tuple(slate) for slate in agent._slate_indices(4)]
     self.assertCountEqual(non_ordinal_slates, enumerated_slates)
-    te_sim, agent = self.init_agent_and_env(slate_size=2, num_candidates=4,
-                                            ordinal_slates=True)
+    _, agent = self.init_agent_and_env(slate_size=2, num_candidates=4,
+                                       ordinal_slates=True)
     ordinal_slates = non_ordinal_slates + [
         (1, 0), (2, 0), (3, 0), (2, 1), (3, 1), (3, 2)
     ]
-    enumerated_slates = [
-        slate for slate, _ in agent._enumerate_slates(observation0['doc'])
-    ]
+    enumerated_slates = [tuple(slate) for slate in agent._slate_indices(4)]
     self.assertCountEqual(ordinal_slates, enumerated_slates)
 
+  def test_state_action_keys(self):
+    te_sim, agent = self.init_agent_and_env(slate_size=2, num_candidates=4,
+                                            ordinal_slates=True)
+    observation = te_sim.reset()
+    documents = list(observation['doc'].values())
+    slates, keys = agent._state_action_keys(
+        agent._state_code(observation), agent._doc_codes(observation['doc']))
+    self.assertLen(set(keys), len(keys))
+    for slate, key in zip(slates, keys):
+      action = documents[slate[0]] * agent._doc_radix + documents[slate[1]]
+      self.assertEqual(
+          self.state_action_key(agent, observation['user'], action), key)
+
+  def test_ordinal_greedy_slate(self):
+    te_sim, agent = self.init_agent_and_env(slate_size=3, num_candidates=5,
+                                            ordinal_slates=True)
+    observation = te_sim.reset()
+    state_code = agent._state_code(observation)
+    doc_codes = agent._doc_codes(observation['doc'])
+    slates, keys = agent._state_action_keys(state_code, doc_codes)
+    np.random.seed(0)
+    for _ in range(10):
+      for key in np.random.choice(keys, 5, replace=False):
+        agent._update_q_value(key, np.random.uniform(-1.0, 1.0))
+      q_values = agent._lookup(agent._q_value_table, keys)
+      slate, key, q_value = agent._ordinal_greedy_slate(state_code, doc_codes)
+      self.assertEqual(tuple(slates[np.argmax(q_values)]), slate)
+      self.assertEqual(keys[np.argmax(q_values)], key)
+      self.assertEqual(np.max(q_values), q_value)
+
+  def test_chunked_greedy_slate(self):
+    te_sim, agent = self.init_agent_and_env(slate_size=2, num_candidates=5)
+    observation = te_sim.reset()
+    state_code = agent._state_code(observation)
+    doc_codes = agent._doc_codes(observation['doc'])
+    slates, keys = agent._state_action_keys(state_code, doc_codes)
+    agent._max_cached_slates = 3
+    np.random.seed(0)
+    for _ in range(10):
+      for key in np.random.choice(keys, 2, replace=False):
+        agent._update_q_value(key, np.random.uniform(-1.0, 1.0))
+      q_values = agent._lookup(agent._q_value_table, keys)
+      slate, key, q_value = agent._chunked_greedy_slate(state_code, doc_codes)
+      self.assertEqual(tuple(slates[np.argmax(q_values)]), slate)
+      self.assertEqual(keys[np.argmax(q_values)], key)
+      self.assertEqual(np.max(q_values), q_value)
+
+  def test_step_streams_large_enumerations(self):
+    for policy in ('epsilon_greedy', 'min_count'):
+      te_sim, agent = self.init_agent_and_env(
+          slate_size=2, num_candidates=5, policy=policy)
+      agent._max_cached_slates = 3
+      observation = te_sim.reset()
+      reward = 0
+      for _ in range(20):
+        slate = agent.step(reward, observation)
+        observation, reward, _, _ = te_sim.step(slate)
+      self.assertEqual({}, agent._slate_indices_cache)
+      self.assertNotEmpty(agent._q_value_table)
+
+  def test_streamed_exploration_keys(self):
+    te_sim, agent = self.init_agent_and_env(slate_size=2, num_candidates=6)
+    agent._max_cached_slates = 3
+    agent._exploration_temperature = 1.0
+    agent._base_exploration_temperature = 1.0
+    np.random.seed(0)
+    observation = te_sim.reset()
+    reward = 0
+    enumerated_keys = set()
+    for _ in range(50):
+      slate = agent.step(reward, observation)
+      _, keys = agent._state_action_keys(
+          agent._state_code(observation), agent._doc_codes(observation['doc']))
+      self.assertIn(agent._previous_state_action_index, keys)
+      self.assertEqual(sorted(slate), list(slate))
+      enumerated_keys.update(keys)
+      observation, reward, _, _ = te_sim.step(slate)
+    self.assertContainsSubset(agent._q_value_table, enumerated_keys)
+
+  def test_keys_beyond_int64(self):
+    # 101 bins for each of 10 features give a document radix above int64.
+    doc_space = spaces.Box(low=0., high=10., shape=(10,), dtype=np.float32)
+    observation_space = spaces.Dict({
+        'user': spaces.Discrete(3),
+        'doc': spaces.Dict({str(i): doc_space for i in range(4)}),
+        'response': spaces.Discrete(2),
+    })
+    agent = tabular_q_agent.TabularQAgent(
+        observation_space, spaces.MultiDiscrete([4, 4]))
+    self.assertIs(object, agent._key_dtype)
+    rng = np.random.RandomState(0)
+    doc_dict = {
+        str(i): rng.uniform(0., 10., size=10).astype(np.float32)
+        for i in range(4)
+    }
+    doc_codes = agent._doc_codes(doc_dict)
+    for doc, doc_code in zip(doc_dict.values(), doc_codes):
+      digits = np.digitize(doc, agent._discretization_bins)
+      expected = 0
+      for digit in digits:
+        expected = expected * 101 + int(digit)
+      self.assertEqual(expected, doc_code)
+    _, keys = agent._state_action_keys(agent._state_code({'user': 2}),
+                                       doc_codes)
+    self.assertLen(set(keys), len(keys))
+    for key in keys:
+      self.assertIsInstance(key, int)
+
   def test_bundle_and_unbundle(self):
     te_sim, agent = self.init_agent_and_env(
         slate_size=1, num_candidates=4, policy='min_count')
@@ -184,6 +295,101 @@ class TabularQAgentTest(tf.test.TestCase):
     self.assertEqual(bundle_dict['q_value_table'], new_agent._q_value_table)
     self.assertEqual(bundle_dict['sa_count'], new_agent._state_action_counts)
 
+  def test_bundle_and_unbundle_arrays(self):
+    te_sim, agent = self.init_agent_and_env(
+        slate_size=2, num_candidates=4, policy='min_count')
+    observation = te_sim.reset()
+    reward = 0
+    for _ in range(50):
+      slate = agent.step(reward, observation)
+      observation, reward, _, _ = te_sim.step(slate)
+    agent.end_episode(reward, observation)
+    checkpoint_dir = self.get_temp_dir()
+    bundle_dict = agent.bundle_and_checkpoint(checkpoint_dir, 0)
+    self.assertEqual({'table_format': 'npy'}, bundle_dict)
+    _, new_agent = self.init_agent_and_env(
+        slate_size=2, num_candidates=4, policy='min_count')
+    self.assertTrue(new_agent.unbundle(checkpoint_dir, 0, bundle_dict))
+    self.assertEqual(agent._q_value_table,
+                     dict(new_agent._q_value_table.items()))
+    self.assertEqual(agent._state_action_counts,
+                     dict(new_agent._state_action_counts.items()))
+    # Training continues on top of the memory-mapped tables.
+    for _ in range(50):
+      slate = agent.step(reward, observation)
+      new_slate = new_agent.step(reward, observation)
+      self.assertEqual(slate, new_slate)
+      observation, reward, _, _ = te_sim.step(slate)
+    self.assertEqual(agent._q_value_table,
+                     dict(new_agent._q_value_table.items()))
+    self.assertLen(new_agent._q_value_table, len(agent._q_value_table))
+    new_agent.bundle_and_checkpoint(checkpoint_dir, 1)
+    self.assertTrue(new_agent.unbundle(checkpoint_dir, 1, bundle_dict))
+    self.assertEqual(agent._state_action_counts,
+                     dict(new_agent._state_action_counts.items()))
+
+  def test_array_table_overlay(self):
+    table = tabular_q_agent._ArrayTable(
+        np.arange(0, 20, 2, dtype=np.int64), np.arange(10, dtype=np.float64))
+    expected = dict(zip(range(0, 20, 2), range(10)))
+    np.random.seed(0)
+    with mock.patch.object(tabular_q_agent, '_MAX_OVERLAY_SIZE', 4):
+      for _ in range(10):
+        for key in np.random.randint(30, size=3).tolist():
+          table[key] = expected[key] = np.random.uniform()
+        keys = list(range(30))
+        self.assertAllEqual([expected.get(key, -1.) for key in keys],
+                            table.lookup(keys, -1.))
+    self.assertEqual(expected, dict(table.items()))
+    self.assertLen(table, len(expected))
+
+  def test_unbundle_ordinal_arrays(self):
+    te_sim, agent = self.init_agent_and_env(
+        slate_size=2, num_candidates=4, ordinal_slates=True)
+    observation = te_sim.reset()
+    reward = 0
+    for _ in range(100):
+      slate = agent.step(reward, observation)
+      observation, reward, _, _ = te_sim.step(slate)
+    checkpoint_dir = self.get_temp_dir()
+    bundle_dict = agent.bundle_and_checkpoint(checkpoint_dir, 0)
+    _, new_agent = self.init_agent_and_env(
+        slate_size=2, num_candidates=4, ordinal_slates=True)
+    self.assertTrue(new_agent.unbundle(checkpoint_dir, 0, bundle_dict))
+    self.assertIsInstance(new_agent._q_value_table,
+                          tabular_q_agent._ArrayTable)
+    expected_bounds = {}
+    for key, q_value in agent._q_value_table.items():
+      state_code, action_code = divmod(key, agent._action_radix)
+      for position, doc_code in enumerate(
+          divmod(action_code, agent._doc_radix)):
+        bound_key = (state_code, position, doc_code)
+        expected_bounds[bound_key] = max(
+            expected_bounds.get(bound_key, -np.inf), q_value)
+    self.assertEqual(expected_bounds, new_agent._q_upper_bounds)
+
+  def test_snapshot_bundle(self):
+    te_sim, agent = self.init_agent_and_env(
+        slate_size=2, num_candidates=4, policy='min_count')
+    observation = te_sim.reset()
+    reward = 0
+    for _ in range(20):
+      slate = agent.step(reward, observation)
+      observation, reward, _, _ = te_sim.step(slate)
+    q_value_table = dict(agent._q_value_table)
+    checkpoint_dir = self.get_temp_dir()
+    bundle_dict, write_fn = agent.snapshot_bundle(checkpoint_dir, 0)
+    # Training continues before the snapshot is written.
+    for _ in range(20):
+      slate = agent.step(reward, observation)
+      observation, reward, _, _ = te_sim.step(slate)
+    self.assertNotEqual(q_value_table, agent._q_value_table)
+    write_fn()
+    _, new_agent = self.init_agent_and_env(
+        slate_size=2, num_candidates=4, policy='min_count')
+    self.assertTrue(new_agent.unbundle(checkpoint_dir, 0, bundle_dict))
+    self.assertEqual(q_value_table, dict(new_agent._q_value_table.items()))
+
 
 if __name__ == '__main__':
   tf.test.main()
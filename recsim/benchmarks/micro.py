@@ -0,0 +1,340 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""Micro-benchmarks of the hot paths of the simulator and of the agents.
+
+Each benchmark times one operation at several problem sizes, e.g. the number
+of documents scored by a choice model or the number of pulls a GLM bandit has
+seen, and reports the time per call at each size together with the slope of
+log(time) against log(size). A slope near 0 means the cost does not depend on
+the size, near 1 that it is linear, and so on, so asymptotic problems show up
+as slopes even when the absolute times are noisy.
+
+Usage:
+
+  python -m recsim.benchmarks.micro \
+    --benchmarks=glm,select_slate \
+    --output_file=/tmp/micro.json \
+    --baseline_file=/tmp/micro_baseline.json
+
+The results files and the comparison against a baseline are shared with
+recsim.benchmarks.throughput.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import re
+import sys
+import timeit
+
+from absl import app
+from absl import flags
+from gym import spaces
+import numpy as np
+from recsim import choice_model
+from recsim.agents import slate_decomp_q_agent
+from recsim.agents.bandits import algorithms
+from recsim.agents.bandits import glm_algorithms
+from recsim.agents.dopamine import dqn_agent
+from recsim.benchmarks import results as results_lib
+import tensorflow.compat.v1 as tf
+
+FLAGS = flags.FLAGS
+
+KEY_FIELDS = ('benchmark', 'size')
+LOWER_IS_BETTER = ('secs_per_call',)
+
+# Dimension of the user and document features.
+_DIM = 10
+
+Benchmark = collections.namedtuple('Benchmark',
+                                   ['name', 'size_name', 'sizes', 'setup'])
+
+
+class _UserState(object):
+  """A user scoring documents by the dot product with its interests."""
+
+  def __init__(self, interests):
+    self._interests = interests
+
+  def score_document(self, doc_obs):
+    return np.dot(self._interests, doc_obs)
+
+
+def _choice_model_setup(model_ctor, choice_features, operation):
+  """Returns the setup of a benchmark of a choice model."""
+
+  def setup(num_documents):
+    rng = np.random.RandomState(0)
+    # Scores are in [0, 1], which suits the defaults of all models.
+    user_state = _UserState(rng.uniform(size=_DIM) / _DIM)
+    doc_obs = list(rng.uniform(size=(num_documents, _DIM)))
+    model = model_ctor(choice_features)
+    if operation == 'score_documents':
+      return lambda: model.score_documents(user_state, doc_obs)
+    model.score_documents(user_state, doc_obs)
+    return model.choose_item
+
+  return setup
+
+
+def _mab_setup(algorithm_ctor):
+  """Returns the setup of a benchmark of MABAlgorithm.get_score."""
+
+  def setup(num_arms):
+    rng = np.random.RandomState(0)
+    algorithm = algorithm_ctor(num_arms, {}, seed=0)
+    pulls = rng.randint(1, 100, size=num_arms)
+    algorithm.set_state(pulls, rng.binomial(pulls, 0.3))
+    state = {'t': int(pulls.sum())}
+
+    def get_score():
+      # Advance the round so that no scores can be reused from a cache.
+      state['t'] += 1
+      return algorithm.get_score(state['t'])
+
+    return get_score
+
+  return setup
+
+
+def _glm_setup(algorithm_ctor, estimator):
+  """Returns the setup of a benchmark of GLMAlgorithm.get_arm."""
+
+  def setup(num_pulls):
+    rng = np.random.RandomState(0)
+    np.random.seed(0)
+    algorithm = algorithm_ctor(estimator=estimator)
+    w = rng.normal(size=_DIM)
+    for arm in rng.normal(size=(num_pulls, _DIM)) / np.sqrt(_DIM):
+      algorithm.update(float(rng.uniform() < 1. / (1. + np.exp(-arm.dot(w)))),
+                       arm)
+    arms = list(rng.normal(size=(20, _DIM)) / np.sqrt(_DIM))
+    return lambda: algorithm.get_arm(arms)
+
+  return setup
+
+
+def _select_slate_setup(select_slate_fn, slate_size):
+  """Returns the setup of a benchmark of a slate selection function."""
+
+  def setup(num_candidates):
+    rng = np.random.RandomState(0)
+    graph = tf.Graph()
+    with graph.as_default():
+      # Placeholders rather than constants, which would be folded away.
+      s = tf.placeholder(tf.float32, shape=[num_candidates])
+      q = tf.placeholder(tf.float32, shape=[num_candidates])
+      slate = select_slate_fn(slate_size, tf.constant(1.), s, q)
+    sess = tf.Session(graph=graph)
+    feed_dict = {
+        s: rng.uniform(size=num_candidates),
+        q: rng.uniform(size=num_candidates)
+    }
+    return lambda: sess.run(slate, feed_dict=feed_dict)
+
+  return setup
+
+
+def _observation_adapter_setup(num_candidates):
+  """Returns the setup of a benchmark of ObservationAdapter.encode."""
+  rng = np.random.RandomState(0)
+  feature_space = spaces.Box(low=0., high=1., shape=(_DIM,), dtype=np.float32)
+  observation_space = spaces.Dict({
+      'user':
+          feature_space,
+      'doc':
+          spaces.Dict({str(i): feature_space for i in range(num_candidates)}),
+  })
+  adapter = dqn_agent.ObservationAdapter(observation_space)
+  observation = {
+      'user':
+          rng.uniform(size=_DIM).astype(np.float32),
+      'doc':
+          collections.OrderedDict(
+              (str(i), rng.uniform(size=_DIM).astype(np.float32))
+              for i in range(num_candidates)),
+  }
+  return lambda: adapter.encode(observation)
+
+
+def _benchmarks():
+  """Returns the list of all benchmarks."""
+  benchmarks = []
+  choice_models = [
+      ('MultinomialLogitChoiceModel', choice_model.MultinomialLogitChoiceModel,
+       {'no_click_mass': 1.}),
+      ('MultinomialProportionalChoiceModel',
+       choice_model.MultinomialProportionalChoiceModel, {
+           'min_normalizer': -1.,
+           'no_click_mass': 1.
+       }),
+      ('ExponentialCascadeChoiceModel',
+       choice_model.ExponentialCascadeChoiceModel, {
+           'attention_prob': 0.9,
+           'score_scaling': 0.1
+       }),
+      ('ProportionalCascadeChoiceModel',
+       choice_model.ProportionalCascadeChoiceModel, {
+           'attention_prob': 0.9,
+           'min_normalizer': -1.,
+           'score_scaling': 0.1
+       }),
+  ]
+  for name, ctor, choice_features in choice_models:
+    for operation in ('score_documents', 'choose_item'):
+      benchmarks.append(
+          Benchmark('choice_model/{}.{}'.format(name, operation),
+                    'num_documents', (10, 100, 1000),
+                    _choice_model_setup(ctor, choice_features, operation)))
+  for ctor in (algorithms.UCB1, algorithms.KLUCB, algorithms.ThompsonSampling):
+    benchmarks.append(
+        Benchmark('mab/{}.get_score'.format(ctor.__name__), 'num_arms',
+                  (10, 100, 1000, 10000), _mab_setup(ctor)))
+  glm_ctors = [
+      ('UCB_GLM', lambda **kwargs: glm_algorithms.UCB_GLM(
+          _DIM, horizon=100000, **kwargs)),
+      ('GLM_TS', lambda **kwargs: glm_algorithms.GLM_TS(_DIM, **kwargs)),
+  ]
+  for name, ctor in glm_ctors:
+    for estimator in glm_algorithms.ESTIMATORS:
+      benchmarks.append(
+          Benchmark('glm/{}.get_arm/{}'.format(name, estimator), 'num_pulls',
+                    (100, 1000, 10000), _glm_setup(ctor, estimator)))
+  for fn in (slate_decomp_q_agent.select_slate_topk,
+             slate_decomp_q_agent.select_slate_greedy,
+             slate_decomp_q_agent.select_slate_optimal):
+    benchmarks.append(
+        Benchmark('select_slate/{}'.format(fn.__name__), 'num_candidates',
+                  (5, 10, 20, 40), _select_slate_setup(fn, slate_size=2)))
+  benchmarks.append(
+      Benchmark('ObservationAdapter.encode', 'num_candidates',
+                (10, 100, 1000), _observation_adapter_setup))
+  return benchmarks
+
+
+def time_call(fn, repeats=3, min_time_secs=0.05):
+  """Returns the time of a call to fn, in seconds.
+
+  The number of calls per timing is chosen so that it lasts at least
+  min_time_secs, and the fastest of repeats timings is used.
+
+  Args:
+    fn: a callable without arguments.
+    repeats: int, the number of timings.
+    min_time_secs: float, the minimum duration of a timing.
+  """
+  timer = timeit.Timer(fn)
+  number = 1
+  while True:
+    if timer.timeit(number) >= min_time_secs:
+      break
+    number *= 10
+  return min(timer.repeat(repeat=repeats, number=number)) / number
+
+
+def scaling_slope(sizes, secs_per_call):
+  """Returns the slope of log(secs_per_call) against log(sizes)."""
+  return float(np.polyfit(np.log(sizes), np.log(secs_per_call), 1)[0])
+
+
+def run_benchmark(benchmark, repeats=3, min_time_secs=0.05):
+  """Times a benchmark at each of its sizes.
+
+  Args:
+    benchmark: a Benchmark.
+    repeats: int, the number of timings at each size.
+    min_time_secs: float, the minimum duration of a timing.
+
+  Returns:
+    A list with a record per size, holding the time per call, followed by a
+    record holding the scaling slope.
+  """
+  records = []
+  for size in benchmark.sizes:
+    secs_per_call = time_call(
+        benchmark.setup(size), repeats=repeats, min_time_secs=min_time_secs)
+    records.append(
+        collections.OrderedDict([
+            ('benchmark', benchmark.name),
+            ('size_name', benchmark.size_name),
+            ('size', size),
+            ('secs_per_call', secs_per_call),
+        ]))
+  records.append(
+      collections.OrderedDict([
+          ('benchmark', benchmark.name),
+          ('size_name', benchmark.size_name),
+          ('size', None),
+          ('slope',
+           scaling_slope(benchmark.sizes,
+                         [r['secs_per_call'] for r in records])),
+      ]))
+  return records
+
+
+def run_benchmarks(pattern=None, **kwargs):
+  """Runs the benchmarks whose name matches the regular expression pattern.
+
+  Args:
+    pattern: str, a regular expression searched in the benchmark names, or
+      None to run all benchmarks.
+    **kwargs: passed on to run_benchmark.
+
+  Returns:
+    A list of the records returned by run_benchmark.
+  """
+  records = []
+  for benchmark in _benchmarks():
+    if pattern and not re.search(pattern, benchmark.name):
+      continue
+    benchmark_records = run_benchmark(benchmark, **kwargs)
+    print(format_curve(benchmark_records))
+    records.extend(benchmark_records)
+  return records
+
+
+def format_curve(records):
+  """Returns a line describing the scaling curve of a benchmark."""
+  points = ', '.join('{}: {:.3g}s'.format(r['size'], r['secs_per_call'])
+                     for r in records[:-1])
+  return '{} by {}: {} (slope {:.2f})'.format(records[-1]['benchmark'],
+                                              records[-1]['size_name'], points,
+                                              records[-1]['slope'])
+
+
+flags.DEFINE_list(
+    'benchmarks', None,
+    'Regular expressions, a benchmark runs if its name matches any of them. '
+    'By default, all benchmarks run.')
+flags.DEFINE_float('min_time_secs', 0.05,
+                   'The minimum duration of a timing of a benchmark.')
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+  pattern = '|'.join(FLAGS.benchmarks) if FLAGS.benchmarks else None
+  records = run_benchmarks(
+      pattern, repeats=FLAGS.repeats, min_time_secs=FLAGS.min_time_secs)
+  if results_lib.report(records, KEY_FIELDS, lower_is_better=LOWER_IS_BETTER):
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,56 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.benchmarks.micro."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from recsim.benchmarks import micro
+import tensorflow.compat.v1 as tf
+
+
+class MicroTest(tf.test.TestCase):
+
+  def test_scaling_slope(self):
+    self.assertAllClose(
+        2., micro.scaling_slope([10, 100, 1000], [1e-6, 1e-4, 1e-2]))
+    self.assertAllClose(0., micro.scaling_slope([10, 100], [3e-5, 3e-5]))
+
+  def test_time_call(self):
+    calls = []
+    secs_per_call = micro.time_call(
+        lambda: calls.append(None), repeats=2, min_time_secs=0.001)
+    self.assertGreater(secs_per_call, 0)
+    self.assertGreater(len(calls), 2)
+
+  def test_all_benchmarks_run(self):
+    for benchmark in micro._benchmarks():
+      benchmark.setup(benchmark.sizes[0])()
+
+  def test_run_benchmarks(self):
+    records = micro.run_benchmarks(
+        'ObservationAdapter', repeats=1, min_time_secs=0.001)
+    self.assertLen(records, 4)
+    self.assertEqual([10, 100, 1000, None], [r['size'] for r in records])
+    self.assertEqual({'ObservationAdapter.encode'},
+                     {r['benchmark'] for r in records})
+    self.assertIn('slope', records[-1])
+    self.assertGreater(records[0]['secs_per_call'], 0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
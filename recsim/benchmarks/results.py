@@ -0,0 +1,190 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Recording of benchmark results as JSON and comparison against a baseline.
+
+Results are lists of flat dictionaries. Some fields identify the benchmark
+(e.g. the environment and the grid point), the others are measurements. A
+results file stores the records together with metadata describing the host, so
+that a later run can be compared against it as a baseline.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import platform
+import time
+
+from absl import flags
+import numpy as np
+import tensorflow.compat.v1 as tf
+
+flags.DEFINE_string('output_file', None, 'Where to write the JSON results.')
+flags.DEFINE_string('baseline_file', None,
+                    'Results of a previous run to compare against.')
+flags.DEFINE_float(
+    'tolerance', 0.1,
+    'The relative change of a metric beyond which it has regressed.')
+flags.DEFINE_integer('repeats', 3,
+                     'The number of timed runs, the fastest is reported.')
+
+FLAGS = flags.FLAGS
+
+Comparison = collections.namedtuple(
+    'Comparison', ['key', 'metric', 'baseline', 'value', 'change', 'regressed'])
+
+
+def host_metadata():
+  """Returns a description of the host the benchmarks run on."""
+  return {
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'numpy': np.__version__,
+      'tensorflow': tf.__version__,
+      'machine': platform.machine(),
+      'processor': platform.processor(),
+      'system': platform.system(),
+  }
+
+
+def write_results(path, results, metadata=None):
+  """Writes benchmark results as JSON.
+
+  Args:
+    path: str, the file to write.
+    results: a list of dictionaries, one per benchmark.
+    metadata: an optional dictionary stored alongside the results. Defaults to
+      host_metadata().
+  """
+  if metadata is None:
+    metadata = host_metadata()
+  with tf.io.gfile.GFile(path, 'w') as f:
+    f.write(
+        json.dumps({
+            'metadata': metadata,
+            'results': results
+        },
+                   indent=2,
+                   sort_keys=True))
+
+
+def load_results(path):
+  """Returns the list of results stored in a file written by write_results."""
+  with tf.io.gfile.GFile(path, 'r') as f:
+    return json.loads(f.read())['results']
+
+
+def compare_to_baseline(results,
+                        baseline,
+                        key_fields,
+                        higher_is_better=(),
+                        lower_is_better=(),
+                        tolerance=0.1):
+  """Compares results against a baseline.
+
+  Records are matched on key_fields; records without a counterpart or with a
+  missing measurement are ignored.
+
+  Args:
+    results: a list of result dictionaries.
+    baseline: a list of result dictionaries, e.g. from load_results.
+    key_fields: the names of the fields identifying a benchmark.
+    higher_is_better: the names of the metrics which regress when they
+      decrease, e.g. throughputs.
+    lower_is_better: the names of the metrics which regress when they
+      increase, e.g. memory use.
+    tolerance: float, the relative change beyond which a metric is considered
+      to have regressed.
+
+  Returns:
+    A list of Comparison tuples, one per matched metric. change is the
+    relative change of the value with respect to the baseline.
+  """
+  key_fields = tuple(key_fields)
+  baseline_by_key = {
+      tuple(record.get(field) for field in key_fields): record
+      for record in baseline
+  }
+  comparisons = []
+  for record in results:
+    key = tuple(record.get(field) for field in key_fields)
+    reference = baseline_by_key.get(key)
+    if reference is None:
+      continue
+    for metric in tuple(higher_is_better) + tuple(lower_is_better):
+      value = record.get(metric)
+      baseline_value = reference.get(metric)
+      if value is None or baseline_value is None:
+        continue
+      if baseline_value:
+        change = (value - baseline_value) / abs(baseline_value)
+      else:
+        change = 0. if value == baseline_value else float('inf')
+      if metric in higher_is_better:
+        regressed = change < -tolerance
+      else:
+        regressed = change > tolerance
+      comparisons.append(
+          Comparison(
+              key=dict(zip(key_fields, key)),
+              metric=metric,
+              baseline=baseline_value,
+              value=value,
+              change=change,
+              regressed=regressed))
+  return comparisons
+
+
+def format_comparisons(comparisons):
+  """Returns a human readable table of comparisons, regressions first."""
+  lines = []
+  for c in sorted(comparisons, key=lambda c: (not c.regressed, c.change)):
+    key = ' '.join('{}={}'.format(k, v) for k, v in sorted(c.key.items()))
+    lines.append('{:>10} {:+8.1%} {:<24} {:.6g} -> {:.6g}  {}'.format(
+        'REGRESSED' if c.regressed else 'ok', c.change, c.metric, c.baseline,
+        c.value, key))
+  return '\n'.join(lines)
+
+
+def report(results, key_fields, higher_is_better=(), lower_is_better=()):
+  """Writes results to --output_file and compares them to --baseline_file.
+
+  Args:
+    results: a list of result dictionaries.
+    key_fields: the names of the fields identifying a benchmark.
+    higher_is_better: the names of the metrics which regress when they
+      decrease.
+    lower_is_better: the names of the metrics which regress when they
+      increase.
+
+  Returns:
+    True if any metric regressed by more than --tolerance.
+  """
+  if FLAGS.output_file:
+    write_results(FLAGS.output_file, results)
+  if not FLAGS.baseline_file:
+    return False
+  comparisons = compare_to_baseline(
+      results,
+      load_results(FLAGS.baseline_file),
+      key_fields,
+      higher_is_better=higher_is_better,
+      lower_is_better=lower_is_better,
+      tolerance=FLAGS.tolerance)
+  print(format_comparisons(comparisons))
+  return any(c.regressed for c in comparisons)
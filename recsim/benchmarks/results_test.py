@@ -0,0 +1,66 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.benchmarks.results."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from recsim.benchmarks import results
+import tensorflow.compat.v1 as tf
+
+
+class ResultsTest(tf.test.TestCase):
+
+  def test_write_and_load(self):
+    path = os.path.join(self.get_temp_dir(), 'results.json')
+    records = [{'name': 'a', 'steps_per_sec': 10.}]
+    results.write_results(path, records)
+    self.assertEqual(records, results.load_results(path))
+
+  def test_compare_to_baseline(self):
+    baseline = [
+        {'name': 'a', 'steps_per_sec': 100., 'peak_memory_bytes': 1000},
+        {'name': 'b', 'steps_per_sec': 100., 'peak_memory_bytes': 1000},
+        {'name': 'c', 'steps_per_sec': 100.},
+    ]
+    current = [
+        {'name': 'a', 'steps_per_sec': 95., 'peak_memory_bytes': 1500},
+        {'name': 'b', 'steps_per_sec': 50., 'peak_memory_bytes': 500},
+        {'name': 'd', 'steps_per_sec': 1.},
+    ]
+    comparisons = results.compare_to_baseline(
+        current,
+        baseline, ['name'],
+        higher_is_better=['steps_per_sec'],
+        lower_is_better=['peak_memory_bytes'],
+        tolerance=0.1)
+    regressed = {(c.key['name'], c.metric): c.regressed for c in comparisons}
+    self.assertEqual(
+        {
+            ('a', 'steps_per_sec'): False,
+            ('a', 'peak_memory_bytes'): True,
+            ('b', 'steps_per_sec'): True,
+            ('b', 'peak_memory_bytes'): False,
+        }, regressed)
+    self.assertAllClose(-0.05, comparisons[0].change)
+    self.assertIn('REGRESSED', results.format_comparisons(comparisons))
+
+
+if __name__ == '__main__':
+  tf.test.main()
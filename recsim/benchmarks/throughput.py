@@ -0,0 +1,442 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""Throughput benchmarks of the shipped environments and agents.
+
+Every combination of environment and agent is run over a grid of numbers of
+candidates, slate sizes and numbers of users. For each grid point the agent
+interacts with the environment as in runner_lib, without logging, and the
+benchmark records
+
+  * steps_per_sec and episodes_per_sec, of the fastest of several timed runs,
+  * gc_collections, the number of garbage collections during the timed run,
+    which grows with the number of container allocations,
+  * allocated_blocks_per_step, the net number of memory blocks allocated per
+    step during the timed run, which reveals leaks,
+  * peak_memory_bytes, the peak memory traced by tracemalloc over a separate,
+    shorter run, since tracing slows down the simulation considerably.
+
+Combinations which are not supported (e.g. an agent relying on document
+features the environment does not have, multiple users with an agent lacking a
+multi-user variant, or an agent enumerating more slates than it can handle)
+are recorded with a status explaining why. The requirements of each agent are
+declared in AGENTS by wrapping its creation function with _single_user,
+_requires_features, _max_slates or _max_candidates, which check the
+environment and raise NotImplementedError before the agent is created; any
+other error is a failure of the benchmark.
+
+Usage:
+
+  python -m recsim.benchmarks.throughput \
+    --output_file=/tmp/throughput.json \
+    --baseline_file=/tmp/throughput_baseline.json
+
+With --baseline_file, the results are compared against a file previously
+written with --output_file and the program fails if any throughput dropped or
+the peak memory grew by more than --tolerance.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import gc
+import itertools
+import math
+import sys
+import time
+import tracemalloc
+
+from absl import app
+from absl import flags
+from absl import logging
+from gym import spaces
+import numpy as np
+from recsim.agents import cluster_bandit_agent
+from recsim.agents import full_slate_q_agent
+from recsim.agents import greedy_pctr_agent
+from recsim.agents import random_agent
+from recsim.agents import random_agent_multi_user
+from recsim.agents import slate_decomp_q_agent
+from recsim.agents import tabular_q_agent
+from recsim.agents.layers import cluster_click_statistics
+from recsim.benchmarks import results as results_lib
+from recsim.environments import interest_evolution
+from recsim.environments import interest_exploration
+from recsim.environments import long_term_satisfaction
+from recsim.environments import recsys_env_final
+from recsim.simulator import environment
+import tensorflow.compat.v1 as tf
+
+FLAGS = flags.FLAGS
+
+KEY_FIELDS = ('environment', 'agent', 'num_candidates', 'slate_size',
+              'num_users')
+HIGHER_IS_BETTER = ('steps_per_sec', 'episodes_per_sec')
+LOWER_IS_BETTER = ('peak_memory_bytes',)
+
+
+def _create_single_user_environment(create_environment_fn):
+
+  def create(env_config, num_users):
+    if num_users != 1:
+      raise NotImplementedError('The environment has a single user.')
+    return create_environment_fn(env_config)
+
+  return create
+
+
+def _create_interest_exploration(env_config, num_users):
+  if num_users == 1:
+    return interest_exploration.create_environment(env_config)
+  return interest_exploration.create_multienvironment(env_config, num_users)
+
+
+ENVIRONMENTS = collections.OrderedDict([
+    ('interest_evolution',
+     _create_single_user_environment(interest_evolution.create_environment)),
+    ('interest_exploration', _create_interest_exploration),
+    ('long_term_satisfaction',
+     _create_single_user_environment(
+         long_term_satisfaction.create_environment)),
+    ('recsys_env_final',
+     _create_single_user_environment(recsys_env_final.create_environment)),
+])
+
+
+def _single_user(create_agent_fn):
+  """Makes create_agent_fn reject multi-user environments."""
+
+  def create(sess, env):
+    if isinstance(env.environment, environment.MultiUserEnvironment):
+      raise NotImplementedError('The agent has no multi-user variant.')
+    return create_agent_fn(sess, env)
+
+  return create
+
+
+def _requires_features(create_agent_fn, doc_features=(),
+                       response_features=()):
+  """Makes create_agent_fn reject environments lacking features it reads."""
+
+  def create(sess, env):
+    doc_space = list(env.observation_space.spaces['doc'].spaces.values())[0]
+    response_space = env.observation_space.spaces['response'].spaces[0]
+    for kind, space, features in (('document', doc_space, doc_features),
+                                  ('response', response_space,
+                                   response_features)):
+      for feature in features:
+        if not isinstance(space, spaces.Dict) or feature not in space.spaces:
+          raise NotImplementedError(
+              'The environment has no {} {} feature.'.format(kind, feature))
+    return create_agent_fn(sess, env)
+
+  return create
+
+
+def _max_slates(create_agent_fn, max_slates, ordered):
+  """Makes create_agent_fn reject grid points with more than max_slates."""
+
+  def create(sess, env):
+    num_candidates = env.environment.num_candidates
+    slate_size = env.environment.slate_size
+    num_slates = math.factorial(num_candidates) // math.factorial(
+        num_candidates - slate_size)
+    if not ordered:
+      num_slates //= math.factorial(slate_size)
+    if num_slates > max_slates:
+      raise NotImplementedError(
+          'The agent enumerates {} slates, more than {}.'.format(
+              num_slates, max_slates))
+    return create_agent_fn(sess, env)
+
+  return create
+
+
+def _max_candidates(create_agent_fn, max_candidates):
+  """Makes create_agent_fn reject grid points with more than max_candidates."""
+
+  def create(sess, env):
+    if env.environment.num_candidates > max_candidates:
+      raise NotImplementedError(
+          'The agent observes {} candidates, more than {}.'.format(
+              env.environment.num_candidates, max_candidates))
+    return create_agent_fn(sess, env)
+
+  return create
+
+
+def _create_random_agent(sess, env):
+  del sess  # Unused.
+  if isinstance(env.environment, environment.MultiUserEnvironment):
+    return random_agent_multi_user.RandomAgent(env.action_space, random_seed=0)
+  return random_agent.RandomAgent(env.action_space, random_seed=0)
+
+
+def _create_greedy_pctr_agent(sess, env):
+  del sess  # Unused.
+  # The agent assumes knowledge of the user: give it the true user state.
+  return greedy_pctr_agent.GreedyPCTRAgent(
+      env.action_space, env.environment.user_model._user_state)  # pylint: disable=protected-access
+
+
+def _create_cluster_bandit_agent(sess, env):
+  del sess  # Unused.
+  return cluster_click_statistics.ClusterClickStatsLayer(
+      cluster_bandit_agent.ClusterBanditAgent,
+      observation_space=env.observation_space,
+      action_space=env.action_space)
+
+
+def _create_tabular_q_agent(sess, env):
+  del sess  # Unused.
+  return tabular_q_agent.TabularQAgent(env.observation_space, env.action_space)
+
+
+def _create_slate_decomp_q_agent(sess, env):
+  return slate_decomp_q_agent.create_agent(
+      'slate_topk_sarsa',
+      sess,
+      observation_space=env.observation_space,
+      action_space=env.action_space)
+
+
+def _create_full_slate_q_agent(sess, env):
+  return full_slate_q_agent.FullSlateQAgent(
+      sess,
+      observation_space=env.observation_space,
+      action_space=env.action_space)
+
+
+# The tabular Q agent looks up every unordered slate at every step, and the
+# full slate Q agent builds a Q-network tower per ordered slate. The replay
+# memory of the slate decomposition Q agent preallocates a million
+# observations of all candidates, i.e. gigabytes for a hundred candidates.
+AGENTS = collections.OrderedDict([
+    ('RandomAgent', _create_random_agent),
+    ('GreedyPCTRAgent', _single_user(_create_greedy_pctr_agent)),
+    ('ClusterBanditAgent',
+     _single_user(
+         _requires_features(
+             _create_cluster_bandit_agent,
+             doc_features=('cluster_id',),
+             response_features=('cluster_id',)))),
+    ('TabularQAgent',
+     _single_user(
+         _max_slates(_create_tabular_q_agent, 10**5, ordered=False))),
+    ('SlateDecompQAgent',
+     _single_user(
+         _requires_features(
+             _max_candidates(_create_slate_decomp_q_agent, 20),
+             response_features=('click', 'watch_time')))),
+    ('FullSlateQAgent',
+     _single_user(
+         _max_slates(_create_full_slate_q_agent, 1000, ordered=True))),
+])
+
+
+def _run_episode(env, agent, max_steps_per_episode):
+  """Runs an episode as runner_lib does, without logging. Returns its length."""
+  observation = env.reset()
+  action = agent.begin_episode(observation)
+  step_number = 0
+  while True:
+    observation, reward, done, info = env.step(action)
+    env.update_metrics(observation['response'], info)
+    step_number += 1
+    if done or step_number == max_steps_per_episode:
+      break
+    action = agent.step(reward, observation)
+  agent.end_episode(reward, observation)
+  return step_number
+
+
+def _run_steps(env, agent, num_steps, max_steps_per_episode):
+  """Runs whole episodes until num_steps. Returns the steps and episodes."""
+  steps = 0
+  episodes = 0
+  while steps < num_steps:
+    steps += _run_episode(env, agent, max_steps_per_episode)
+    episodes += 1
+  return steps, episodes
+
+
+def _gc_collections():
+  return sum(stats['collections'] for stats in gc.get_stats())
+
+
+def run_benchmark(environment_name,
+                  agent_name,
+                  num_candidates,
+                  slate_size,
+                  num_users,
+                  num_steps=1000,
+                  memory_steps=200,
+                  max_steps_per_episode=100,
+                  repeats=3,
+                  seed=0):
+  """Measures the throughput of an agent interacting with an environment.
+
+  Args:
+    environment_name: str, a key of ENVIRONMENTS.
+    agent_name: str, a key of AGENTS.
+    num_candidates: int, the number of candidate documents per step.
+    slate_size: int, the number of documents recommended per step.
+    num_users: int, the number of users of the environment.
+    num_steps: int, the minimum number of steps of each timed run. Whole
+      episodes are run, so the actual number may be larger.
+    memory_steps: int, the minimum number of steps of the run traced by
+      tracemalloc, or 0 to skip it.
+    max_steps_per_episode: int, the maximum number of steps of an episode.
+    repeats: int, the number of timed runs. The fastest is reported, which is
+      the least affected by other activity on the host.
+    seed: int, the seed of the environment.
+
+  Returns:
+    A dictionary with the configuration, a status which is 'ok' unless the
+    combination is not supported, and the measurements.
+
+  Raises:
+    Exception: any error other than the NotImplementedError signaling an
+      unsupported combination.
+  """
+  record = collections.OrderedDict([
+      ('environment', environment_name),
+      ('agent', agent_name),
+      ('num_candidates', num_candidates),
+      ('slate_size', slate_size),
+      ('num_users', num_users),
+  ])
+  if slate_size > num_candidates:
+    record['status'] = 'unsupported: slate_size exceeds num_candidates'
+    return record
+  env_config = {
+      'num_candidates': num_candidates,
+      'slate_size': slate_size,
+      'resample_documents': True,
+      'seed': seed,
+  }
+  np.random.seed(seed)
+  with tf.Graph().as_default(), tf.Session() as sess:
+    try:
+      env = ENVIRONMENTS[environment_name](env_config, num_users)
+      agent = AGENTS[agent_name](sess, env)
+    except NotImplementedError as e:
+      logging.info('%s with %s is not supported: %s', agent_name,
+                   environment_name, e)
+      record['status'] = 'unsupported: {}'.format(e)
+      return record
+    sess.run(tf.global_variables_initializer())
+    # An untimed first episode warms up the agent.
+    _run_episode(env, agent, max_steps_per_episode)
+
+    for _ in range(repeats):
+      gc.collect()
+      gc_collections = _gc_collections()
+      allocated_blocks = sys.getallocatedblocks()
+      start_time = time.time()
+      steps, episodes = _run_steps(env, agent, num_steps,
+                                   max_steps_per_episode)
+      elapsed = time.time() - start_time
+      if steps / elapsed > record.get('steps_per_sec', 0.):
+        record['allocated_blocks_per_step'] = (sys.getallocatedblocks() -
+                                               allocated_blocks) / steps
+        record['gc_collections'] = _gc_collections() - gc_collections
+        record['steps'] = steps
+        record['episodes'] = episodes
+        record['steps_per_sec'] = steps / elapsed
+        record['episodes_per_sec'] = episodes / elapsed
+
+    if memory_steps:
+      gc.collect()
+      tracemalloc.start()
+      try:
+        _run_steps(env, agent, memory_steps, max_steps_per_episode)
+        record['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+      finally:
+        tracemalloc.stop()
+  record['status'] = 'ok'
+  return record
+
+
+def run_benchmarks(environments=None,
+                   agents=None,
+                   num_candidates=(10,),
+                   slate_sizes=(2,),
+                   num_users=(1,),
+                   **kwargs):
+  """Runs run_benchmark over a grid.
+
+  Args:
+    environments: names of the environments, defaults to all of ENVIRONMENTS.
+    agents: names of the agents, defaults to all of AGENTS.
+    num_candidates: the numbers of candidate documents.
+    slate_sizes: the slate sizes.
+    num_users: the numbers of users.
+    **kwargs: passed on to run_benchmark.
+
+  Returns:
+    A list of the records returned by run_benchmark.
+  """
+  records = []
+  for grid_point in itertools.product(environments or list(ENVIRONMENTS),
+                                      agents or list(AGENTS), num_candidates,
+                                      slate_sizes, num_users):
+    record = run_benchmark(*grid_point, **kwargs)
+    logging.info('%s', dict(record))
+    records.append(record)
+  return records
+
+
+flags.DEFINE_list('environments', list(ENVIRONMENTS),
+                  'The environments to benchmark.')
+flags.DEFINE_list('agents', list(AGENTS), 'The agents to benchmark.')
+flags.DEFINE_list('num_candidates', ['10', '100'],
+                  'The numbers of candidate documents.')
+flags.DEFINE_list('slate_sizes', ['2', '5'], 'The slate sizes.')
+flags.DEFINE_list('num_users', ['1', '4'], 'The numbers of users.')
+flags.DEFINE_integer('num_steps', 1000,
+                     'The minimum number of steps of each timed run.')
+flags.DEFINE_integer(
+    'memory_steps', 200,
+    'The minimum number of steps traced for peak memory, 0 to skip.')
+flags.DEFINE_integer('max_steps_per_episode', 100,
+                     'The maximum number of steps of an episode.')
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+  records = run_benchmarks(
+      environments=FLAGS.environments,
+      agents=FLAGS.agents,
+      num_candidates=[int(x) for x in FLAGS.num_candidates],
+      slate_sizes=[int(x) for x in FLAGS.slate_sizes],
+      num_users=[int(x) for x in FLAGS.num_users],
+      num_steps=FLAGS.num_steps,
+      memory_steps=FLAGS.memory_steps,
+      max_steps_per_episode=FLAGS.max_steps_per_episode,
+      repeats=FLAGS.repeats)
+  if results_lib.report(
+      records,
+      KEY_FIELDS,
+      higher_is_better=HIGHER_IS_BETTER,
+      lower_is_better=LOWER_IS_BETTER):
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,108 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.benchmarks.throughput."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import mock
+from recsim.benchmarks import throughput
+import tensorflow.compat.v1 as tf
+
+
+class ThroughputTest(tf.test.TestCase):
+
+  def test_run_benchmark(self):
+    record = throughput.run_benchmark(
+        'interest_exploration',
+        'RandomAgent',
+        num_candidates=5,
+        slate_size=2,
+        num_users=1,
+        num_steps=20,
+        memory_steps=5,
+        max_steps_per_episode=10)
+    self.assertEqual('ok', record['status'])
+    self.assertEqual(20, record['steps'])
+    self.assertEqual(2, record['episodes'])
+    self.assertGreater(record['steps_per_sec'], 0)
+    self.assertAllClose(record['steps_per_sec'] / 10.,
+                        record['episodes_per_sec'])
+    self.assertGreater(record['peak_memory_bytes'], 0)
+    self.assertIn('allocated_blocks_per_step', record)
+    self.assertIn('gc_collections', record)
+
+  def test_multi_user(self):
+    record = throughput.run_benchmark(
+        'interest_exploration',
+        'RandomAgent',
+        num_candidates=5,
+        slate_size=2,
+        num_users=3,
+        num_steps=10,
+        memory_steps=0,
+        max_steps_per_episode=10)
+    self.assertEqual('ok', record['status'])
+    self.assertNotIn('peak_memory_bytes', record)
+
+  def test_unsupported_combinations(self):
+    records = throughput.run_benchmarks(
+        environments=['long_term_satisfaction'],
+        agents=['RandomAgent', 'ClusterBanditAgent'],
+        num_candidates=[3],
+        slate_sizes=[2, 4],
+        num_users=[1, 2],
+        num_steps=5,
+        memory_steps=0,
+        max_steps_per_episode=5)
+    self.assertLen(records, 8)
+    statuses = {(r['agent'], r['slate_size'], r['num_users']): r['status']
+                for r in records}
+    self.assertEqual('ok', statuses[('RandomAgent', 2, 1)])
+    self.assertEqual(
+        'unsupported: The environment has no document cluster_id feature.',
+        statuses[('ClusterBanditAgent', 2, 1)])
+    self.assertEqual('unsupported: The environment has a single user.',
+                     statuses[('RandomAgent', 2, 2)])
+    self.assertEqual('unsupported: slate_size exceeds num_candidates',
+                     statuses[('RandomAgent', 4, 1)])
+
+  def test_slate_limit(self):
+    record = throughput.run_benchmark(
+        'interest_exploration',
+        'TabularQAgent',
+        num_candidates=100,
+        slate_size=5,
+        num_users=1)
+    self.assertEqual(
+        'unsupported: The agent enumerates 75287520 slates, more than 100000.',
+        record['status'])
+
+  def test_failures_are_raised(self):
+    with mock.patch.dict(throughput.AGENTS,
+                         {'RandomAgent': mock.Mock(side_effect=ValueError)}):
+      with self.assertRaises(ValueError):
+        throughput.run_benchmark(
+            'interest_exploration',
+            'RandomAgent',
+            num_candidates=5,
+            slate_size=2,
+            num_users=1)
+
+
+if __name__ == '__main__':
+  tf.test.main()
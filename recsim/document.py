@@ -98,6 +98,24 @@ class AbstractDocumentSampler(object):
   def reset_sampler(self):
     self._rng = np.random.RandomState(self._seed)
 
+  def get_state(self):
+    """Returns the state of the sampler, which set_state restores.
+
+    The state consists of the random number generator and, for samplers
+    numbering the documents they sample with a _doc_count attribute, of that
+    count. Samplers with more state should extend both methods.
+    """
+    state = {'rng': self._rng.get_state()}
+    if hasattr(self, '_doc_count'):
+      state['doc_count'] = self._doc_count
+    return state
+
+  def set_state(self, state):
+    """Restores a state returned by get_state."""
+    self._rng.set_state(state['rng'])
+    if 'doc_count' in state:
+      self._doc_count = state['doc_count']
+
   @abc.abstractmethod
   def sample_document(self):
     """Samples and return an instantiation of AbstractDocument."""
@@ -17,31 +17,42 @@ r"""An example of main function for training in RecSim.
 
 Use the interest evolution environment and a slateQ agent for illustration.
 
+Only the flags are defined at import time. TensorFlow, Dopamine and the
+runners are imported once the flags are parsed, so that --help and invalid
+arguments are reported without waiting for them. With --agent_name=random,
+a random agent is run by the lightweight runners, which never import
+TensorFlow.
+
 To run locally:
 
 python main.py --base_dir=/tmp/interest_evolution \
   --gin_bindings=simulator.runner_lib.Runner.max_steps_per_episode=50
 
+python main.py --base_dir=/tmp/interest_evolution_random --agent_name=random \
+  --gin_bindings=LightweightRunner.metrics_sink=\'csv\'
+
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+
 from absl import app
 from absl import flags
 import numpy as np
-from recsim.agents import full_slate_q_agent
-from recsim.environments import interest_evolution
-from recsim.simulator import runner_lib
+from recsim.simulator import runner_flags
 
 
 FLAGS = flags.FLAGS
 
 
-def create_agent(sess, environment, eval_mode, summary_writer=None):
+def create_agent(agent_cls, sess, environment, eval_mode, summary_writer=None):
   """Creates an instance of FullSlateQAgent.
 
   Args:
+    agent_cls: The FullSlateQAgent class, imported by main once the flags are
+      parsed.
     sess: A `tf.Session` object for running associated ops.
     environment: A recsim Gym environment.
     eval_mode: A bool for whether the agent is in training or evaluation mode.
@@ -57,14 +68,58 @@ def create_agent(sess, environment, eval_mode, summary_writer=None):
       'summary_writer': summary_writer,
       'eval_mode': eval_mode,
   }
-  return full_slate_q_agent.FullSlateQAgent(sess, **kwargs)
+  return agent_cls(sess, **kwargs)
+
+
+def create_random_agent(agent_cls, sess, environment, eval_mode,
+                        summary_writer=None):
+  """Creates an instance of RandomAgent.
+
+  Args:
+    agent_cls: The RandomAgent class, imported by main once the flags are
+      parsed.
+    sess: Unused, None when run by the lightweight runners.
+    environment: A recsim Gym environment.
+    eval_mode: Unused.
+    summary_writer: Unused.
+
+  Returns:
+    An instance of RandomAgent.
+  """
+  del sess, eval_mode, summary_writer  # Unused.
+  return agent_cls(environment.action_space)
 
 
 def main(argv):
   if len(argv) > 1:
     raise app.UsageError('Too many command-line arguments.')
-
-  runner_lib.load_gin_configs(FLAGS.gin_files, FLAGS.gin_bindings)
+  # Agents are imported before the gin configs are parsed, so that their
+  # configurables are registered when the bindings are applied.
+  # pylint: disable=g-import-not-at-top
+  if FLAGS.agent_name in (None, 'full_slate_q'):
+    from recsim.agents import full_slate_q_agent
+    from recsim.simulator import runner_lib
+    create_agent_fn = functools.partial(create_agent,
+                                        full_slate_q_agent.FullSlateQAgent)
+    train_runner_cls = runner_lib.TrainRunner
+    eval_runner_cls = runner_lib.EvalRunner
+    train_kwargs = {'episode_log_file': FLAGS.episode_log_file}
+  elif FLAGS.agent_name == 'random':
+    from recsim.agents import random_agent
+    from recsim.simulator import lightweight_runner
+    create_agent_fn = functools.partial(create_random_agent,
+                                        random_agent.RandomAgent)
+    train_runner_cls = lightweight_runner.LightweightTrainRunner
+    eval_runner_cls = lightweight_runner.LightweightEvalRunner
+    train_kwargs = {}
+  else:
+    raise app.UsageError(
+        'Unknown agent_name %r, expected full_slate_q or random.' %
+        FLAGS.agent_name)
+  from recsim.environments import interest_evolution
+  # pylint: enable=g-import-not-at-top
+
+  runner_flags.load_gin_configs(FLAGS.gin_files, FLAGS.gin_bindings)
   seed = 0
   slate_size = 2
   np.random.seed(seed)
@@ -75,18 +130,18 @@ def main(argv):
       'seed': seed,
   }
 
-  runner = runner_lib.TrainRunner(
+  runner = train_runner_cls(
       base_dir=FLAGS.base_dir,
-      create_agent_fn=create_agent,
+      create_agent_fn=create_agent_fn,
       env=interest_evolution.create_environment(env_config),
-      episode_log_file=FLAGS.episode_log_file,
       max_training_steps=50,
-      num_iterations=10)
+      num_iterations=10,
+      **train_kwargs)
   runner.run_experiment()
 
-  runner = runner_lib.EvalRunner(
+  runner = eval_runner_cls(
       base_dir=FLAGS.base_dir,
-      create_agent_fn=create_agent,
+      create_agent_fn=create_agent_fn,
       env=interest_evolution.create_environment(env_config),
       max_eval_episodes=5,
       test_mode=True)
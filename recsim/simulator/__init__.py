@@ -13,7 +13,20 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Module of the simulator."""
+"""Module of the simulator.
+
+runner_lib depends on TensorFlow and is only imported when first accessed, so
+that the simulator can be used without it.
+"""
+import importlib
+
 from recsim.simulator import environment
 from recsim.simulator import recsim_gym
-from recsim.simulator import runner_lib
+
+_LAZY_MODULES = frozenset(['runner_lib'])
+
+
+def __getattr__(name):
+  if name in _LAZY_MODULES:
+    return importlib.import_module(__name__ + '.' + name)
+  raise AttributeError('module %r has no attribute %r' % (__name__, name))
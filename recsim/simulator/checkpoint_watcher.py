@@ -0,0 +1,202 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Watches a checkpoint directory for newly completed checkpoints.
+
+Checkpoints written by the Dopamine Checkpointer are complete once their
+sentinel file exists. Rather than listing the directory at a fixed interval,
+the watcher blocks until the directory changes, using inotify on Linux and
+falling back to polling the modification time of the directory elsewhere.
+Directories which cannot be stat'ed locally (e.g. on a remote filesystem) are
+listed with TensorFlow's gfile at a fixed interval as before. Local directories
+are listed without TensorFlow, which is then never imported.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import ctypes
+import ctypes.util
+import errno
+import glob
+import os
+import select
+import time
+
+from absl import logging
+
+# inotify(7) event masks.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+
+
+class _InotifyBackend(object):
+  """Blocks until a file is written to or moved into a directory."""
+
+  def __init__(self, directory):
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1 failed.')
+    watch = libc.inotify_add_watch(self._fd, directory.encode('utf-8'),
+                                   _IN_CLOSE_WRITE | _IN_MOVED_TO)
+    if watch < 0:
+      error = ctypes.get_errno()
+      os.close(self._fd)
+      raise OSError(error, 'inotify_add_watch failed for %s.' % directory)
+
+  def wait(self, timeout_secs):
+    """Returns True if the directory may have changed within timeout_secs."""
+    readable, _, _ = select.select([self._fd], [], [], timeout_secs)
+    if not readable:
+      return False
+    # Drain all pending events, we only care that something happened.
+    try:
+      while os.read(self._fd, 4096):
+        pass
+    except OSError as e:
+      if e.errno != errno.EAGAIN:
+        raise
+    return True
+
+  def close(self):
+    os.close(self._fd)
+
+
+class _StatBackend(object):
+  """Polls the modification time of a directory."""
+
+  def __init__(self, directory, poll_interval_secs):
+    self._directory = directory
+    self._poll_interval_secs = poll_interval_secs
+    self._mtime = os.stat(directory).st_mtime_ns
+
+  def wait(self, timeout_secs):
+    """Returns True if the directory may have changed within timeout_secs."""
+    deadline = time.time() + timeout_secs
+    while True:
+      mtime = os.stat(self._directory).st_mtime_ns
+      if mtime != self._mtime:
+        self._mtime = mtime
+        return True
+      remaining = deadline - time.time()
+      if remaining <= 0:
+        return False
+      time.sleep(min(self._poll_interval_secs, remaining))
+
+  def close(self):
+    pass
+
+
+class _IntervalBackend(object):
+  """Waits a fixed interval, for directories that cannot be watched."""
+
+  def __init__(self, interval_secs):
+    self._interval_secs = interval_secs
+
+  def wait(self, timeout_secs):
+    time.sleep(min(self._interval_secs, timeout_secs))
+    return True
+
+  def close(self):
+    pass
+
+
+class CheckpointWatcher(object):
+  """Reports checkpoints completed in a directory as they appear.
+
+  Attributes:
+    backend_name: str, one of 'inotify', 'stat' or 'interval', indicating how
+      the directory is watched.
+  """
+
+  def __init__(self,
+               checkpoint_dir,
+               sentinel_file_identifier='checkpoint',
+               poll_interval_secs=1.0,
+               fallback_interval_secs=30.0,
+               use_inotify=True):
+    """Initializes a CheckpointWatcher.
+
+    Args:
+      checkpoint_dir: str, the directory the checkpoints are written to. It
+        must exist.
+      sentinel_file_identifier: str, prefix used by the checkpointer for
+        naming sentinel files.
+      poll_interval_secs: float, the interval at which the modification time
+        of the directory is checked when inotify is unavailable.
+      fallback_interval_secs: float, the interval at which the directory is
+        listed when it cannot be stat'ed locally.
+      use_inotify: bool, whether to try inotify before falling back to
+        polling.
+    """
+    sentinel = 'sentinel_{}_complete.*'.format(sentinel_file_identifier)
+    self._sentinel_glob = os.path.join(checkpoint_dir, sentinel)
+    self._backend = None
+    if use_inotify:
+      try:
+        self._backend = _InotifyBackend(checkpoint_dir)
+        self.backend_name = 'inotify'
+      except (OSError, AttributeError, TypeError) as e:
+        # AttributeError/TypeError: no inotify in the C library or no library.
+        logging.info('inotify unavailable for %s: %s', checkpoint_dir, e)
+    if self._backend is None:
+      try:
+        self._backend = _StatBackend(checkpoint_dir, poll_interval_secs)
+        self.backend_name = 'stat'
+      except OSError:
+        self._backend = _IntervalBackend(fallback_interval_secs)
+        self.backend_name = 'interval'
+
+  def completed_versions(self):
+    """Returns the sorted versions of all completed checkpoints."""
+    if self.backend_name == 'interval':
+      import tensorflow.compat.v1 as tf  # pylint: disable=g-import-not-at-top
+      try:
+        sentinels = tf.io.gfile.glob(self._sentinel_glob)
+      except tf.errors.NotFoundError:
+        return []
+    else:
+      sentinels = glob.glob(self._sentinel_glob)
+    return sorted(int(x[x.rfind('.') + 1:]) for x in sentinels)
+
+  def wait_for_new_versions(self, last_version, timeout_secs=None):
+    """Blocks until checkpoints newer than last_version are completed.
+
+    Args:
+      last_version: int, the latest version already processed.
+      timeout_secs: float or None, the maximum time to wait. If None, waits
+        indefinitely.
+
+    Returns:
+      A sorted list of the completed versions greater than last_version. It
+      is empty if timeout_secs elapsed before any appeared.
+    """
+    deadline = None if timeout_secs is None else time.time() + timeout_secs
+    while True:
+      versions = [v for v in self.completed_versions() if v > last_version]
+      if versions:
+        return versions
+      if deadline is None:
+        remaining = 3600.0
+      else:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          return []
+      self._backend.wait(remaining)
+
+  def close(self):
+    self._backend.close()
@@ -0,0 +1,70 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.checkpoint_watcher."""
+
+import os
+import threading
+import time
+
+from absl.testing import parameterized
+from recsim.simulator import checkpoint_watcher
+import tensorflow.compat.v1 as tf
+
+
+class CheckpointWatcherTest(tf.test.TestCase, parameterized.TestCase):
+
+  def setUp(self):
+    super(CheckpointWatcherTest, self).setUp()
+    self._checkpoint_dir = self.get_temp_dir()
+
+  def _write_sentinel(self, version):
+    filename = os.path.join(self._checkpoint_dir,
+                            'sentinel_checkpoint_complete.%d' % version)
+    with open(filename, 'w') as f:
+      f.write('done')
+
+  @parameterized.parameters(True, False)
+  def test_wait_for_new_versions(self, use_inotify):
+    watcher = checkpoint_watcher.CheckpointWatcher(
+        self._checkpoint_dir, poll_interval_secs=0.01, use_inotify=use_inotify)
+    if not use_inotify:
+      self.assertEqual('stat', watcher.backend_name)
+    self.assertEqual([], watcher.wait_for_new_versions(-1, timeout_secs=0.05))
+    self._write_sentinel(0)
+    self._write_sentinel(1)
+    # Checkpoints completed at once are reported together.
+    self.assertEqual([0, 1], watcher.wait_for_new_versions(-1))
+    self.assertEqual([], watcher.wait_for_new_versions(1, timeout_secs=0.05))
+
+    writer = threading.Timer(0.1, self._write_sentinel, args=(2,))
+    writer.start()
+    start = time.time()
+    self.assertEqual([2], watcher.wait_for_new_versions(1, timeout_secs=10))
+    self.assertLess(time.time() - start, 5)
+    writer.join()
+    watcher.close()
+
+  def test_unwatchable_directory(self):
+    watcher = checkpoint_watcher.CheckpointWatcher(
+        os.path.join(self._checkpoint_dir, 'missing'),
+        fallback_interval_secs=0.01)
+    self.assertEqual('interval', watcher.backend_name)
+    self.assertEqual([], watcher.wait_for_new_versions(-1, timeout_secs=0.05))
+    watcher.close()
+
+
+if __name__ == '__main__':
+  tf.test.main()
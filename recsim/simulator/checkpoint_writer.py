@@ -0,0 +1,133 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Writes checkpoints on a background thread while training continues.
+
+Checkpointing an agent synchronously stalls training for as long as its
+replay buffer or tables take to serialize. Instead, the agent snapshots its
+state on the training thread with snapshot_bundle, which copies whatever the
+agent keeps mutating, and a background thread writes the snapshot, the
+experiment data and the sentinel file of the Dopamine Checkpointer. Files of
+the checkpoint are synced to disk before the sentinel is written, so a
+checkpoint is never reported as complete before its files are durable.
+
+At most max_in_flight checkpoints are pending at any time, which bounds the
+memory held by snapshots; saving another blocks until the oldest is written.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+from concurrent import futures
+import os
+import re
+
+from absl import logging
+
+
+def _fsync_directory(directory, iteration_number):
+  """Syncs the local files of a checkpoint iteration to disk, if possible."""
+  # Files of an iteration end with the iteration number, possibly followed by
+  # an extension, e.g. ckpt.3, $store$_action_ckpt.3.gz or tf_ckpt-3.index.
+  pattern = re.compile(r'[.-]%d(\.|$)' % iteration_number)
+  try:
+    names = os.listdir(directory)
+  except OSError:
+    # Not a local directory, e.g. on a remote filesystem.
+    return
+  for name in names:
+    if not pattern.search(name) and name != 'checkpoint':
+      continue
+    try:
+      fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+    except OSError:
+      continue
+    try:
+      os.fsync(fd)
+    finally:
+      os.close(fd)
+
+
+class BackgroundCheckpointWriter(object):
+  """Saves agent snapshots and experiment data with a bounded queue."""
+
+  def __init__(self, checkpointer, checkpoint_dir, max_in_flight=1):
+    """Initializes a BackgroundCheckpointWriter.
+
+    Args:
+      checkpointer: a dopamine Checkpointer writing the experiment data.
+      checkpoint_dir: str, the directory of the checkpoints.
+      max_in_flight: int, the maximum number of checkpoints being written.
+    """
+    if max_in_flight < 1:
+      raise ValueError('max_in_flight must be positive, got %s.' %
+                       max_in_flight)
+    self._checkpointer = checkpointer
+    self._checkpoint_dir = checkpoint_dir
+    self._max_in_flight = max_in_flight
+    # A single thread keeps checkpoints, and their garbage collection, in
+    # iteration order.
+    self._executor = futures.ThreadPoolExecutor(max_workers=1)
+    self._pending = collections.deque()
+
+  def _write(self, iteration_number, experiment_data, write_fn):
+    if write_fn is not None:
+      write_fn()
+    _fsync_directory(self._checkpoint_dir, iteration_number)
+    # The checkpointer writes the sentinel last, marking the checkpoint done.
+    self._checkpointer.save_checkpoint(iteration_number, experiment_data)
+    _fsync_directory(self._checkpoint_dir, iteration_number)
+    logging.info('Wrote checkpoint %d in the background.', iteration_number)
+    return iteration_number
+
+  def _wait_for_oldest(self):
+    # Surfaces exceptions raised while writing.
+    self._pending.popleft().result()
+
+  def save_checkpoint(self, iteration_number, experiment_data, write_fn=None):
+    """Schedules writing a checkpoint, blocking while too many are pending.
+
+    Args:
+      iteration_number: int, the iteration number of the checkpoint.
+      experiment_data: dict, the experiment data to pickle, which must not be
+        modified afterwards.
+      write_fn: None or a function without arguments writing the files of the
+        agent, as returned by the agent's snapshot_bundle.
+    """
+    while len(self._pending) >= self._max_in_flight:
+      self._wait_for_oldest()
+    self._pending.append(
+        self._executor.submit(self._write, iteration_number, experiment_data,
+                              write_fn))
+
+  @property
+  def num_pending(self):
+    return sum(1 for future in self._pending if not future.done())
+
+  def wait(self):
+    """Blocks until all scheduled checkpoints are written."""
+    while self._pending:
+      self._wait_for_oldest()
+
+  def close(self):
+    """Writes all scheduled checkpoints and stops the background thread."""
+    try:
+      self.wait()
+    finally:
+      self._executor.shutdown(wait=True)
+      logging.info('Closed the checkpoint writer for %s.',
+                   self._checkpoint_dir)
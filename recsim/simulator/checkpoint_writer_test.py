@@ -0,0 +1,86 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.checkpoint_writer."""
+
+import threading
+
+from dopamine.discrete_domains import checkpointer
+from recsim.simulator import checkpoint_writer
+import tensorflow.compat.v1 as tf
+
+
+class BackgroundCheckpointWriterTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(BackgroundCheckpointWriterTest, self).setUp()
+    self._checkpoint_dir = self.get_temp_dir()
+    self._checkpointer = checkpointer.Checkpointer(self._checkpoint_dir)
+
+  def test_save_checkpoint(self):
+    writer = checkpoint_writer.BackgroundCheckpointWriter(
+        self._checkpointer, self._checkpoint_dir, max_in_flight=2)
+    written = []
+    for iteration in range(3):
+      writer.save_checkpoint(
+          iteration, {'current_iteration': iteration},
+          lambda iteration=iteration: written.append(iteration))
+    writer.close()
+    self.assertEqual([0, 1, 2], written)
+    self.assertEqual(2,
+                     checkpointer.get_latest_checkpoint_number(
+                         self._checkpoint_dir))
+    self.assertEqual({'current_iteration': 1},
+                     self._checkpointer.load_checkpoint(1))
+
+  def test_bounded_in_flight(self):
+    writer = checkpoint_writer.BackgroundCheckpointWriter(
+        self._checkpointer, self._checkpoint_dir, max_in_flight=1)
+    release = threading.Event()
+    writer.save_checkpoint(0, {}, release.wait)
+    self.assertEqual(1, writer.num_pending)
+    # The second checkpoint is only scheduled once the first is written.
+    saver = threading.Thread(target=writer.save_checkpoint, args=(1, {}))
+    saver.start()
+    saver.join(0.1)
+    self.assertTrue(saver.is_alive())
+    self.assertEqual(-1,
+                     checkpointer.get_latest_checkpoint_number(
+                         self._checkpoint_dir))
+    release.set()
+    saver.join()
+    writer.close()
+    self.assertEqual(1,
+                     checkpointer.get_latest_checkpoint_number(
+                         self._checkpoint_dir))
+
+  def test_write_error(self):
+    writer = checkpoint_writer.BackgroundCheckpointWriter(
+        self._checkpointer, self._checkpoint_dir)
+
+    def write_fn():
+      raise IOError('disk full')
+
+    writer.save_checkpoint(0, {}, write_fn)
+    with self.assertRaisesRegex(IOError, 'disk full'):
+      writer.close()
+    # The sentinel is not written for a failed checkpoint.
+    self.assertEqual(-1,
+                     checkpointer.get_latest_checkpoint_number(
+                         self._checkpoint_dir))
+
+
+if __name__ == '__main__':
+  tf.test.main()
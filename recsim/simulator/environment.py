@@ -36,8 +36,10 @@ from __future__ import print_function
 
 import abc
 import collections
+import copy
 import itertools
 
+import numpy as np
 from recsim import document
 import six
 
@@ -105,6 +107,50 @@ class AbstractEnvironment(object):
   def reset_sampler(self):
     """Resets the relevant samplers of documents and user/users."""
 
+  def _user_models(self):
+    if isinstance(self._user_model, (list, tuple)):
+      return self._user_model
+    return [self._user_model]
+
+  def get_state(self):
+    """Returns the state of the environment, which set_state restores.
+
+    Restoring the state lets a simulation continue exactly where it was, e.g.
+    when resuming an experiment from a checkpoint. The state is picklable and
+    consists of the states of the document sampler and of the user models, of
+    copies of the candidate set and of the global NumPy random number
+    generator, which the choice models and some user models draw from.
+
+    Returns:
+      A dictionary holding the state of the environment.
+    """
+    state = {
+        'document_sampler': self._document_sampler.get_state(),
+        'user_models': [
+            user_model.get_state() for user_model in self._user_models()
+        ],
+        'candidate_set': copy.deepcopy(self._candidate_set),
+        'numpy_rng': np.random.get_state(),
+    }
+    if hasattr(self, '_current_documents'):
+      state['current_documents'] = copy.deepcopy(self._current_documents)
+    return state
+
+  def set_state(self, state):
+    """Restores a state returned by get_state."""
+    user_models = self._user_models()
+    if len(state['user_models']) != len(user_models):
+      raise ValueError('Cannot set the state of {} users with the state of {} '
+                       'users.'.format(len(user_models),
+                                       len(state['user_models'])))
+    self._document_sampler.set_state(state['document_sampler'])
+    for user_model, user_model_state in zip(user_models, state['user_models']):
+      user_model.set_state(user_model_state)
+    self._candidate_set = copy.deepcopy(state['candidate_set'])
+    np.random.set_state(state['numpy_rng'])
+    if 'current_documents' in state:
+      self._current_documents = copy.deepcopy(state['current_documents'])
+
   @property
   def num_candidates(self):
     return self._num_candidates
@@ -15,12 +15,32 @@
 # limitations under the License.
 """Tests for recsim.environment."""
 
+import pickle
+import subprocess
+import sys
+
 import numpy as np
 from recsim.environments import interest_exploration as ie
 from recsim.simulator import environment
 import tensorflow.compat.v1 as tf
 
 
+def _run_steps(env, num_steps, num_users=None):
+  """Steps env with fixed slates, returning the documents and responses."""
+  trajectory = []
+  for _ in range(num_steps):
+    slate = [0, 1]
+    _, documents, responses, _ = env.step(
+        slate if num_users is None else [slate] * num_users)
+    if num_users is not None:
+      responses = [r for user_responses in responses for r in user_responses]
+    trajectory.append(
+        (list(documents),
+         [float(doc['quality']) for doc in documents.values()],
+         [(int(r.clicked), float(r.quality)) for r in responses]))
+  return trajectory
+
+
 class EnvironmentTest(tf.test.TestCase):
 
   def setUp(self):
@@ -59,6 +79,14 @@ class EnvironmentTest(tf.test.TestCase):
     ], sorted(documents.keys()))
     self.assertFalse(done)
 
+  def test_get_and_set_state(self):
+    self._environment.reset()
+    _run_steps(self._environment, 2)
+    state = pickle.loads(pickle.dumps(self._environment.get_state()))
+    expected = _run_steps(self._environment, 5)
+    self._environment.set_state(state)
+    self.assertEqual(expected, _run_steps(self._environment, 5))
+
 
 class MultiUserEnvironmentTest(tf.test.TestCase):
 
@@ -102,6 +130,32 @@ class MultiUserEnvironmentTest(tf.test.TestCase):
     ], sorted(documents.keys()))
     self.assertFalse(done)
 
+  def test_get_and_set_state(self):
+    self._environment.reset()
+    _run_steps(self._environment, 2, self._num_users)
+    state = pickle.loads(pickle.dumps(self._environment.get_state()))
+    expected = _run_steps(self._environment, 5, self._num_users)
+    self._environment.set_state(state)
+    self.assertEqual(expected, _run_steps(self._environment, 5,
+                                          self._num_users))
+    with self.assertRaises(ValueError):
+      self._environment.set_state(dict(state, user_models=[]))
+
+
+class ImportTest(tf.test.TestCase):
+
+  def test_import_without_tensorflow(self):
+    # A fresh interpreter, since this one has already imported TensorFlow.
+    code = ('import sys\n'
+            'import recsim.agents\n'
+            'import recsim.environments\n'
+            'import recsim.simulator\n'
+            'import recsim.simulator.lightweight_runner\n'
+            'print(sorted(m for m in ("tensorflow", "dopamine", "gin.tf")\n'
+            '             if m in sys.modules))\n')
+    output = subprocess.check_output([sys.executable, '-c', code])
+    self.assertEqual(b'[]', output.strip())
+
 
 if __name__ == '__main__':
   tf.test.main()
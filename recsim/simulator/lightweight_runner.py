@@ -0,0 +1,111 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runners for agents which do not use TensorFlow.
+
+The runners of runner_lib create a TensorFlow session, a summary writer and
+graph initializers for every agent. The runners here follow the same train and
+eval semantics, which they share with runner_lib through runner_base, but
+create no session and write their metrics to a pluggable metrics sink. Neither
+this module nor its dependencies import TensorFlow, unless the summary sink is
+used.
+
+Agents are created by the same create_agent_fn as in runner_lib, called with
+None for the session and the summary writer. Checkpoints use the file layout
+of the Dopamine Checkpointer, so either runner can evaluate or resume those of
+the other. Episode logging and profiling, which rely on TensorFlow, are only
+available in runner_lib.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gin
+from recsim.simulator import metrics_sinks
+from recsim.simulator import runner_base
+
+
+@gin.configurable
+class LightweightRunner(runner_base.BaseRunner):
+  """Runs experiments with agents which do not use TensorFlow.
+
+  See runner_lib.Runner, of which this is the session-free counterpart.
+  """
+
+  def __init__(self,
+               base_dir,
+               create_agent_fn,
+               env,
+               checkpoint_file_prefix='ckpt',
+               max_steps_per_episode=27000,
+               metrics_sink='jsonl'):
+    """Initializes the LightweightRunner.
+
+    Args:
+      base_dir: str, the base directory to host all required sub-directories.
+      create_agent_fn: A function taking as args a session, which is always
+        None, and an environment, as well as eval_mode and summary_writer, which
+        is always None, as keyword args, and returning an agent.
+      env: A Gym environment for running the experiments.
+      checkpoint_file_prefix: str, the prefix to use for checkpoint files.
+      max_steps_per_episode: int, maximum number of steps after which an episode
+        terminates.
+      metrics_sink: str, the name of the metrics sink, one of 'csv', 'jsonl'
+        or 'summary'. See metrics_sinks.SINKS.
+    """
+    if metrics_sink not in metrics_sinks.SINKS:
+      raise ValueError('Unknown metrics sink %r, expected one of %s.' %
+                       (metrics_sink, sorted(metrics_sinks.SINKS)))
+    super(LightweightRunner, self).__init__(
+        base_dir=base_dir,
+        create_agent_fn=create_agent_fn,
+        env=env,
+        checkpoint_file_prefix=checkpoint_file_prefix,
+        max_steps_per_episode=max_steps_per_episode)
+    self._metrics_sink_name = metrics_sink
+    self._metrics_sink = None
+
+  def _set_up(self, eval_mode):
+    """Sets up the runner by creating the metrics sink and the agent."""
+    self._makedirs(self._output_dir)
+    self._metrics_sink = metrics_sinks.create_metrics_sink(
+        self._metrics_sink_name, self._output_dir)
+    self._create_agent(None, summary_writer=None, eval_mode=eval_mode)
+
+  def _write_metric_values(self, step, suffix, metrics):
+    """Writes the metrics, with the tags of runner_lib, to the sink."""
+    self._metrics_sink.write(step, suffix, metrics)
+    self._metrics_sink.flush()
+
+  def _close(self):
+    self._metrics_sink.close()
+
+
+@gin.configurable
+class LightweightTrainRunner(runner_base.BaseTrainRunner, LightweightRunner):
+  """Trains an agent which does not use TensorFlow.
+
+  See runner_lib.TrainRunner, of which this is the session-free counterpart.
+  """
+
+
+@gin.configurable
+class LightweightEvalRunner(runner_base.BaseEvalRunner, LightweightRunner):
+  """Evaluates the checkpoints of an agent which does not use TensorFlow.
+
+  See runner_lib.EvalRunner, of which this is the session-free counterpart.
+  Checkpoints are evaluated one at a time in this process.
+  """
@@ -0,0 +1,98 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.lightweight_runner."""
+
+import json
+import os
+
+from dopamine.discrete_domains import checkpointer
+import numpy as np
+from recsim.agents import tabular_q_agent
+from recsim.environments import interest_exploration
+from recsim.simulator import lightweight_runner
+import tensorflow.compat.v1 as tf
+
+
+def _create_agent(sess, environment, eval_mode, summary_writer=None):
+  del sess, eval_mode, summary_writer  # Unused.
+  return tabular_q_agent.TabularQAgent(environment.observation_space,
+                                       environment.action_space)
+
+
+def _create_environment():
+  return interest_exploration.create_environment({
+      'num_candidates': 5,
+      'slate_size': 2,
+      'resample_documents': True,
+      'seed': 1,
+  })
+
+
+class LightweightRunnerTest(tf.test.TestCase):
+
+  def _train(self, base_dir, num_iterations):
+    np.random.seed(0)
+    runner = lightweight_runner.LightweightTrainRunner(
+        base_dir=base_dir,
+        create_agent_fn=_create_agent,
+        env=_create_environment(),
+        max_training_steps=20,
+        num_iterations=num_iterations,
+        max_steps_per_episode=5)
+    runner.run_experiment()
+
+  def _rewards(self, base_dir):
+    with open(os.path.join(base_dir, 'train', 'metrics.jsonl')) as f:
+      return [
+          json.loads(line)['metrics']['AverageEpisodeRewards'] for line in f
+      ]
+
+  def test_train_and_resume(self):
+    base_dir = os.path.join(self.get_temp_dir(), 'uninterrupted')
+    self._train(base_dir, 4)
+    resumed_base_dir = os.path.join(self.get_temp_dir(), 'resumed')
+    self._train(resumed_base_dir, 2)
+    self._train(resumed_base_dir, 4)
+    self.assertLen(self._rewards(base_dir), 4)
+    self.assertEqual(self._rewards(base_dir), self._rewards(resumed_base_dir))
+    # The checkpoints can be read by the Dopamine Checkpointer of runner_lib.
+    checkpoint_dir = os.path.join(base_dir, 'train', 'checkpoints')
+    self.assertEqual(3,
+                     checkpointer.get_latest_checkpoint_number(checkpoint_dir))
+    experiment_data = checkpointer.Checkpointer(checkpoint_dir).load_checkpoint(
+        3)
+    self.assertEqual(3, experiment_data['current_iteration'])
+
+  def test_eval(self):
+    base_dir = self.get_temp_dir()
+    self._train(base_dir, 2)
+    runner = lightweight_runner.LightweightEvalRunner(
+        base_dir=base_dir,
+        create_agent_fn=_create_agent,
+        env=_create_environment(),
+        max_eval_episodes=3,
+        test_mode=True,
+        max_steps_per_episode=5,
+        metrics_sink='csv')
+    runner.run_experiment()
+    eval_dir = os.path.join(base_dir, 'eval_3')
+    [returns_file] = tf.io.gfile.glob(os.path.join(eval_dir, 'returns_*.npy'))
+    self.assertEqual((3,), np.load(returns_file).shape)
+    self.assertTrue(os.path.exists(os.path.join(eval_dir, 'metrics.csv')))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,154 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Destinations for the metrics written by the lightweight runners.
+
+A sink receives the metrics of a train or eval phase as (tag, value) pairs,
+together with the global step and a suffix naming the phase. The CSV and JSON
+lines sinks only use the standard library. The summary sink writes TensorBoard
+events and imports TensorFlow when it is created.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import abc
+import csv
+import io
+import json
+import os
+
+import six
+
+
+@six.add_metaclass(abc.ABCMeta)
+class MetricsSink(object):
+  """Abstract destination of the metrics of a runner."""
+
+  @abc.abstractmethod
+  def write(self, step, suffix, metrics):
+    """Writes the metrics of a phase.
+
+    Args:
+      step: int, the global step of the metrics.
+      suffix: str, the name of the phase, e.g. 'train' or 'eval'.
+      metrics: a list of (tag, value) pairs, with float values.
+    """
+
+  def flush(self):
+    """Makes sure the written metrics reach their destination."""
+
+  def close(self):
+    """Flushes and releases the sink."""
+    self.flush()
+
+
+class CSVMetricsSink(MetricsSink):
+  """Appends a step,suffix,tag,value row per metric to metrics.csv."""
+
+  def __init__(self, output_dir, filename='metrics.csv'):
+    path = os.path.join(output_dir, filename)
+    write_header = not os.path.exists(path)
+    self._file = io.open(path, 'a', newline='')
+    self._writer = csv.writer(self._file)
+    if write_header:
+      self._writer.writerow(['step', 'suffix', 'tag', 'value'])
+
+  def write(self, step, suffix, metrics):
+    for tag, value in metrics:
+      self._writer.writerow([step, suffix, tag, repr(float(value))])
+
+  def flush(self):
+    self._file.flush()
+
+  def close(self):
+    self._file.close()
+
+
+class JSONLinesMetricsSink(MetricsSink):
+  """Appends a JSON object per phase to metrics.jsonl.
+
+  Each line holds the step, the suffix and an object mapping the tags to their
+  values.
+  """
+
+  def __init__(self, output_dir, filename='metrics.jsonl'):
+    self._file = io.open(os.path.join(output_dir, filename), 'a')
+
+  def write(self, step, suffix, metrics):
+    line = json.dumps({
+        'step': step,
+        'suffix': suffix,
+        'metrics': {tag: float(value) for tag, value in metrics},
+    }, sort_keys=True)
+    self._file.write(six.text_type(line) + u'\n')
+
+  def flush(self):
+    self._file.flush()
+
+  def close(self):
+    self._file.close()
+
+
+class SummaryMetricsSink(MetricsSink):
+  """Writes the metrics as TensorBoard scalars tagged tag/suffix.
+
+  The tags match those written by runner_lib, so that both runners can be
+  compared in TensorBoard.
+  """
+
+  def __init__(self, output_dir):
+    import tensorflow.compat.v1 as tf  # pylint: disable=g-import-not-at-top
+    self._tf = tf
+    # The writer does not need the graph, but cannot be created eagerly.
+    with tf.Graph().as_default():
+      self._writer = tf.summary.FileWriter(output_dir)
+
+  def write(self, step, suffix, metrics):
+    values = [
+        self._tf.Summary.Value(tag=tag + '/' + suffix, simple_value=value)
+        for tag, value in metrics
+    ]
+    self._writer.add_summary(self._tf.Summary(value=values), step)
+
+  def flush(self):
+    self._writer.flush()
+
+  def close(self):
+    self._writer.close()
+
+
+SINKS = {
+    'csv': CSVMetricsSink,
+    'jsonl': JSONLinesMetricsSink,
+    'summary': SummaryMetricsSink,
+}
+
+
+def create_metrics_sink(name, output_dir):
+  """Returns the sink registered under name, writing to output_dir.
+
+  Args:
+    name: str, one of the keys of SINKS.
+    output_dir: str, an existing directory.
+
+  Raises:
+    ValueError: if name is not a known sink.
+  """
+  if name not in SINKS:
+    raise ValueError('Unknown metrics sink %r, expected one of %s.' %
+                     (name, sorted(SINKS)))
+  return SINKS[name](output_dir)
@@ -0,0 +1,86 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.metrics_sinks."""
+
+import csv
+import json
+import os
+
+from recsim.simulator import metrics_sinks
+import tensorflow.compat.v1 as tf
+
+
+class MetricsSinksTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(MetricsSinksTest, self).setUp()
+    self._output_dir = self.get_temp_dir()
+
+  def test_csv(self):
+    sink = metrics_sinks.create_metrics_sink('csv', self._output_dir)
+    sink.write(10, 'train', [('CTR', 0.5), ('AverageQuality', 1.)])
+    sink.close()
+    # Reopening appends without repeating the header.
+    sink = metrics_sinks.create_metrics_sink('csv', self._output_dir)
+    sink.write(20, 'eval', [('CTR', 0.25)])
+    sink.close()
+    with open(os.path.join(self._output_dir, 'metrics.csv')) as f:
+      rows = list(csv.reader(f))
+    self.assertEqual([['step', 'suffix', 'tag', 'value'],
+                      ['10', 'train', 'CTR', '0.5'],
+                      ['10', 'train', 'AverageQuality', '1.0'],
+                      ['20', 'eval', 'CTR', '0.25']], rows)
+
+  def test_json_lines(self):
+    sink = metrics_sinks.create_metrics_sink('jsonl', self._output_dir)
+    sink.write(10, 'train', [('CTR', 0.5), ('AverageQuality', 1.)])
+    sink.write(20, 'train', [('CTR', 0.25)])
+    sink.close()
+    with open(os.path.join(self._output_dir, 'metrics.jsonl')) as f:
+      lines = [json.loads(line) for line in f]
+    self.assertEqual([{
+        'step': 10,
+        'suffix': 'train',
+        'metrics': {
+            'CTR': 0.5,
+            'AverageQuality': 1.
+        }
+    }, {
+        'step': 20,
+        'suffix': 'train',
+        'metrics': {
+            'CTR': 0.25
+        }
+    }], lines)
+
+  def test_summary(self):
+    sink = metrics_sinks.create_metrics_sink('summary', self._output_dir)
+    sink.write(10, 'train', [('CTR', 0.5)])
+    sink.close()
+    [events_file] = tf.io.gfile.glob(
+        os.path.join(self._output_dir, 'events.out.tfevents.*'))
+    values = [(event.step, value.tag, value.simple_value)
+              for event in tf.train.summary_iterator(events_file)
+              for value in event.summary.value]
+    self.assertEqual([(10, 'CTR/train', 0.5)], values)
+
+  def test_unknown_sink(self):
+    with self.assertRaisesRegex(ValueError, 'Unknown metrics sink'):
+      metrics_sinks.create_metrics_sink('parquet', self._output_dir)
+
+
+if __name__ == '__main__':
+  tf.test.main()
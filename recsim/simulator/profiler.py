@@ -0,0 +1,269 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Opt-in wall time profiling of the phases of a simulation step.
+
+A PhaseProfiler instruments the methods of the runner, agent and environment
+objects of an experiment by replacing them on the instances with timed
+wrappers. Nothing is wrapped unless profiling is enabled, so a disabled
+profiler adds no overhead to the simulation loop. For every phase it records
+the number of calls, the total wall time and a histogram of the call durations
+over fixed logarithmic buckets, so memory does not grow with the run length.
+Phases nest: e.g. the time of env_step includes the response simulation, state
+updates and observations of the environment.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import collections
+import functools
+import json
+import time
+
+import numpy as np
+
+# Upper limits of the duration histogram buckets, from 1us to 100s.
+_BUCKET_LIMITS = [10.**(e / 10.) for e in range(-60, 21)] + [float('inf')]
+
+
+class _PhaseRecord(object):
+  """Call count, wall time and duration histogram of a phase."""
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.
+    self.sum_squares = 0.
+    self.min = float('inf')
+    self.max = 0.
+    self.buckets = [0] * len(_BUCKET_LIMITS)
+
+  def add(self, duration):
+    self.count += 1
+    self.total += duration
+    self.sum_squares += duration * duration
+    if duration < self.min:
+      self.min = duration
+    if duration > self.max:
+      self.max = duration
+    self.buckets[bisect.bisect_left(_BUCKET_LIMITS, duration)] += 1
+
+  def histogram_proto(self):
+    """Returns the durations as a TensorBoard HistogramProto."""
+    used = [i for i, count in enumerate(self.buckets) if count]
+    first, last = (used[0], used[-1]) if used else (0, 0)
+    limits = _BUCKET_LIMITS[first:last + 1]
+    # TensorBoard expects a finite last limit.
+    limits[-1] = min(limits[-1], np.finfo(np.float64).max)
+    import tensorflow.compat.v1 as tf  # pylint: disable=g-import-not-at-top
+    return tf.HistogramProto(
+        min=self.min if self.count else 0.,
+        max=self.max,
+        num=self.count,
+        sum=self.total,
+        sum_squares=self.sum_squares,
+        bucket_limit=limits,
+        bucket=self.buckets[first:last + 1])
+
+  def report(self):
+    return {
+        'count': self.count,
+        'total_secs': self.total,
+        'mean_secs': self.total / self.count if self.count else 0.,
+        'min_secs': self.min if self.count else 0.,
+        'max_secs': self.max,
+    }
+
+
+class PhaseProfiler(object):
+  """Records wall time and call counts of named phases of the simulation."""
+
+  def __init__(self):
+    self._records = collections.OrderedDict()
+    self._instrumented = []
+
+  def reset(self):
+    """Clears all records, keeping the instrumentation in place."""
+    self._records = collections.OrderedDict()
+
+  def _record(self, phase):
+    if phase not in self._records:
+      self._records[phase] = _PhaseRecord()
+    return self._records[phase]
+
+  def wrap(self, fn, phase):
+    """Returns fn wrapped to record its calls under phase."""
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+      start = time.perf_counter()
+      try:
+        return fn(*args, **kwargs)
+      finally:
+        self._record(phase).add(time.perf_counter() - start)
+
+    return timed
+
+  def instrument(self, obj, attribute, phase):
+    """Replaces obj.attribute by a timed wrapper recording under phase.
+
+    Args:
+      obj: an object holding a callable attribute, typically a bound method.
+      attribute: str, the name of the attribute.
+      phase: str, the name under which calls are recorded.
+    """
+    self._replace(obj, attribute, lambda original: self.wrap(original, phase))
+
+  def _replace(self, obj, attribute, wrapper_fn):
+    """Replaces obj.attribute by wrapper_fn(obj.attribute) until uninstrument."""
+    had_instance_attribute = attribute in vars(obj)
+    original = getattr(obj, attribute)
+    setattr(obj, attribute, wrapper_fn(original))
+    self._instrumented.append((obj, attribute, had_instance_attribute,
+                               original))
+
+  def uninstrument(self):
+    """Restores every attribute replaced by instrument()."""
+    for obj, attribute, had_instance_attribute, original in reversed(
+        self._instrumented):
+      if had_instance_attribute:
+        setattr(obj, attribute, original)
+      else:
+        delattr(obj, attribute)
+    self._instrumented = []
+
+  def instrument_experiment(self, runner, env, agent):
+    """Instruments the phases of a runner's simulation step.
+
+    Args:
+      runner: a runner_lib.Runner, whose _log_one_step is recorded.
+      env: a RecSimGymEnv, whose step, reward aggregation and metric
+        aggregation are recorded, as well as the document resampling, user
+        response simulation, user state update and user and document
+        observations of the underlying environment.
+      agent: the agent, whose step is recorded.
+    """
+    self.instrument(agent, 'step', 'agent_step')
+    self.instrument(runner, '_log_one_step', 'log_one_step')
+    self.instrument(env, 'step', 'env_step')
+    self.instrument(env, '_reward_aggregator', 'reward_aggregation')
+    self.instrument(env, '_metrics_aggregator', 'metrics_aggregation')
+    raw_environment = env.environment
+    self.instrument(raw_environment, '_do_resample_documents',
+                    'resample_documents')
+    self._instrument_candidate_set(raw_environment)
+    # Resampling the documents and restoring a state replace the candidate
+    # set, so the new one is instrumented in turn.
+    for attribute in ('_do_resample_documents', 'set_state'):
+      self._reinstrument_candidate_set_after(raw_environment, attribute)
+    self._replace(raw_environment, 'get_state',
+                  functools.partial(self._uninstrumented_get_state,
+                                    raw_environment))
+    user_models = raw_environment.user_model
+    if not isinstance(user_models, (list, tuple)):
+      user_models = [user_models]
+    for user_model in user_models:
+      self.instrument(user_model, 'simulate_response', 'simulate_response')
+      self.instrument(user_model, 'update_state', 'update_state')
+      self.instrument(user_model, 'create_observation', 'user_observation')
+
+  def _instrument_candidate_set(self, environment):
+    """Instruments the observations of the current candidate set."""
+    self.instrument(environment.candidate_set, 'create_observation',
+                    'document_observation')
+
+  def _reinstrument_candidate_set_after(self, environment, attribute):
+    """Makes environment.attribute instrument a replaced candidate set."""
+
+    def wrapper_fn(original):
+
+      @functools.wraps(original)
+      def reinstrumented(*args, **kwargs):
+        candidate_set = environment.candidate_set
+        try:
+          return original(*args, **kwargs)
+        finally:
+          if environment.candidate_set is not candidate_set:
+            # The old candidate set is dropped, so there is nothing to
+            # restore.
+            self._instrumented = [
+                entry for entry in self._instrumented
+                if entry[0] is not candidate_set
+            ]
+            self._instrument_candidate_set(environment)
+
+      return reinstrumented
+
+    self._replace(environment, attribute, wrapper_fn)
+
+  @staticmethod
+  def _uninstrumented_get_state(environment, get_state):
+    """Makes get_state copy the candidate set without its instrumentation.
+
+    The state holds a copy of the candidate set, which is pickled in
+    checkpoints, which the timed wrapper cannot be.
+
+    Args:
+      environment: the environment whose candidate set is instrumented.
+      get_state: environment.get_state.
+
+    Returns:
+      A replacement for get_state.
+    """
+
+    @functools.wraps(get_state)
+    def uninstrumented_get_state():
+      candidate_set = environment.candidate_set
+      timed = vars(candidate_set).pop('create_observation', None)
+      try:
+        return get_state()
+      finally:
+        if timed is not None:
+          candidate_set.create_observation = timed
+
+    return uninstrumented_get_state
+
+  def report(self):
+    """Returns a dictionary mapping each phase to its statistics."""
+    return {phase: record.report() for phase, record in self._records.items()}
+
+  def write_report(self, path):
+    """Writes the report as JSON to path."""
+    import tensorflow.compat.v1 as tf  # pylint: disable=g-import-not-at-top
+    with tf.io.gfile.GFile(path, 'w') as f:
+      f.write(json.dumps(self.report(), indent=2, sort_keys=True))
+
+  def write_summaries(self, summary_writer, step, suffix):
+    """Writes duration histograms and total times to TensorBoard.
+
+    Args:
+      summary_writer: a tf.summary.FileWriter.
+      step: int, the global step of the summaries.
+      suffix: str, appended to the tags, e.g. 'train' or 'eval'.
+    """
+    import tensorflow.compat.v1 as tf  # pylint: disable=g-import-not-at-top
+    values = []
+    for phase, record in self._records.items():
+      values.append(
+          tf.Summary.Value(
+              tag='PhaseDuration/%s/%s' % (phase, suffix),
+              histo=record.histogram_proto()))
+      values.append(
+          tf.Summary.Value(
+              tag='PhaseTotalTime/%s/%s' % (phase, suffix),
+              simple_value=record.total))
+    summary_writer.add_summary(tf.Summary(value=values), step)
@@ -0,0 +1,106 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.profiler."""
+
+import json
+import os
+import pickle
+
+from recsim.agents import random_agent
+from recsim.environments import interest_exploration
+from recsim.simulator import profiler
+import tensorflow.compat.v1 as tf
+
+
+class _Counter(object):
+
+  def __init__(self):
+    self.calls = 0
+
+  def increment(self, amount=1):
+    self.calls += amount
+    return self.calls
+
+
+class PhaseProfilerTest(tf.test.TestCase):
+
+  def test_instrument_and_uninstrument(self):
+    counter = _Counter()
+    phase_profiler = profiler.PhaseProfiler()
+    phase_profiler.instrument(counter, 'increment', 'increment')
+    self.assertEqual(2, counter.increment(2))
+    self.assertEqual(3, counter.increment())
+    report = phase_profiler.report()
+    self.assertEqual(2, report['increment']['count'])
+    self.assertGreaterEqual(report['increment']['total_secs'], 0.)
+    histogram = phase_profiler._records['increment'].histogram_proto()
+    self.assertEqual(2, histogram.num)
+    self.assertEqual(2, sum(histogram.bucket))
+    phase_profiler.uninstrument()
+    self.assertNotIn('increment', vars(counter))
+    counter.increment()
+    self.assertEqual(2, phase_profiler.report()['increment']['count'])
+
+  def test_instrument_experiment(self):
+    env = interest_exploration.create_environment({
+        'num_candidates': 5,
+        'slate_size': 2,
+        'resample_documents': True,
+        'seed': 0
+    })
+    agent = random_agent.RandomAgent(env.action_space)
+    runner = _Runner()
+    phase_profiler = profiler.PhaseProfiler()
+    phase_profiler.instrument_experiment(runner, env, agent)
+    observation = env.reset()
+    for _ in range(3):
+      observation, _, _, _ = env.step(agent.step(0, observation))
+      runner._log_one_step()
+    report = phase_profiler.report()
+    for phase in ('agent_step', 'env_step', 'log_one_step',
+                  'reward_aggregation', 'simulate_response', 'update_state'):
+      self.assertEqual(3, report[phase]['count'], phase)
+    self.assertEqual(4, report['resample_documents']['count'])
+    self.assertEqual(4, report['user_observation']['count'])
+    # Every step resamples the candidate set, whose observations are still
+    # recorded.
+    self.assertEqual(4, report['document_observation']['count'])
+    # The state of the environment can be checkpointed while instrumented.
+    state = pickle.loads(pickle.dumps(env.environment.get_state()))
+    env.environment.set_state(state)
+    env.step(agent.step(0, observation))
+    report = phase_profiler.report()
+    self.assertEqual(5, report['document_observation']['count'])
+
+    path = os.path.join(self.get_temp_dir(), 'profile.json')
+    phase_profiler.write_report(path)
+    with open(path) as f:
+      self.assertEqual(report, json.load(f))
+    phase_profiler.reset()
+    self.assertEmpty(phase_profiler.report())
+    phase_profiler.uninstrument()
+    self.assertNotIn('create_observation', vars(env.environment.candidate_set))
+    self.assertNotIn('_do_resample_documents', vars(env.environment))
+
+
+class _Runner(object):
+
+  def _log_one_step(self):
+    pass
+
+
+if __name__ == '__main__':
+  tf.test.main()
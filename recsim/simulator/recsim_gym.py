@@ -169,6 +169,14 @@ class RecSimGymEnv(gym.Env):
   def reset_sampler(self):
     self._environment.reset_sampler()
 
+  def get_state(self):
+    """Returns the state of the environment, see AbstractEnvironment."""
+    return self._environment.get_state()
+
+  def set_state(self, state):
+    """Restores a state returned by get_state."""
+    self._environment.set_state(state)
+
   def render(self, mode='human'):
     raise NotImplementedError
 
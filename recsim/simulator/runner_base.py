@@ -0,0 +1,597 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Session-free base classes of the runners.
+
+The base runners implement the train and eval semantics shared by the runners
+of runner_lib and lightweight_runner: iterations of max_training_steps,
+checkpointing and resumption from the latest checkpoint, and evaluation of
+every checkpoint. Creating the agent and writing the metrics, as well as
+TensorFlow-specific steps such as episode logging or the Dopamine checkpointer,
+are left to hooks overridden by the subclasses. Neither this module nor its
+dependencies import TensorFlow.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import abc
+import glob
+import io
+import os
+import pickle
+import time
+
+from absl import logging
+import numpy as np
+from recsim.simulator import checkpoint_watcher
+from recsim.simulator import checkpoint_writer
+from recsim.simulator import environment
+from recsim.simulator import streaming_stats
+import six
+
+# The number of most recent checkpoints kept, as in Dopamine.
+CHECKPOINT_DURATION = 4
+
+
+def get_latest_checkpoint_number(checkpoint_dir,
+                                 sentinel_file_identifier='checkpoint'):
+  """Returns the version of the latest completed checkpoint, or -1 if none."""
+  sentinel = 'sentinel_{}_complete.*'.format(sentinel_file_identifier)
+  sentinels = glob.glob(os.path.join(checkpoint_dir, sentinel))
+  return max([int(x[x.rfind('.') + 1:]) for x in sentinels] or [-1])
+
+
+class Checkpointer(object):
+  """Pickles experiment data to local files like the Dopamine Checkpointer.
+
+  The data of iteration N is pickled to <prefix>.N, after which the sentinel
+  file sentinel_checkpoint_complete.N marks the checkpoint as complete. Only
+  the last CHECKPOINT_DURATION checkpoints are kept.
+  """
+
+  def __init__(self, base_directory, checkpoint_file_prefix='ckpt'):
+    """Initializes a Checkpointer, creating base_directory if needed.
+
+    Args:
+      base_directory: str, the local directory of the checkpoints.
+      checkpoint_file_prefix: str, the prefix of the checkpoint files.
+    """
+    self._base_directory = base_directory
+    self._checkpoint_file_prefix = checkpoint_file_prefix
+    self._sentinel_file_prefix = 'sentinel_checkpoint_complete'
+    if not os.path.isdir(base_directory):
+      os.makedirs(base_directory)
+
+  def _generate_filename(self, file_prefix, iteration_number):
+    return os.path.join(self._base_directory,
+                        '{}.{}'.format(file_prefix, iteration_number))
+
+  def save_checkpoint(self, iteration_number, data):
+    """Pickles data and marks the checkpoint of iteration_number complete."""
+    filename = self._generate_filename(self._checkpoint_file_prefix,
+                                       iteration_number)
+    with io.open(filename, 'wb') as f:
+      pickle.dump(data, f)
+    filename = self._generate_filename(self._sentinel_file_prefix,
+                                       iteration_number)
+    with io.open(filename, 'wb') as f:
+      f.write(b'done')
+    # Remove stale checkpoints, sentinel first so that they are never seen
+    # as complete without their data.
+    stale_iteration_number = iteration_number - CHECKPOINT_DURATION
+    if stale_iteration_number >= 0:
+      for file_prefix in (self._sentinel_file_prefix,
+                          self._checkpoint_file_prefix):
+        stale_file = self._generate_filename(file_prefix,
+                                             stale_iteration_number)
+        if os.path.exists(stale_file):
+          os.remove(stale_file)
+
+  def load_checkpoint(self, iteration_number):
+    """Returns the data of a checkpoint, or None if it does not exist."""
+    filename = self._generate_filename(self._checkpoint_file_prefix,
+                                       iteration_number)
+    if not os.path.exists(filename):
+      return None
+    with io.open(filename, 'rb') as f:
+      return pickle.load(f)
+
+
+@six.add_metaclass(abc.ABCMeta)
+class BaseRunner(object):
+  """Object that handles running experiments, without a TensorFlow session.
+
+  Here we use the term 'experiment' to mean simulating interactions between the
+  agent and the environment and reporting some statistics pertaining to these
+  interactions.
+  """
+
+  _output_dir = None
+  _checkpoint_dir = None
+  _agent = None
+  _checkpointer = None
+  _checkpoint_writer = None
+
+  def __init__(self,
+               base_dir,
+               create_agent_fn,
+               env,
+               checkpoint_file_prefix='ckpt',
+               max_steps_per_episode=27000):
+    """Initializes the BaseRunner object in charge of running an experiment.
+
+    Args:
+      base_dir: str, the base directory to host all required sub-directories.
+      create_agent_fn: A function that takes as args a Tensorflow session and an
+        environment, and returns an agent.
+      env: A Gym environment for running the experiments.
+      checkpoint_file_prefix: str, the prefix to use for checkpoint files.
+      max_steps_per_episode: int, maximum number of steps after which an episode
+        terminates.
+    """
+    logging.info('max_steps_per_episode = %s', max_steps_per_episode)
+
+    if base_dir is None:
+      raise ValueError('Missing base_dir.')
+
+    self._base_dir = base_dir
+    self._create_agent_fn = create_agent_fn
+    self._env = env
+    self._checkpoint_file_prefix = checkpoint_file_prefix
+    self._max_steps_per_episode = max_steps_per_episode
+
+  @abc.abstractmethod
+  def _set_up(self, eval_mode):
+    """Sets up the runner by creating and initializing the agent."""
+
+  def _create_agent(self, sess, summary_writer, eval_mode):
+    """Creates the agent, checking that it matches the environment."""
+    self._agent = self._create_agent_fn(
+        sess, self._env, summary_writer=summary_writer, eval_mode=eval_mode)
+    # type check: env/agent must both be multi- or single-user
+    if self._agent.multi_user and not isinstance(
+        self._env.environment, environment.MultiUserEnvironment):
+      raise ValueError('Multi-user agent requires multi-user environment.')
+    if not self._agent.multi_user and isinstance(
+        self._env.environment, environment.MultiUserEnvironment):
+      raise ValueError('Single-user agent requires single-user environment.')
+
+  def _makedirs(self, path):
+    """Creates the directory path and its parents if they do not exist."""
+    if not os.path.isdir(path):
+      os.makedirs(path)
+
+  def _open_file(self, path, mode):
+    """Opens the file at path."""
+    return io.open(path, mode)
+
+  def _create_checkpointer(self, checkpoint_file_prefix):
+    """Returns the checkpointer of the checkpoint directory."""
+    return Checkpointer(self._checkpoint_dir, checkpoint_file_prefix)
+
+  def _latest_checkpoint_number(self):
+    """Returns the version of the latest completed checkpoint, or -1."""
+    return get_latest_checkpoint_number(self._checkpoint_dir)
+
+  def _close(self):
+    """Releases the resources of the runner once an experiment has run."""
+
+  def _initialize_checkpointer_and_maybe_resume(self, checkpoint_file_prefix):
+    """Reloads the latest checkpoint if it exists.
+
+    This method will first create a checkpointer and then determine if there is
+    a valid checkpoint in self._checkpoint_dir, and what the largest file
+    number is. If a valid checkpoint file is found, it will load the bundled
+    data from this file and will pass it to the agent for it to reload its
+    data. If the agent is able to successfully unbundle, this method will
+    increase and return the iteration number keyed by 'current_iteration' and
+    the step number keyed by 'total_steps' as the return values. The state of
+    the environment, keyed by 'environment_state', is restored as well, so
+    that the simulation continues as if it had not been interrupted.
+
+    Args:
+      checkpoint_file_prefix: str, the checkpoint file prefix.
+    Returns:
+      start_iteration: The iteration number to be continued after the latest
+        checkpoint.
+      start_step: The step number to be continued after the latest checkpoint.
+    """
+    self._checkpointer = self._create_checkpointer(checkpoint_file_prefix)
+    start_iteration = 0
+    start_step = 0
+    # Check if checkpoint exists.
+    # Note that the existence of checkpoint 0 means that we have finished
+    # iteration 0 (so we will start from iteration 1).
+    latest_checkpoint_version = self._latest_checkpoint_number()
+    if latest_checkpoint_version >= 0:
+      experiment_data = self._checkpointer.load_checkpoint(
+          latest_checkpoint_version)
+      start_iteration = experiment_data['current_iteration'] + 1
+      del experiment_data['current_iteration']
+      start_step = experiment_data['total_steps'] + 1
+      del experiment_data['total_steps']
+      # Checkpoints written before the environment state was saved lack it.
+      environment_state = experiment_data.pop('environment_state', None)
+      if environment_state is not None:
+        self._env.set_state(environment_state)
+      if self._agent.unbundle(self._checkpoint_dir, latest_checkpoint_version,
+                              experiment_data):
+        logging.info('Reloaded checkpoint and will start from iteration %d',
+                     start_iteration)
+    return start_iteration, start_step
+
+  def _begin_episode_log(self):
+    """Returns the log of a new episode, or None if episodes are not logged."""
+    return None
+
+  def _log_one_step(self, user_obs, doc_obs, slate, responses, reward,
+                    is_terminal, episode_log):
+    """Adds one step of agent-environment interaction to the episode log.
+
+    Args:
+      user_obs: An array of floats representing user state observations
+      doc_obs: A list of observations of the documents
+      slate: An array of indices to doc_obs
+      responses: A list of observations of responses for items in the slate
+      reward: A float for the reward returned after this step
+      is_terminal: A boolean for whether a terminal state has been reached
+      episode_log: The log of the current episode, as returned by
+        _begin_episode_log.
+    """
+
+  def _end_episode_log(self, episode_log):
+    """Writes the log of a completed episode."""
+
+  def _run_one_episode(self):
+    """Executes a full trajectory of the agent interacting with the environment.
+
+    Returns:
+      The number of steps taken and the total reward.
+    """
+    step_number = 0
+    total_reward = 0.
+
+    start_time = time.time()
+
+    episode_log = self._begin_episode_log()
+    observation = self._env.reset()
+    action = self._agent.begin_episode(observation)
+
+    # Keep interacting until we reach a terminal state.
+    while True:
+      last_observation = observation
+      observation, reward, done, info = self._env.step(action)
+      self._log_one_step(last_observation['user'], last_observation['doc'],
+                         action, observation['response'], reward, done,
+                         episode_log)
+      # Update environment-specific metrics with responses to the slate.
+      self._env.update_metrics(observation['response'], info)
+
+      total_reward += reward
+      step_number += 1
+
+      if done:
+        break
+      elif step_number == self._max_steps_per_episode:
+        # Stop the run loop once we reach the true end of episode.
+        break
+      else:
+        action = self._agent.step(reward, observation)
+
+    self._agent.end_episode(reward, observation)
+    self._end_episode_log(episode_log)
+
+    time_diff = time.time() - start_time
+    self._update_episode_metrics(
+        episode_length=step_number,
+        episode_time=time_diff,
+        episode_reward=total_reward)
+
+    return step_number, total_reward
+
+  def _initialize_metrics(self):
+    """Initializes the metrics."""
+    self._stats = {
+        'episode_length': streaming_stats.StreamingStatistics(quantiles=()),
+        'episode_time': streaming_stats.StreamingStatistics(quantiles=()),
+        'episode_reward': streaming_stats.StreamingStatistics(),
+    }
+    # Initialize environment-specific metrics.
+    self._env.reset_metrics()
+
+  def _update_episode_metrics(self, episode_length, episode_time,
+                              episode_reward):
+    """Updates the episode metrics with one episode."""
+
+    self._stats['episode_length'].add(episode_length)
+    self._stats['episode_time'].add(episode_time)
+    self._stats['episode_reward'].add(episode_reward)
+
+  def _write_metrics(self, step, suffix):
+    """Writes the metrics of the episodes since _initialize_metrics."""
+    num_steps = self._stats['episode_length'].sum
+    episode_rewards = self._stats['episode_reward']
+    metrics = [
+        ('TimePerStep', self._stats['episode_time'].sum / num_steps),
+        ('AverageEpisodeLength', self._stats['episode_length'].mean),
+        ('AverageEpisodeRewards', episode_rewards.mean),
+        ('StdEpisodeRewards', episode_rewards.std),
+        ('P10EpisodeRewards', episode_rewards.quantile(0.1)),
+        ('MedianEpisodeRewards', episode_rewards.quantile(0.5)),
+        ('P90EpisodeRewards', episode_rewards.quantile(0.9)),
+    ]
+    # Environment-specific metrics.
+    self._env.write_metrics(lambda tag, value: metrics.append((tag, value)))
+    self._write_metric_values(step, suffix, metrics)
+
+  @abc.abstractmethod
+  def _write_metric_values(self, step, suffix, metrics):
+    """Writes metrics.
+
+    Args:
+      step: int, the number of training steps the metrics relate to.
+      suffix: str, 'train' or 'eval'.
+      metrics: a list of (tag, value) pairs.
+    """
+
+  def _checkpoint_experiment(self, iteration, total_steps):
+    """Checkpoints experiment data.
+
+    Args:
+      iteration: int, iteration number for checkpointing.
+      total_steps: int, total number of steps for all iterations so far.
+    """
+    if self._checkpoint_writer is None:
+      experiment_data = self._agent.bundle_and_checkpoint(
+          self._checkpoint_dir, iteration)
+      write_fn = None
+    else:
+      experiment_data, write_fn = self._agent.snapshot_bundle(
+          self._checkpoint_dir, iteration)
+    if experiment_data:
+      experiment_data['current_iteration'] = iteration
+      experiment_data['total_steps'] = total_steps
+      experiment_data['environment_state'] = self._env.get_state()
+      if self._checkpoint_writer is None:
+        self._checkpointer.save_checkpoint(iteration, experiment_data)
+      else:
+        self._checkpoint_writer.save_checkpoint(iteration, experiment_data,
+                                                write_fn)
+
+
+class BaseTrainRunner(BaseRunner):
+  """Object that handles running the training."""
+
+  def __init__(self,
+               max_training_steps=250000,
+               num_iterations=100,
+               checkpoint_frequency=1,
+               checkpoint_in_background=False,
+               max_pending_checkpoints=1,
+               **kwargs):
+    """Initializes a BaseTrainRunner.
+
+    Args:
+      max_training_steps: int, the number of steps run per iteration.
+      num_iterations: int, the number of iterations to run.
+      checkpoint_frequency: int, the number of iterations between checkpoints.
+      checkpoint_in_background: bool, whether to write checkpoints on a
+        background thread while training continues. The agent's state is
+        snapshotted when the checkpoint is taken with its snapshot_bundle.
+        Agents which do not override it write their files synchronously in
+        bundle_and_checkpoint and have their bundle deep-copied, so only the
+        pickling of the bundle happens in the background.
+      max_pending_checkpoints: int, the maximum number of checkpoints being
+        written in the background. Training blocks when a checkpoint is taken
+        while as many are pending.
+      **kwargs: arguments passed to the runner of the subclass.
+    """
+    logging.info(
+        'max_training_steps = %s, number_iterations = %s,'
+        'checkpoint frequency = %s iterations.', max_training_steps,
+        num_iterations, checkpoint_frequency)
+
+    super(BaseTrainRunner, self).__init__(**kwargs)
+    self._max_training_steps = max_training_steps
+    self._num_iterations = num_iterations
+    self._checkpoint_frequency = checkpoint_frequency
+    self._checkpoint_in_background = checkpoint_in_background
+    self._max_pending_checkpoints = max_pending_checkpoints
+
+    self._output_dir = os.path.join(self._base_dir, 'train')
+    self._checkpoint_dir = os.path.join(self._output_dir, 'checkpoints')
+
+    self._set_up(eval_mode=False)
+
+  def run_experiment(self):
+    """Runs a full experiment, spread over multiple iterations."""
+    logging.info('Beginning training...')
+    try:
+      start_iter, total_steps = self._initialize_checkpointer_and_maybe_resume(
+          self._checkpoint_file_prefix)
+      if self._num_iterations <= start_iter:
+        logging.warning('num_iterations (%d) < start_iteration(%d)',
+                        self._num_iterations, start_iter)
+        return
+
+      if self._checkpoint_in_background:
+        self._checkpoint_writer = checkpoint_writer.BackgroundCheckpointWriter(
+            self._checkpointer,
+            self._checkpoint_dir,
+            max_in_flight=self._max_pending_checkpoints)
+      for iteration in range(start_iter, self._num_iterations):
+        logging.info('Starting iteration %d', iteration)
+        total_steps = self._run_train_phase(total_steps)
+        if iteration % self._checkpoint_frequency == 0:
+          self._checkpoint_experiment(iteration, total_steps)
+    finally:
+      if self._checkpoint_writer is not None:
+        self._checkpoint_writer.close()
+        self._checkpoint_writer = None
+      self._close()
+
+  def _run_train_phase(self, total_steps):
+    """Runs training phase and updates total_steps."""
+
+    self._initialize_metrics()
+
+    num_steps = 0
+
+    while num_steps < self._max_training_steps:
+      episode_length, _ = self._run_one_episode()
+      num_steps += episode_length
+
+    total_steps += num_steps
+    self._write_metrics(total_steps, suffix='train')
+    return total_steps
+
+
+class BaseEvalRunner(BaseRunner):
+  """Object that handles running the evaluation.
+
+  The runner waits for checkpoints written by the train runner, using inotify
+  to be notified of new ones where available. When several checkpoints are
+  completed while an evaluation is running, either only the latest one or all
+  of them in order are evaluated next, depending on evaluate_all_checkpoints.
+  """
+
+  def __init__(self,
+               max_eval_episodes=125000,
+               test_mode=False,
+               min_interval_secs=30,
+               train_base_dir=None,
+               poll_interval_secs=1.0,
+               evaluate_all_checkpoints=False,
+               **kwargs):
+    """Initializes a BaseEvalRunner.
+
+    Args:
+      max_eval_episodes: int, the number of episodes run per evaluation.
+      test_mode: bool, if True, stops after the first evaluation.
+      min_interval_secs: float, the interval at which the checkpoint directory
+        is listed when it cannot be watched, e.g. on a remote filesystem.
+      train_base_dir: str, the base directory of the training run. Defaults to
+        base_dir.
+      poll_interval_secs: float, the interval at which the modification time of
+        the checkpoint directory is checked when inotify is unavailable.
+      evaluate_all_checkpoints: bool, whether to evaluate every checkpoint that
+        appeared since the last evaluation rather than only the latest one.
+        Checkpoints removed by the trainer before their turn are skipped.
+      **kwargs: arguments passed to the runner of the subclass.
+    """
+    logging.info('max_eval_episodes = %s', max_eval_episodes)
+    super(BaseEvalRunner, self).__init__(**kwargs)
+    self._max_eval_episodes = max_eval_episodes
+    self._test_mode = test_mode
+    self._min_interval_secs = min_interval_secs
+    self._poll_interval_secs = poll_interval_secs
+    self._evaluate_all_checkpoints = evaluate_all_checkpoints
+
+    self._output_dir = os.path.join(self._base_dir,
+                                    'eval_%s' % max_eval_episodes)
+    self._makedirs(self._output_dir)
+    if train_base_dir is None:
+      train_base_dir = self._base_dir
+    self._checkpoint_dir = os.path.join(train_base_dir, 'train', 'checkpoints')
+    # This also creates the checkpoint directory so that it can be watched
+    # before training starts.
+    self._checkpointer = self._create_checkpointer(self._checkpoint_file_prefix)
+
+    self._set_up(eval_mode=True)
+
+  def _start_evaluations(self):
+    """Prepares to evaluate checkpoints, before the first is submitted."""
+
+  def _submit_evaluation(self, checkpoint_version):
+    """Evaluates a checkpoint, by default right away in this process."""
+    self._evaluate_checkpoint(checkpoint_version)
+
+  def _wait_for_evaluations(self):
+    """Waits until all submitted evaluations are done."""
+
+  def _stop_evaluations(self):
+    """Releases what _start_evaluations acquired."""
+
+  def run_experiment(self):
+    """Evaluates checkpoints as they are completed."""
+    logging.info('Beginning evaluation...')
+    watcher = checkpoint_watcher.CheckpointWatcher(
+        self._checkpoint_dir,
+        poll_interval_secs=self._poll_interval_secs,
+        fallback_interval_secs=self._min_interval_secs)
+    logging.info('Watching %s for checkpoints (%s).', self._checkpoint_dir,
+                 watcher.backend_name)
+    checkpoint_version = -1
+    try:
+      self._start_evaluations()
+      # Note that the existence of checkpoint 0 means that we have finished
+      # iteration 0 (so we will start from iteration 1).
+      while True:
+        versions = watcher.wait_for_new_versions(checkpoint_version)
+        if not self._evaluate_all_checkpoints:
+          # Coalesce checkpoints completed since the last evaluation started.
+          versions = versions[-1:]
+        checkpoint_version = versions[-1]
+        for version in versions:
+          self._submit_evaluation(version)
+        if self._test_mode:
+          self._wait_for_evaluations()
+          break
+    finally:
+      watcher.close()
+      self._stop_evaluations()
+      self._close()
+
+  def _evaluate_checkpoint(self, checkpoint_version):
+    """Restores the agent from a checkpoint and runs an evaluation phase."""
+    experiment_data = self._checkpointer.load_checkpoint(checkpoint_version)
+    if experiment_data is None:
+      logging.warning('Checkpoint %d was removed before being evaluated.',
+                      checkpoint_version)
+      return
+    # Evaluation restarts the samplers rather than continuing the training
+    # simulation.
+    experiment_data.pop('environment_state', None)
+    assert self._agent.unbundle(self._checkpoint_dir, checkpoint_version,
+                                experiment_data)
+    self._run_eval_phase(experiment_data['total_steps'])
+
+  def _run_eval_phase(self, total_steps):
+    """Runs evaluation phase given model has been trained for total_steps."""
+
+    self._env.reset_sampler()
+    self._initialize_metrics()
+
+    # Episode returns are streamed to a .npy file of float64, which can be read
+    # back with np.load.
+    output_file = os.path.join(self._output_dir,
+                               'returns_%s.npy' % total_steps)
+    logging.info('eval_file: %s', output_file)
+    with self._open_file(output_file, 'wb') as f:
+      np.lib.format.write_array_header_1_0(
+          f, {
+              'descr': np.lib.format.dtype_to_descr(np.dtype(np.float64)),
+              'fortran_order': False,
+              'shape': (self._max_eval_episodes,)
+          })
+      num_episodes = 0
+      while num_episodes < self._max_eval_episodes:
+        _, episode_reward = self._run_one_episode()
+        f.write(np.float64(episode_reward).tobytes())
+        num_episodes += 1
+
+    self._write_metrics(total_steps, suffix='eval')
@@ -0,0 +1,36 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.runner_base."""
+
+from recsim.simulator import runner_base
+import tensorflow.compat.v1 as tf
+
+
+class CheckpointerTest(tf.test.TestCase):
+
+  def test_checkpointer_garbage_collection(self):
+    checkpoint_dir = self.get_temp_dir()
+    base_checkpointer = runner_base.Checkpointer(checkpoint_dir)
+    for iteration in range(6):
+      base_checkpointer.save_checkpoint(iteration, {'i': iteration})
+    self.assertEqual(5,
+                     runner_base.get_latest_checkpoint_number(checkpoint_dir))
+    self.assertIsNone(base_checkpointer.load_checkpoint(1))
+    self.assertEqual({'i': 2}, base_checkpointer.load_checkpoint(2))
+
+
+if __name__ == '__main__':
+  tf.test.main()
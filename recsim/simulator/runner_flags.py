@@ -0,0 +1,88 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Command-line flags and gin configuration shared by the runners.
+
+These are kept apart from runner_lib, which depends on TensorFlow, so that
+binaries can define and parse their flags before deciding what to import.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl import flags
+import gin
+
+flags.DEFINE_bool(
+    'debug_mode', False,
+    'If set to true, the agent will output in-episode statistics '
+    'to Tensorboard. Disabled by default as this results in '
+    'slower training.')
+flags.DEFINE_string('agent_name', None, 'Name of the agent.')
+flags.DEFINE_string('base_dir', None,
+                    'Base directory to host all required sub-directories.')
+flags.DEFINE_string(
+    'environment_name', 'interest_evolution',
+    'The environment with which to run the experiment. Supported choices are '
+    '{interest_evolution, interest_exploration}.')
+flags.DEFINE_string(
+    'episode_log_file', '',
+    'Filename under base_dir to output simulated episodes in SequenceExample.')
+flags.DEFINE_multi_string(
+    'gin_files', [], 'List of paths to gin configuration files (e.g.'
+    '"third_party/py/dopamine/agents/dqn/dqn.gin").')
+flags.DEFINE_multi_string(
+    'gin_bindings', [],
+    'Gin bindings to override the values set in the config files '
+    '(e.g. "runner_lib.Runner.max_steps_per_episode=100')
+
+
+FLAGS = flags.FLAGS
+
+# The gin files and bindings loaded by load_gin_configs, in order.
+_loaded_gin_files = []
+_loaded_gin_bindings = []
+
+
+def load_gin_configs(gin_files, gin_bindings):
+  """Loads gin configuration files.
+
+  The modules defining the configurables referenced by the files and bindings
+  must be imported beforehand.
+
+  Args:
+    gin_files: list, of paths to the gin configuration files for this
+      experiment.
+    gin_bindings: list, of gin parameter bindings to override the values in the
+      config files.
+  """
+  gin.parse_config_files_and_bindings(
+      gin_files, bindings=gin_bindings, skip_unknown=False)
+  _loaded_gin_files.extend(gin_files)
+  _loaded_gin_bindings.extend(gin_bindings)
+
+
+def loaded_gin_configs():
+  """Returns the gin files and bindings loaded so far by load_gin_configs.
+
+  Unlike gin.config_str(), which only lists the bindings of the configurables
+  called so far, these reproduce the whole configuration, e.g. in another
+  process.
+
+  Returns:
+    A (gin_files, gin_bindings) pair of lists.
+  """
+  return list(_loaded_gin_files), list(_loaded_gin_bindings)
@@ -19,79 +19,47 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import atexit
+from concurrent import futures
+import multiprocessing
 import os
-import time
 
 from absl import flags
 from dopamine.discrete_domains import checkpointer
 import gin.tf
 from gym import spaces
-import numpy as np
 from recsim.simulator import environment
+from recsim.simulator import profiler
+from recsim.simulator import runner_base
+from recsim.simulator import runner_flags
 import tensorflow.compat.v1 as tf
 
 
-flags.DEFINE_bool(
-    'debug_mode', False,
-    'If set to true, the agent will output in-episode statistics '
-    'to Tensorboard. Disabled by default as this results in '
-    'slower training.')
-flags.DEFINE_string('agent_name', None, 'Name of the agent.')
-flags.DEFINE_string('base_dir', None,
-                    'Base directory to host all required sub-directories.')
-flags.DEFINE_string(
-    'environment_name', 'interest_evolution',
-    'The environment with which to run the experiment. Supported choices are '
-    '{interest_evolution, interest_exploration}.')
-flags.DEFINE_string(
-    'episode_log_file', '',
-    'Filename under base_dir to output simulated episodes in SequenceExample.')
-flags.DEFINE_multi_string(
-    'gin_files', [], 'List of paths to gin configuration files (e.g.'
-    '"third_party/py/dopamine/agents/dqn/dqn.gin").')
-flags.DEFINE_multi_string(
-    'gin_bindings', [],
-    'Gin bindings to override the values set in the config files '
-    '(e.g. "runner_lib.Runner.max_steps_per_episode=100')
-
-
 FLAGS = flags.FLAGS
 
-
-def load_gin_configs(gin_files, gin_bindings):
-  """Loads gin configuration files.
-
-  Args:
-    gin_files: list, of paths to the gin configuration files for this
-      experiment.
-    gin_bindings: list, of gin parameter bindings to override the values in the
-      config files.
-  """
-  gin.parse_config_files_and_bindings(
-      gin_files, bindings=gin_bindings, skip_unknown=False)
+# Kept for the binaries importing it from here.
+load_gin_configs = runner_flags.load_gin_configs
 
 
 @gin.configurable
-class Runner(object):
+class Runner(runner_base.BaseRunner):
   """Object that handles running experiments.
 
   Here we use the term 'experiment' to mean simulating interactions between the
   agent and the environment and reporting some statistics pertaining to these
-  interactions.
+  interactions. This runner creates a TensorFlow session for the agent, writes
+  metrics as TensorBoard summaries and checkpoints with the Dopamine
+  Checkpointer.
   """
 
-  _output_dir = None
-  _checkpoint_dir = None
-  _agent = None
-  _checkpointer = None
-
   def __init__(self,
                base_dir,
                create_agent_fn,
                env,
                episode_log_file='',
                checkpoint_file_prefix='ckpt',
-               max_steps_per_episode=27000):
+               max_steps_per_episode=27000,
+               profile=False):
     """Initializes the Runner object in charge of running a full experiment.
 
     Args:
@@ -104,19 +72,21 @@ class Runner(object):
       checkpoint_file_prefix: str, the prefix to use for checkpoint files.
       max_steps_per_episode: int, maximum number of steps after which an episode
         terminates.
+      profile: bool, whether to record the wall time of the phases of every
+        step (agent step, response simulation, state updates, observations,
+        reward and metric aggregation and logging). Durations are written as
+        TensorBoard histograms and to a JSON report next to the summaries
+        whenever metrics are written.
     """
-    tf.logging.info('max_steps_per_episode = %s', max_steps_per_episode)
-
-    if base_dir is None:
-      raise ValueError('Missing base_dir.')
-
-    self._base_dir = base_dir
-    self._create_agent_fn = create_agent_fn
-    self._env = env
-    self._checkpoint_file_prefix = checkpoint_file_prefix
-    self._max_steps_per_episode = max_steps_per_episode
+    super(Runner, self).__init__(
+        base_dir=base_dir,
+        create_agent_fn=create_agent_fn,
+        env=env,
+        checkpoint_file_prefix=checkpoint_file_prefix,
+        max_steps_per_episode=max_steps_per_episode)
     self._episode_log_file = episode_log_file
     self._episode_writer = None
+    self._profiler = profiler.PhaseProfiler() if profile else None
 
   def _set_up(self, eval_mode):
     """Sets up the runner by creating and initializing the agent."""
@@ -125,71 +95,42 @@ class Runner(object):
     tf.reset_default_graph()
     self._summary_writer = tf.summary.FileWriter(self._output_dir)
     if self._episode_log_file:
-      self._episode_writer = tf.io.TFRecordWriter(
-          os.path.join(self._output_dir, self._episode_log_file))
+      self._episode_writer = tf.io.TFRecordWriter(self._episode_log_path())
     # Set up a session and initialize variables.
     self._sess = tf.Session(config=tf.ConfigProto(allow_soft_placement=True))
-    self._agent = self._create_agent_fn(
-        self._sess,
-        self._env,
-        summary_writer=self._summary_writer,
-        eval_mode=eval_mode)
-    # type check: env/agent must both be multi- or single-user
-    if self._agent.multi_user and not isinstance(
-        self._env.environment, environment.MultiUserEnvironment):
-      raise ValueError('Multi-user agent requires multi-user environment.')
-    if not self._agent.multi_user and isinstance(
-        self._env.environment, environment.MultiUserEnvironment):
-      raise ValueError('Single-user agent requires single-user environment.')
+    self._create_agent(
+        self._sess, summary_writer=self._summary_writer, eval_mode=eval_mode)
+    if self._profiler is not None:
+      self._profiler.uninstrument()
+      self._profiler.instrument_experiment(self, self._env, self._agent)
     self._summary_writer.add_graph(graph=tf.get_default_graph())
     self._sess.run(tf.global_variables_initializer())
     self._sess.run(tf.local_variables_initializer())
 
-  def _initialize_checkpointer_and_maybe_resume(self, checkpoint_file_prefix):
-    """Reloads the latest checkpoint if it exists.
+  def _episode_log_path(self):
+    """Returns the path of the file episodes are logged to."""
+    return os.path.join(self._output_dir, self._episode_log_file)
 
-    This method will first create a `Checkpointer` object and then call
-    `checkpointer.get_latest_checkpoint_number` to determine if there is a valid
-    checkpoint in self._checkpoint_dir, and what the largest file number is.
-    If a valid checkpoint file is found, it will load the bundled data from this
-    file and will pass it to the agent for it to reload its data.
-    If the agent is able to successfully unbundle, this method will increase and
-    return the iteration number keyed by 'current_iteration' and the step number
-    keyed by 'total_steps' as the return values.
+  def _makedirs(self, path):
+    tf.io.gfile.makedirs(path)
 
-    Args:
-      checkpoint_file_prefix: str, the checkpoint file prefix.
-    Returns:
-      start_iteration: The iteration number to be continued after the latest
-        checkpoint.
-      start_step: The step number to be continued after the latest checkpoint.
-    """
-    self._checkpointer = checkpointer.Checkpointer(self._checkpoint_dir,
-                                                   checkpoint_file_prefix)
-    start_iteration = 0
-    start_step = 0
-    # Check if checkpoint exists.
-    # Note that the existence of checkpoint 0 means that we have finished
-    # iteration 0 (so we will start from iteration 1).
-    latest_checkpoint_version = checkpointer.get_latest_checkpoint_number(
-        self._checkpoint_dir)
-    if latest_checkpoint_version >= 0:
-      assert not self._episode_writer, 'Can only log episodes from scratch.'
-      experiment_data = self._checkpointer.load_checkpoint(
-          latest_checkpoint_version)
-      start_iteration = experiment_data['current_iteration'] + 1
-      del experiment_data['current_iteration']
-      start_step = experiment_data['total_steps'] + 1
-      del experiment_data['total_steps']
-      if self._agent.unbundle(self._checkpoint_dir, latest_checkpoint_version,
-                              experiment_data):
-        tf.logging.info(
-            'Reloaded checkpoint and will start from '
-            'iteration %d', start_iteration)
-    return start_iteration, start_step
+  def _open_file(self, path, mode):
+    return tf.io.gfile.GFile(path, mode)
+
+  def _create_checkpointer(self, checkpoint_file_prefix):
+    return checkpointer.Checkpointer(self._checkpoint_dir,
+                                     checkpoint_file_prefix)
+
+  def _latest_checkpoint_number(self):
+    return checkpointer.get_latest_checkpoint_number(self._checkpoint_dir)
+
+  def _begin_episode_log(self):
+    if self._episode_writer is None:
+      return None
+    return tf.train.SequenceExample()
 
   def _log_one_step(self, user_obs, doc_obs, slate, responses, reward,
-                    is_terminal, sequence_example):
+                    is_terminal, episode_log):
     """Adds one step of agent-environment interaction into SequenceExample.
 
     Args:
@@ -199,7 +140,7 @@ class Runner(object):
       responses: A list of observations of responses for items in the slate
       reward: A float for the reward returned after this step
       is_terminal: A boolean for whether a terminal state has been reached
-      sequence_example: A SequenceExample proto for logging current episode
+      episode_log: A SequenceExample proto for logging current episode
     """
 
     def _add_float_feature(feature, values):
@@ -210,7 +151,7 @@ class Runner(object):
 
     if self._episode_writer is None:
       return
-    fl = sequence_example.feature_lists.feature_list
+    fl = episode_log.feature_lists.feature_list
 
     if isinstance(self._env.environment, environment.MultiUserEnvironment):
       for i, (single_user,
@@ -249,237 +190,156 @@ class Runner(object):
 
     _add_int64_feature(fl['is_terminal'], [is_terminal])
 
-  def _run_one_episode(self):
-    """Executes a full trajectory of the agent interacting with the environment.
-
-    Returns:
-      The number of steps taken and the total reward.
-    """
-    step_number = 0
-    total_reward = 0.
-
-    start_time = time.time()
-
-    sequence_example = tf.train.SequenceExample()
-    observation = self._env.reset()
-    action = self._agent.begin_episode(observation)
-
-    # Keep interacting until we reach a terminal state.
-    while True:
-      last_observation = observation
-      observation, reward, done, info = self._env.step(action)
-      self._log_one_step(last_observation['user'], last_observation['doc'],
-                         action, observation['response'], reward, done,
-                         sequence_example)
-      # Update environment-specific metrics with responses to the slate.
-      self._env.update_metrics(observation['response'], info)
-
-      total_reward += reward
-      step_number += 1
-
-      if done:
-        break
-      elif step_number == self._max_steps_per_episode:
-        # Stop the run loop once we reach the true end of episode.
-        break
-      else:
-        action = self._agent.step(reward, observation)
-
-    self._agent.end_episode(reward, observation)
+  def _end_episode_log(self, episode_log):
     if self._episode_writer is not None:
-      self._episode_writer.write(sequence_example.SerializeToString())
-
-    time_diff = time.time() - start_time
-    self._update_episode_metrics(
-        episode_length=step_number,
-        episode_time=time_diff,
-        episode_reward=total_reward)
+      self._episode_writer.write(episode_log.SerializeToString())
 
-    return step_number, total_reward
+  def _close(self):
+    if self._episode_writer is not None:
+      self._episode_writer.close()
+      self._episode_writer = None
 
   def _initialize_metrics(self):
-    """Initializes the metrics."""
-    self._stats = {
-        'episode_length': [],
-        'episode_time': [],
-        'episode_reward': [],
-    }
-    # Initialize environment-specific metrics.
-    self._env.reset_metrics()
-
-  def _update_episode_metrics(self, episode_length, episode_time,
-                              episode_reward):
-    """Updates the episode metrics with one episode."""
-
-    self._stats['episode_length'].append(episode_length)
-    self._stats['episode_time'].append(episode_time)
-    self._stats['episode_reward'].append(episode_reward)
-
-  def _write_metrics(self, step, suffix):
-    """Writes the metrics to Tensorboard summaries."""
+    super(Runner, self)._initialize_metrics()
+    if self._profiler is not None:
+      self._profiler.reset()
 
-    def add_summary(tag, value):
+  def _write_metric_values(self, step, suffix, metrics):
+    """Writes the metrics to Tensorboard summaries."""
+    for tag, value in metrics:
       summary = tf.Summary(
           value=[tf.Summary.Value(tag=tag + '/' + suffix, simple_value=value)])
       self._summary_writer.add_summary(summary, step)
 
-    num_steps = np.sum(self._stats['episode_length'])
-    time_per_step = np.sum(self._stats['episode_time']) / num_steps
-
-    add_summary('TimePerStep', time_per_step)
-    add_summary('AverageEpisodeLength', np.mean(self._stats['episode_length']))
-    add_summary('AverageEpisodeRewards', np.mean(self._stats['episode_reward']))
-    add_summary('StdEpisodeRewards', np.std(self._stats['episode_reward']))
-
-    # Environment-specific Tensorboard summaries.
-    self._env.write_metrics(add_summary)
+    if self._profiler is not None:
+      self._profiler.write_summaries(self._summary_writer, step, suffix)
+      self._profiler.write_report(
+          os.path.join(self._output_dir, 'profile_%s_%s.json' % (suffix, step)))
 
     self._summary_writer.flush()
 
-  def _checkpoint_experiment(self, iteration, total_steps):
-    """Checkpoints experiment data.
-
-    Args:
-      iteration: int, iteration number for checkpointing.
-      total_steps: int, total number of steps for all iterations so far.
-    """
-    experiment_data = self._agent.bundle_and_checkpoint(self._checkpoint_dir,
-                                                        iteration)
-    if experiment_data:
-      experiment_data['current_iteration'] = iteration
-      experiment_data['total_steps'] = total_steps
-      self._checkpointer.save_checkpoint(iteration, experiment_data)
-
 
 @gin.configurable
-class TrainRunner(Runner):
+class TrainRunner(runner_base.BaseTrainRunner, Runner):
   """Object that handles running the training.
 
   See main.py for a simple example to train an agent.
+
+  With checkpoint_in_background, the files of agents implementing
+  snapshot_bundle (e.g. the DQN-based agents and TabularQAgent) are written
+  while training continues. Other agents still write their files
+  synchronously, and only the checkpoint of the runner is written in the
+  background.
   """
 
-  def __init__(self, max_training_steps=250000, num_iterations=100,
-               checkpoint_frequency=1, **kwargs):
-    tf.logging.info(
-        'max_training_steps = %s, number_iterations = %s,'
-        'checkpoint frequency = %s iterations.', max_training_steps,
-        num_iterations, checkpoint_frequency)
-
-    super(TrainRunner, self).__init__(**kwargs)
-    self._max_training_steps = max_training_steps
-    self._num_iterations = num_iterations
-    self._checkpoint_frequency = checkpoint_frequency
-
-    self._output_dir = os.path.join(self._base_dir, 'train')
-    self._checkpoint_dir = os.path.join(self._output_dir, 'checkpoints')
-
-    self._set_up(eval_mode=False)
-
-  def run_experiment(self):
-    """Runs a full experiment, spread over multiple iterations."""
-    tf.logging.info('Beginning training...')
-    start_iter, total_steps = self._initialize_checkpointer_and_maybe_resume(
-        self._checkpoint_file_prefix)
-    if self._num_iterations <= start_iter:
-      tf.logging.warning('num_iterations (%d) < start_iteration(%d)',
-                         self._num_iterations, start_iter)
-      return
+  def _episode_log_path(self):
+    """Returns the path of the shard episodes are logged to.
+
+    When resuming from a checkpoint, episodes are logged to a new shard named
+    after the first iteration run, leaving the shards of previous runs intact.
+    """
+    path = super(TrainRunner, self)._episode_log_path()
+    latest_checkpoint_version = self._latest_checkpoint_number()
+    if latest_checkpoint_version >= 0:
+      path = '%s-%05d' % (path, latest_checkpoint_version + 1)
+    return path
 
-    for iteration in range(start_iter, self._num_iterations):
-      tf.logging.info('Starting iteration %d', iteration)
-      total_steps = self._run_train_phase(total_steps)
-      if iteration % self._checkpoint_frequency == 0:
-        self._checkpoint_experiment(iteration, total_steps)
 
-  def _run_train_phase(self, total_steps):
-    """Runs training phase and updates total_steps."""
+# The EvalRunner of a worker process, created by _initialize_worker.
+_worker_runner = None
 
-    self._initialize_metrics()
 
-    num_steps = 0
+def _initialize_worker(runner_fn, gin_files, gin_bindings):
+  """Loads the gin configuration and creates the EvalRunner of a worker."""
+  global _worker_runner
+  runner_flags.load_gin_configs(gin_files, gin_bindings)
+  _worker_runner = runner_fn()
+  atexit.register(_worker_runner._close)  # pylint: disable=protected-access
 
-    while num_steps < self._max_training_steps:
-      episode_length, _ = self._run_one_episode()
-      num_steps += episode_length
 
-    total_steps += num_steps
-    self._write_metrics(total_steps, suffix='train')
-    return total_steps
+def _evaluate_checkpoint_in_worker(checkpoint_version):
+  """Evaluates a checkpoint with the EvalRunner of a worker process."""
+  # pylint: disable=protected-access
+  _worker_runner._evaluate_checkpoint(checkpoint_version)
+  return checkpoint_version
 
 
 @gin.configurable
-class EvalRunner(Runner):
+class EvalRunner(runner_base.BaseEvalRunner, Runner):
   """Object that handles running the evaluation.
 
   See main.py for a simple example to evaluate an agent.
+
+  The runner waits for checkpoints written by the TrainRunner, using inotify
+  to be notified of new ones where available. When several checkpoints are
+  completed while an evaluation is running, either only the latest one or all
+  of them in order are evaluated next, depending on evaluate_all_checkpoints.
+  Checkpoints can also be evaluated concurrently in num_workers processes.
+
+  Each worker process loads the gin files and bindings loaded in this process
+  by runner_flags.load_gin_configs, creates its runner once with
+  worker_runner_fn and reuses it for every checkpoint it is handed. Its
+  evaluations therefore match the ones this process would run, provided that
+  worker_runner_fn creates a runner like this one and that the environment's
+  reset_sampler fully resets its samplers.
   """
 
-  def __init__(self,
-               max_eval_episodes=125000,
-               test_mode=False,
-               min_interval_secs=30,
-               train_base_dir=None,
-               **kwargs):
-    tf.logging.info('max_eval_episodes = %s', max_eval_episodes)
+  def __init__(self, num_workers=1, worker_runner_fn=None, **kwargs):
+    """Initializes an EvalRunner.
+
+    Args:
+      num_workers: int, the number of processes evaluating checkpoints
+        concurrently. With more than one worker, evaluations run in worker
+        processes created with worker_runner_fn.
+      worker_runner_fn: a picklable function without arguments returning an
+        EvalRunner with num_workers=1, called once in each worker process
+        after the gin configuration of this process has been loaded there. Its
+        module must import the configurables that configuration refers to.
+        Required if num_workers > 1.
+      **kwargs: arguments passed to runner_base.BaseEvalRunner and Runner.
+    """
+    if num_workers > 1 and worker_runner_fn is None:
+      raise ValueError('worker_runner_fn is required when num_workers > 1.')
+    self._num_workers = num_workers
+    self._worker_runner_fn = worker_runner_fn
+    self._executor = None
+    self._pending = []
     super(EvalRunner, self).__init__(**kwargs)
-    self._max_eval_episodes = max_eval_episodes
-    self._test_mode = test_mode
-    self._min_interval_secs = min_interval_secs
-
-    self._output_dir = os.path.join(self._base_dir,
-                                    'eval_%s' % max_eval_episodes)
-    tf.io.gfile.makedirs(self._output_dir)
-    if train_base_dir is None:
-      train_base_dir = self._base_dir
-    self._checkpoint_dir = os.path.join(train_base_dir, 'train', 'checkpoints')
-
-    self._set_up(eval_mode=True)
-
-  def run_experiment(self):
-    """Runs a full experiment, spread over multiple iterations."""
-    tf.logging.info('Beginning evaluation...')
-    # Use the checkpointer class.
-    self._checkpointer = checkpointer.Checkpointer(
-        self._checkpoint_dir, self._checkpoint_file_prefix)
-    checkpoint_version = -1
-    # Check new checkpoints in a loop.
-    while True:
-      # Check if checkpoint exists.
-      # Note that the existence of checkpoint 0 means that we have finished
-      # iteration 0 (so we will start from iteration 1).
-      latest_checkpoint_version = checkpointer.get_latest_checkpoint_number(
-          self._checkpoint_dir)
-      # checkpoints_iterator already makes sure a new checkpoint exists.
-      if latest_checkpoint_version <= checkpoint_version:
-        time.sleep(self._min_interval_secs)
-        continue
-      checkpoint_version = latest_checkpoint_version
-      experiment_data = self._checkpointer.load_checkpoint(
-          latest_checkpoint_version)
-      assert self._agent.unbundle(self._checkpoint_dir,
-                                  latest_checkpoint_version, experiment_data)
-
-      self._run_eval_phase(experiment_data['total_steps'])
-      if self._test_mode:
-        break
-
-  def _run_eval_phase(self, total_steps):
-    """Runs evaluation phase given model has been trained for total_steps."""
-
-    self._env.reset_sampler()
-    self._initialize_metrics()
-
-    num_episodes = 0
-    episode_rewards = []
-
-    while num_episodes < self._max_eval_episodes:
-      _, episode_reward = self._run_one_episode()
-      episode_rewards.append(episode_reward)
-      num_episodes += 1
-
-    self._write_metrics(total_steps, suffix='eval')
-
-    output_file = os.path.join(self._output_dir, 'returns_%s' % total_steps)
-    tf.logging.info('eval_file: %s', output_file)
-    with tf.io.gfile.GFile(output_file, 'w+') as f:
-      f.write(str(episode_rewards))
+
+  def _start_evaluations(self):
+    if self._num_workers > 1:
+      # Workers are spawned rather than forked so that they do not inherit the
+      # TensorFlow session of this process.
+      gin_files, gin_bindings = runner_flags.loaded_gin_configs()
+      self._executor = futures.ProcessPoolExecutor(
+          self._num_workers,
+          mp_context=multiprocessing.get_context('spawn'),
+          initializer=_initialize_worker,
+          initargs=(self._worker_runner_fn, gin_files, gin_bindings))
+
+  def _submit_evaluation(self, checkpoint_version):
+    """Hands a checkpoint to a free worker, blocking until one is free."""
+    if self._executor is None:
+      self._evaluate_checkpoint(checkpoint_version)
+      return
+    while len(self._pending) >= self._num_workers:
+      done, _ = futures.wait(
+          self._pending, return_when=futures.FIRST_COMPLETED)
+      for future in done:
+        # Surfaces exceptions raised in the worker.
+        future.result()
+        self._pending.remove(future)
+    self._pending.append(
+        self._executor.submit(_evaluate_checkpoint_in_worker,
+                              checkpoint_version))
+
+  def _wait_for_evaluations(self):
+    for future in futures.as_completed(self._pending):
+      future.result()
+    self._pending = []
+
+  def _stop_evaluations(self):
+    if self._executor is not None:
+      self._executor.shutdown(wait=True)
+      self._executor = None
+      self._pending = []
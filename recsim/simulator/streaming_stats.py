@@ -0,0 +1,165 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Summary statistics of a stream of values in constant memory."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import math
+
+import numpy as np
+
+
+class _P2Quantile(object):
+  """Estimates a quantile of a stream with the P-square algorithm.
+
+  See "The P2 Algorithm for Dynamic Calculation of Quantiles and Histograms
+  Without Storing Observations", Raj Jain and Imrich Chlamtac, 1985. Five
+  markers track the minimum, the maximum, the estimated quantile and two
+  intermediate quantiles, and are adjusted with piecewise-parabolic
+  interpolation as values arrive. The first values are kept exactly and used
+  to place the markers, which makes early estimates considerably better than
+  starting from five values.
+  """
+
+  def __init__(self, p, exact_capacity=128):
+    self._p = p
+    self._exact_capacity = max(exact_capacity, 5)
+    self._buffer = []
+    self._heights = None
+    self._positions = None
+    self._desired = None
+    self._increments = [0., p / 2., p, (1. + p) / 2., 1.]
+
+  def _initialize_markers(self):
+    """Places the five markers at the corresponding order statistics."""
+    values = sorted(self._buffer)
+    last = len(values) - 1
+    self._desired = [f * last for f in self._increments]
+    positions = [int(round(f * last)) for f in self._increments]
+    # Markers must occupy distinct positions.
+    for i in range(1, 5):
+      positions[i] = max(positions[i], positions[i - 1] + 1)
+    for i in range(3, -1, -1):
+      positions[i] = min(positions[i], positions[i + 1] - 1)
+    self._positions = positions
+    self._heights = [values[i] for i in positions]
+    self._buffer = None
+
+  def add(self, value):
+    """Adds a value to the stream."""
+    if self._buffer is not None:
+      self._buffer.append(value)
+      if len(self._buffer) == self._exact_capacity:
+        self._initialize_markers()
+      return
+    heights = self._heights
+    if value < heights[0]:
+      heights[0] = value
+      k = 0
+    elif value >= heights[4]:
+      heights[4] = value
+      k = 3
+    else:
+      k = 0
+      while value >= heights[k + 1]:
+        k += 1
+    positions = self._positions
+    for i in range(k + 1, 5):
+      positions[i] += 1
+    for i in range(5):
+      self._desired[i] += self._increments[i]
+    for i in range(1, 4):
+      d = self._desired[i] - positions[i]
+      if ((d >= 1. and positions[i + 1] - positions[i] > 1) or
+          (d <= -1. and positions[i - 1] - positions[i] < -1)):
+        d = 1 if d > 0 else -1
+        height = self._parabolic(i, d)
+        if not heights[i - 1] < height < heights[i + 1]:
+          height = heights[i] + d * (heights[i + d] - heights[i]) / (
+              positions[i + d] - positions[i])
+        heights[i] = height
+        positions[i] += d
+
+  def _parabolic(self, i, d):
+    q, n = self._heights, self._positions
+    return q[i] + d / (n[i + 1] - n[i - 1]) * (
+        (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+        (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+  def value(self):
+    """Returns the current estimate, exact until the markers are placed."""
+    if self._buffer is not None:
+      if not self._buffer:
+        return float('nan')
+      return float(np.percentile(self._buffer, 100. * self._p))
+    return self._heights[2]
+
+
+class StreamingStatistics(object):
+  """Accumulates count, sum, mean, variance, extrema and quantiles of a stream.
+
+  The mean and variance are updated with Welford's algorithm and quantiles are
+  estimated with the P-square algorithm, so memory use does not grow with the
+  number of values.
+  """
+
+  def __init__(self, quantiles=(0.1, 0.5, 0.9)):
+    """Initializes a StreamingStatistics object.
+
+    Args:
+      quantiles: the quantiles, in [0, 1], to estimate.
+    """
+    self.count = 0
+    self.sum = 0.
+    self.min = float('inf')
+    self.max = float('-inf')
+    self._mean = 0.
+    self._m2 = 0.
+    self._quantiles = {p: _P2Quantile(p) for p in quantiles}
+
+  def add(self, value):
+    """Adds a value to the stream."""
+    value = float(value)
+    self.count += 1
+    self.sum += value
+    self.min = min(self.min, value)
+    self.max = max(self.max, value)
+    delta = value - self._mean
+    self._mean += delta / self.count
+    self._m2 += delta * (value - self._mean)
+    for estimator in self._quantiles.values():
+      estimator.add(value)
+
+  @property
+  def mean(self):
+    return self._mean if self.count else float('nan')
+
+  @property
+  def variance(self):
+    """The population variance, as computed by np.var."""
+    return self._m2 / self.count if self.count else float('nan')
+
+  @property
+  def std(self):
+    return math.sqrt(self.variance)
+
+  def quantile(self, p):
+    """Returns the estimate of quantile p, which must be tracked."""
+    if p not in self._quantiles:
+      raise ValueError('Quantile {} is not tracked.'.format(p))
+    return self._quantiles[p].value()
@@ -0,0 +1,59 @@
+# coding=utf-8
+# coding=utf-8
+# Copyright 2019 The RecSim Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for recsim.simulator.streaming_stats."""
+
+from absl.testing import parameterized
+import numpy as np
+from recsim.simulator import streaming_stats
+import tensorflow.compat.v1 as tf
+
+
+class StreamingStatisticsTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(1, 4, 100, 20000)
+  def test_matches_numpy(self, num_values):
+    values = np.random.RandomState(0).exponential(size=num_values)
+    stats = streaming_stats.StreamingStatistics()
+    for value in values:
+      stats.add(value)
+    self.assertEqual(num_values, stats.count)
+    self.assertAllClose(np.sum(values), stats.sum)
+    self.assertAllClose(np.mean(values), stats.mean)
+    self.assertAllClose(np.std(values), stats.std)
+    self.assertEqual(np.min(values), stats.min)
+    self.assertEqual(np.max(values), stats.max)
+    for p in (0.1, 0.5, 0.9):
+      # Exact while values are buffered, approximate afterwards.
+      atol = 1e-12 if num_values < 128 else 0.02
+      self.assertAllClose(
+          np.quantile(values, p), stats.quantile(p), atol=atol, rtol=0.)
+
+  def test_empty(self):
+    stats = streaming_stats.StreamingStatistics()
+    self.assertEqual(0, stats.count)
+    self.assertTrue(np.isnan(stats.mean))
+    self.assertTrue(np.isnan(stats.std))
+    self.assertTrue(np.isnan(stats.quantile(0.5)))
+
+  def test_untracked_quantile(self):
+    stats = streaming_stats.StreamingStatistics(quantiles=(0.5,))
+    stats.add(1.)
+    with self.assertRaises(ValueError):
+      stats.quantile(0.9)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -20,6 +20,8 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import copy
+
 from gym import spaces
 import numpy as np
 import six
@@ -81,6 +83,14 @@ class AbstractUserSampler(object):
   def reset_sampler(self):
     self._rng = np.random.RandomState(self._seed)
 
+  def get_state(self):
+    """Returns the state of the sampler, which set_state restores."""
+    return {'rng': self._rng.get_state()}
+
+  def set_state(self, state):
+    """Restores a state returned by get_state."""
+    self._rng.set_state(state['rng'])
+
   @abc.abstractmethod
   def sample_user(self):
     """Creates a new instantiation of this user's hidden state parameters."""
@@ -132,6 +142,22 @@ class AbstractUserModel(object):
     """Resets the sampler."""
     self._user_sampler.reset_sampler()
 
+  def get_state(self):
+    """Returns the state of the user model, which set_state restores.
+
+    The state consists of the state of the user sampler and of a copy of the
+    current user state.
+    """
+    return {
+        'user_sampler': self._user_sampler.get_state(),
+        'user_state': copy.deepcopy(self._user_state),
+    }
+
+  def set_state(self, state):
+    """Restores a state returned by get_state."""
+    self._user_sampler.set_state(state['user_sampler'])
+    self._user_state = copy.deepcopy(state['user_state'])
+
   @abc.abstractmethod
   def is_terminal(self):
     """Returns a boolean indicating whether this session is over."""
@@ -19,75 +19,194 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
+import six
+from six.moves import collections_abc
+
+_CLUSTER_PREFIX = 'cluster_watch_count_cluster_'
+_SCALAR_METRICS = ('impression', 'click', 'quality',
+                   'cluster_watch_count_no_click')
+
+
+class VideoClusterMetrics(collections_abc.Mapping):
+  """Video cluster metrics kept in fixed arrays.
+
+  Counts are updated from whole slates of responses with np.bincount instead of
+  one formatted dictionary key per click. The object is a read-only mapping
+  with the same keys and values as the dictionaries previously produced by
+  aggregate_video_cluster_metrics, e.g. 'cluster_watch_count_cluster_3', but
+  these keys are only built when the mapping is iterated or metrics are
+  written.
+
+  Attributes:
+    cluster_watch_count: an array of the number of clicks per cluster, where
+      entry i counts cluster i + cluster_id_offset. The offset is negative when
+      some cluster ids are, e.g. -1 for the null document of some environments.
+  """
+
+  def __init__(self):
+    self.impression = 0.
+    self.click = 0.
+    self.quality = 0.
+    self.no_click = 0.
+    self.cluster_watch_count = np.zeros(0)
+    self.cluster_id_offset = 0
+
+  @classmethod
+  def from_dict(cls, metrics):
+    """Creates a VideoClusterMetrics from a dictionary of metric values."""
+    result = cls()
+    for key, value in six.iteritems(metrics):
+      if key.startswith(_CLUSTER_PREFIX):
+        result._add_cluster_counts([int(key[len(_CLUSTER_PREFIX):])],
+                                   weights=[value])
+      elif key == 'cluster_watch_count_no_click':
+        result.no_click = float(value)
+      elif key in _SCALAR_METRICS:
+        setattr(result, key, float(value))
+      else:
+        raise ValueError('Unknown video cluster metric %s.' % key)
+    return result
+
+  def _add_cluster_counts(self, cluster_ids, weights=None):
+    """Adds weights, by default one, to the counts of cluster_ids."""
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64).ravel()
+    offset = min(self.cluster_id_offset, int(cluster_ids.min()))
+    counts = np.bincount(cluster_ids - offset, weights=weights)
+    shift = self.cluster_id_offset - offset
+    end = shift + len(self.cluster_watch_count)
+    if shift or len(counts) > end:
+      # Grow the array to cover the new cluster ids.
+      counts = np.pad(
+          counts.astype(np.float64), (0, max(end - len(counts), 0)),
+          mode='constant')
+      counts[shift:end] += self.cluster_watch_count
+      self.cluster_watch_count = counts
+      self.cluster_id_offset = offset
+    else:
+      self.cluster_watch_count[:len(counts)] += counts
+
+  def update(self, clicks, qualities, cluster_ids):
+    """Aggregates the responses of one step.
+
+    Args:
+      clicks: an array of the click indicators of all responses of the step.
+      qualities: an array of the qualities of the responses.
+      cluster_ids: an array of the cluster ids of the responses.
+    """
+    self.impression += 1
+    clicked = np.asarray(clicks).ravel() != 0
+    num_clicks = np.count_nonzero(clicked)
+    if not num_clicks:
+      self.no_click += 1
+      return
+    self.click += num_clicks
+    self.quality += float(np.sum(np.asarray(qualities).ravel()[clicked]))
+    self._add_cluster_counts(np.asarray(cluster_ids).ravel()[clicked])
+
+  def _cluster_ids(self):
+    return np.flatnonzero(self.cluster_watch_count) + self.cluster_id_offset
+
+  def _cluster_keys(self):
+    return [
+        _CLUSTER_PREFIX + str(cluster_id) for cluster_id in self._cluster_ids()
+    ]
+
+  def __getitem__(self, key):
+    if key == 'cluster_watch_count_no_click':
+      return self.no_click
+    if key in _SCALAR_METRICS:
+      return getattr(self, key)
+    if key in self._cluster_keys():
+      cluster_id = int(key[len(_CLUSTER_PREFIX):])
+      return float(self.cluster_watch_count[cluster_id -
+                                            self.cluster_id_offset])
+    raise KeyError(key)
+
+  def __iter__(self):
+    return iter(list(_SCALAR_METRICS) + self._cluster_keys())
+
+  def __len__(self):
+    return len(_SCALAR_METRICS) + np.count_nonzero(self.cluster_watch_count)
+
+  def write(self, add_summary_fn):
+    """Writes average video cluster metrics using add_summary_fn."""
+    add_summary_fn('CTR', self.click / self.impression)
+    if self.click > 0:
+      add_summary_fn('AverageQuality', self.quality / self.click)
+    for cluster_id in self._cluster_ids():
+      count = self.cluster_watch_count[cluster_id - self.cluster_id_offset]
+      add_summary_fn('cluster_watch_count_frac/cluster_%d' % cluster_id,
+                     count / self.impression)
+    add_summary_fn('cluster_watch_count_frac/no_click',
+                   self.no_click / self.impression)
+
+
+def _response_arrays(responses):
+  """Returns the click, quality and cluster_id arrays of some responses.
+
+  Args:
+    responses: either a struct-of-arrays dictionary mapping response names to
+      arrays, or a (possibly nested, one level per user) sequence of response
+      dictionaries.
+
+  Returns:
+    A tuple of flat arrays (clicks, qualities, cluster_ids).
+  """
+  if isinstance(responses, dict):
+    return responses['click'], responses['quality'], responses['cluster_id']
+  responses = list(responses)
+  if responses and not isinstance(responses[0], dict):
+    responses = [response for resp in responses for response in resp]
+  clicks = np.fromiter((response['click'] for response in responses),
+                       dtype=np.float64, count=len(responses))
+  qualities = np.fromiter((response['quality'] for response in responses),
+                          dtype=np.float64, count=len(responses))
+  cluster_ids = np.fromiter((response['cluster_id'] for response in responses),
+                            dtype=np.int64, count=len(responses))
+  return clicks, qualities, cluster_ids
+
+
+def _as_video_cluster_metrics(metrics):
+  if isinstance(metrics, VideoClusterMetrics):
+    return metrics
+  return VideoClusterMetrics.from_dict(metrics)
+
 
 def aggregate_video_cluster_metrics(responses, metrics, info=None):
   """Aggregates the video cluster metrics with one step responses.
 
   Args:
     responses: a dictionary of names, observed responses.
-    metrics: A dictionary mapping from metric_name to its value in float.
+    metrics: A dictionary mapping from metric_name to its value in float, or a
+      VideoClusterMetrics.
     info: Additional info for computing metrics (ignored here)
 
   Returns:
-    A dictionary storing metrics after aggregation.
+    A VideoClusterMetrics storing metrics after aggregation.
   """
   del info  # Unused.
-  is_clicked = False
-  metrics['impression'] += 1
-
-  for response in responses:
-    if not response['click']:
-      continue
-    is_clicked = True
-    metrics['click'] += 1
-    metrics['quality'] += response['quality']
-    cluster_id = response['cluster_id']
-    metrics['cluster_watch_count_cluster_%d' % cluster_id] += 1
-
-  if not is_clicked:
-    metrics['cluster_watch_count_no_click'] += 1
+  metrics = _as_video_cluster_metrics(metrics)
+  metrics.update(*_response_arrays(responses))
   return metrics
 
+
 def aggregate_video_cluster_metrics_multi(responses, metrics, info=None):
   """Aggregates the video cluster metrics with one step responses.
 
   Args:
-    responses: a dictionary of names, observed responses.
-    metrics: A dictionary mapping from metric_name to its value in float.
+    responses: a sequence of the responses of each user, or a struct-of-arrays
+      dictionary of [num_users, slate_size] response arrays.
+    metrics: A dictionary mapping from metric_name to its value in float, or a
+      VideoClusterMetrics.
     info: Additional info for computing metrics (ignored here)
 
   Returns:
-    A dictionary storing metrics after aggregation.
+    A VideoClusterMetrics storing metrics after aggregation.
   """
-  del info  # Unused.
-  is_clicked = False
-  metrics['impression'] += 1
-
-  for resp in responses:
-    for response in resp:
-      if not response['click']:
-        continue
-      is_clicked = True
-      metrics['click'] += 1
-      metrics['quality'] += response['quality']
-      cluster_id = response['cluster_id']
-      metrics['cluster_watch_count_cluster_%d' % cluster_id] += 1
-
-  if not is_clicked:
-    metrics['cluster_watch_count_no_click'] += 1
-  return metrics
+  return aggregate_video_cluster_metrics(responses, metrics, info)
 
 
 def write_video_cluster_metrics(metrics, add_summary_fn):
   """Writes average video cluster metrics using add_summary_fn."""
-  add_summary_fn('CTR', metrics['click'] / metrics['impression'])
-  if metrics['click'] > 0:
-    add_summary_fn('AverageQuality', metrics['quality'] / metrics['click'])
-  for k in metrics:
-    prefix = 'cluster_watch_count_cluster_'
-    if k.startswith(prefix):
-      add_summary_fn('cluster_watch_count_frac/cluster_%s' % k[len(prefix):],
-                     metrics[k] / metrics['impression'])
-  add_summary_fn(
-      'cluster_watch_count_frac/no_click',
-      metrics['cluster_watch_count_no_click'] / metrics['impression'])
+  _as_video_cluster_metrics(metrics).write(add_summary_fn)
@@ -50,6 +50,69 @@ class UtilsTest(tf.test.TestCase):
             'click': 2.0
         })
 
+  def test_aggregate_video_cluster_metrics_multi(self):
+    responses = (({
+        'click': 1,
+        'quality': 0.5,
+        'cluster_id': 1
+    }, {
+        'click': 1,
+        'quality': 0.25,
+        'cluster_id': 3
+    }), ({
+        'click': 0,
+        'quality': 0.8,
+        'cluster_id': 2
+    }, {
+        'click': 1,
+        'quality': 1.0,
+        'cluster_id': 1
+    }))
+    metrics = utils.aggregate_video_cluster_metrics_multi(
+        responses, collections.defaultdict(float))
+    no_clicks = {
+        'click': np.zeros((2, 2)),
+        'quality': np.ones((2, 2)),
+        'cluster_id': np.zeros((2, 2), dtype=np.int64)
+    }
+    metrics = utils.aggregate_video_cluster_metrics_multi(no_clicks, metrics)
+    self.assertEqual(
+        dict(metrics), {
+            'impression': 2.0,
+            'cluster_watch_count_cluster_1': 2.0,
+            'cluster_watch_count_cluster_3': 1.0,
+            'cluster_watch_count_no_click': 1.0,
+            'quality': 1.75,
+            'click': 3.0
+        })
+
+  def test_write_video_cluster_metrics(self):
+    metrics = utils.VideoClusterMetrics()
+    metrics.update(np.array([1, 0]), np.array([0.5, 0.2]), np.array([2, 0]))
+    metrics.update(np.array([0, 0]), np.array([0.5, 0.2]), np.array([2, 0]))
+    summaries = []
+    utils.write_video_cluster_metrics(
+        metrics, lambda tag, value: summaries.append((tag, value)))
+    self.assertEqual([('CTR', 0.5), ('AverageQuality', 0.5),
+                      ('cluster_watch_count_frac/cluster_2', 0.5),
+                      ('cluster_watch_count_frac/no_click', 0.5)], summaries)
+
+  def test_negative_cluster_ids(self):
+    metrics = utils.VideoClusterMetrics()
+    metrics.update(np.array([1, 0]), np.array([0.5, 0.2]), np.array([1, 0]))
+    # Some environments report the null document as cluster -1.
+    metrics.update(np.array([1]), np.array([0.]), np.array([-1]))
+    metrics.update(np.array([0, 1]), np.array([0.5, 0.2]), np.array([2, 1]))
+    self.assertEqual(
+        {
+            'impression': 3.0,
+            'click': 3.0,
+            'quality': 0.7,
+            'cluster_watch_count_cluster_-1': 1.0,
+            'cluster_watch_count_cluster_1': 2.0,
+            'cluster_watch_count_no_click': 0.0,
+        }, dict(metrics))
+
 
 if __name__ == '__main__':
   tf.test.main()